@@ -1,6 +1,6 @@
 import matplotlib.pyplot as plt
 import math
-from collections import deque
+from heapq import heappush, heappop
 from matplotlib.patches import *
 from vector import *
 
@@ -49,23 +49,46 @@ NEIGHBOR_DISES = [
     Vector(1, -1),
 ]
 
+# 与 NEIGHBOR_DISES 一一对应的 (dx, dy, 步长)，搜索内部只用整数，省去构造 Vector 的开销
+NEIGHBOR_STEPS = [
+    (dis.X, dis.Y, SQRT_2 if dis.X != 0 and dis.Y != 0 else 1.0)
+    for dis in NEIGHBOR_DISES
+]
+
+
+# 八方向网格上的启发值（octile 距离）
+def octile(dx, dy):
+    dx, dy = abs(dx), abs(dy)
+    return dx + dy + (SQRT_2 - 2) * min(dx, dy)
+
 
 # 地图
 class spMap:
+    # 单次搜索最多扩展的节点数，超过则视为找不到路径
+    maxExpand = 300
+
     def __init__(self, msize, map, startPos=None, endPos=None):
+        self.generation = 0
         self.setMap(msize, map)  # 地图，0是空位，1是障碍
         self.setStartEnd(startPos, endPos)
 
     def setMap(self, msize, _map):
         self.mapsize = msize
         self.map = _map
+        # closed 集合与 open 集合里的最优 g 值都按"代数"打标记，
+        # 每次 setStartEnd 只需把代数加一，就相当于清空了上一次搜索的状态
+        self.closedGen = [0] * (msize * msize)
+        self.openGen = [0] * (msize * msize)
+        self.bestG = [0.0] * (msize * msize)
 
     def setStartEnd(self, startPoint, endPoint):
         self.startPoint = startPoint  # 起始点
         self.endPoint = endPoint  # 终点
-        self.tree = None  # 已经搜寻过的节点，是closed的集合
+        self.tree = None  # 搜索树的根节点
         self.foundEndNode = None  # 寻找到的终点，用于判断算法结束
         self.addNodeCallback = None
+        self.expandedCount = 0  # 本次搜索扩展过的节点数
+        self.generation += 1
 
     # 判断当前点是否超出范围
     def isOutBound(self, pos):
@@ -77,18 +100,7 @@ class spMap:
 
     # 判断当前点是否已经遍历过
     def isClosedPos(self, pos):
-        if self.tree == None:
-            return False
-        nodes = []
-        nodes.append(self.tree)
-        while len(nodes) != 0:
-            node = nodes.pop()
-            if node.pos == pos:
-                return True
-            if node.childNodes != None:
-                for nodeTmp in node.childNodes:
-                    nodes.append(nodeTmp)
-        return False
+        return self.closedGen[pos.Y * self.mapsize + pos.X] == self.generation
 
     # 获取周围可遍历的邻居节点
     def getNeighbors(self, pos):
@@ -104,70 +116,308 @@ class spMap:
             result.append(newPos)
         return result
 
-    def process(self):
-        # 初始化open集合，并把起始点放入
-        willProcessNodes = deque()
+    # 广度优先，先遍历到的节点先弹出
+    def priorityBFS(self, node, seq):
+        return seq
+
+    # dijkstra，g 最小的节点先弹出
+    def priorityDijkstra(self, node, seq):
+        return node.g
+
+    # A*，f = g + h 最小的节点先弹出
+    def priorityAStar(self, node, seq):
+        return node.g + node.h
+
+    def process(self, priority=None):
+        # 决定使用什么算法的就是 open 集合的优先级
+        if priority == None:
+            priority = self.priorityAStar
+
+        size = self.mapsize
+        grid = self.map
+        gen = self.generation
+        closedGen = self.closedGen
+        openGen = self.openGen
+        bestG = self.bestG
+        endX, endY = self.endPoint.X, self.endPoint.Y
+        D = Vector2Node.D
+
+        # 初始化 open 集合（二叉堆），并把起始点放入。
+        # 堆里的元素是 (优先级, 入堆序号, 节点)，序号保证同优先级时先入先出；
+        # 节点的 g 被改进时直接压入新节点，旧节点弹出时发现已 closed 就跳过（惰性删除）
         self.tree = Vector2Node(self.startPoint)
-        willProcessNodes.append(self.tree)
+        self.tree.h = octile(endX - self.startPoint.X, endY - self.startPoint.Y) * D
+        seq = 0
+        willProcessNodes = [(priority(self.tree, seq), seq, self.tree)]
+        startIdx = self.startPoint.Y * size + self.startPoint.X
+        openGen[startIdx] = gen
+        bestG[startIdx] = 0.0
 
         counter = 0
         # 开始迭代，直到找到终点，或找完了所有能找的点
-        while (
-            self.foundEndNode == None and len(willProcessNodes) != 0 and counter <= 300
-        ):
-            # 寻找下一个最合适的点，这里是最关键的函数，决定了使用什么算法
+        while willProcessNodes and counter <= self.maxExpand:
+            node = heappop(willProcessNodes)[2]
+            x, y = node.pos.X, node.pos.Y
+            idx = y * size + x
+            if closedGen[idx] == gen:
+                continue
+            closedGen[idx] = gen
             counter += 1
 
-            node = self.popLowGHNode(willProcessNodes)
-
             if self.addNodeCallback != None:
                 self.addNodeCallback(node.pos)
 
+            # 找到了终点
+            if x == endX and y == endY:
+                self.foundEndNode = node
+                break
+
             # 获取合适点周围所有的邻居
-            neighbors = self.getNeighbors(node.pos)
-            for neighbor in neighbors:
+            for dx, dy, cost in NEIGHBOR_STEPS:
+                nx, ny = x + dx, y + dy
+                if nx < 0 or ny < 0 or nx >= size or ny >= size:
+                    continue
+                if grid[ny][nx] == 1:
+                    continue
+                nIdx = ny * size + nx
+                if closedGen[nIdx] == gen:
+                    continue
+                g = node.g + cost
+                if openGen[nIdx] == gen and g >= bestG[nIdx]:
+                    continue
+                openGen[nIdx] = gen
+                bestG[nIdx] = g
+
                 # 初始化邻居，并计算g和h
-                childNode = Vector2Node(neighbor)
+                childNode = Vector2Node(Vector(nx, ny))
                 childNode.frontNode = node
-                childNode.calcGH(self.endPoint)
-                node.childNodes.append(childNode)
+                childNode.g = g
+                childNode.h = octile(endX - nx, endY - ny) * D
 
                 # 添加到open集合中
-                willProcessNodes.append(childNode)
-
-                # 找到了终点
-                if neighbor == self.endPoint:
-                    self.foundEndNode = childNode
-
-    # 广度优先，直接弹出先遍历到的节点
-    def popLeftNode(self, willProcessNodes):
-        return willProcessNodes.popleft()
-
-    # dijkstra，寻找g最小的节点
-    def popLowGNode(self, willProcessNodes):
-        foundNode = None
-        for node in willProcessNodes:
-            if foundNode == None:
-                foundNode = node
-            else:
-                if node.g < foundNode.g:
-                    foundNode = node
-        if foundNode != None:
-            willProcessNodes.remove(foundNode)
-        return foundNode
-
-    # A*，寻找f = g + h最小的节点
-    def popLowGHNode(self, willProcessNodes):
-        foundNode = None
-        for node in willProcessNodes:
-            if foundNode == None:
-                foundNode = node
+                seq += 1
+                heappush(willProcessNodes, (priority(childNode, seq), seq, childNode))
+
+        self.expandedCount = counter
+
+    # 是否可以站在 (x, y) 上，越界视为障碍
+    def isWalkable(self, x, y):
+        return 0 <= x < self.mapsize and 0 <= y < self.mapsize and self.map[y][x] != 1
+
+    # Jump Point Search 的跳跃函数：从 (x, y) 沿 (dx, dy) 一直走，
+    # 遇到终点或者存在强迫邻居的点就停下返回该点，撞墙返回 None
+    def jump(self, x, y, dx, dy):
+        walkable = self.isWalkable
+        endX, endY = self.endPoint.X, self.endPoint.Y
+        while True:
+            x += dx
+            y += dy
+            if not walkable(x, y):
+                return None
+            if x == endX and y == endY:
+                return x, y
+            if dx != 0 and dy != 0:
+                if (not walkable(x - dx, y) and walkable(x - dx, y + dy)) or (
+                    not walkable(x, y - dy) and walkable(x + dx, y - dy)
+                ):
+                    return x, y
+                # 斜向走的每一步都要向两个分量方向各探一次
+                if self.jump(x, y, dx, 0) != None or self.jump(x, y, 0, dy) != None:
+                    return x, y
+            elif dx != 0:
+                if (not walkable(x, y + 1) and walkable(x + dx, y + 1)) or (
+                    not walkable(x, y - 1) and walkable(x + dx, y - 1)
+                ):
+                    return x, y
             else:
-                if node.f() < foundNode.f():
-                    foundNode = node
-        if foundNode != None:
-            willProcessNodes.remove(foundNode)
-        return foundNode
+                if (not walkable(x + 1, y) and walkable(x + 1, y + dy)) or (
+                    not walkable(x - 1, y) and walkable(x - 1, y + dy)
+                ):
+                    return x, y
+
+    # 按来时的方向剪枝后剩下的搜索方向（自然邻居 + 强迫邻居）
+    def prunedDirections(self, node):
+        if node.frontNode == None:
+            return [(dx, dy) for dx, dy, _ in NEIGHBOR_STEPS]
+        x, y = node.pos.X, node.pos.Y
+        dx = (x > node.frontNode.pos.X) - (x < node.frontNode.pos.X)
+        dy = (y > node.frontNode.pos.Y) - (y < node.frontNode.pos.Y)
+        walkable = self.isWalkable
+        result = []
+        if dx != 0 and dy != 0:
+            result += [(dx, 0), (0, dy), (dx, dy)]
+            if not walkable(x - dx, y):
+                result.append((-dx, dy))
+            if not walkable(x, y - dy):
+                result.append((dx, -dy))
+        elif dx != 0:
+            result.append((dx, 0))
+            if not walkable(x, y + 1):
+                result.append((dx, 1))
+            if not walkable(x, y - 1):
+                result.append((dx, -1))
+        else:
+            result.append((0, dy))
+            if not walkable(x + 1, y):
+                result.append((1, dy))
+            if not walkable(x - 1, y):
+                result.append((-1, dy))
+        return result
+
+    # Jump Point Search：只适用于代价均匀的八方向网格，结果与 A* 一样是最优路径，
+    # 但只有跳点会进入 open 集合。搜索树里相邻两个节点之间是一段直线或斜线
+    def processJPS(self):
+        size = self.mapsize
+        gen = self.generation
+        closedGen = self.closedGen
+        openGen = self.openGen
+        bestG = self.bestG
+        endX, endY = self.endPoint.X, self.endPoint.Y
+        D = Vector2Node.D
+
+        self.tree = Vector2Node(self.startPoint)
+        self.tree.h = octile(endX - self.startPoint.X, endY - self.startPoint.Y) * D
+        seq = 0
+        willProcessNodes = [(self.tree.h, seq, self.tree)]
+        startIdx = self.startPoint.Y * size + self.startPoint.X
+        openGen[startIdx] = gen
+        bestG[startIdx] = 0.0
+
+        counter = 0
+        while willProcessNodes and counter <= self.maxExpand:
+            node = heappop(willProcessNodes)[2]
+            x, y = node.pos.X, node.pos.Y
+            idx = y * size + x
+            if closedGen[idx] == gen:
+                continue
+            closedGen[idx] = gen
+            counter += 1
+
+            if self.addNodeCallback != None:
+                self.addNodeCallback(node.pos)
+
+            if x == endX and y == endY:
+                self.foundEndNode = node
+                break
+
+            for dx, dy in self.prunedDirections(node):
+                jumpPoint = self.jump(x, y, dx, dy)
+                if jumpPoint == None:
+                    continue
+                nx, ny = jumpPoint
+                nIdx = ny * size + nx
+                if closedGen[nIdx] == gen:
+                    continue
+                g = node.g + octile(nx - x, ny - y)
+                if openGen[nIdx] == gen and g >= bestG[nIdx]:
+                    continue
+                openGen[nIdx] = gen
+                bestG[nIdx] = g
+
+                childNode = Vector2Node(Vector(nx, ny))
+                childNode.frontNode = node
+                childNode.g = g
+                childNode.h = octile(endX - nx, endY - ny) * D
+
+                seq += 1
+                heappush(willProcessNodes, (g + childNode.h, seq, childNode))
+
+        self.expandedCount = counter
+
+    # 一对多搜索：从 startPoint 出发做 dijkstra，直到 targets 里的点都已确定最短距离。
+    # 返回 {格子编号: 节点}，沿节点的 frontNode 回溯就是从该点走到 startPoint 的路径。
+    # 扩展上限为 maxExpand 乘以目标数，搜不到的目标不在结果里
+    def processMulti(self, targets):
+        size = self.mapsize
+        grid = self.map
+        gen = self.generation
+        closedGen = self.closedGen
+        openGen = self.openGen
+        bestG = self.bestG
+        remaining = {pos.Y * size + pos.X for pos in targets}
+        result = {}
+
+        self.tree = Vector2Node(self.startPoint)
+        seq = 0
+        willProcessNodes = [(0.0, seq, self.tree)]
+        startIdx = self.startPoint.Y * size + self.startPoint.X
+        openGen[startIdx] = gen
+        bestG[startIdx] = 0.0
+
+        counter = 0
+        maxExpand = self.maxExpand * max(len(remaining), 1)
+        while willProcessNodes and remaining and counter <= maxExpand:
+            node = heappop(willProcessNodes)[2]
+            x, y = node.pos.X, node.pos.Y
+            idx = y * size + x
+            if closedGen[idx] == gen:
+                continue
+            closedGen[idx] = gen
+            counter += 1
+            if idx in remaining:
+                remaining.discard(idx)
+                result[idx] = node
+
+            for dx, dy, cost in NEIGHBOR_STEPS:
+                nx, ny = x + dx, y + dy
+                if nx < 0 or ny < 0 or nx >= size or ny >= size:
+                    continue
+                if grid[ny][nx] == 1:
+                    continue
+                nIdx = ny * size + nx
+                if closedGen[nIdx] == gen:
+                    continue
+                g = node.g + cost
+                if openGen[nIdx] == gen and g >= bestG[nIdx]:
+                    continue
+                openGen[nIdx] = gen
+                bestG[nIdx] = g
+
+                childNode = Vector2Node(Vector(nx, ny))
+                childNode.frontNode = node
+                childNode.g = g
+                seq += 1
+                heappush(willProcessNodes, (g, seq, childNode))
+
+        self.expandedCount = counter
+        return result
+
+    # 按策略名搜索，可选 bfs、dijkstra、astar、jps
+    def search(self, strategy="astar"):
+        if strategy == "jps":
+            self.processJPS()
+        else:
+            self.process(getattr(self, STRATEGY_PRIORITIES[strategy]))
+
+    # 回溯出从起点到终点经过的每一个格子（含起点和终点），
+    # 跳点之间的直线、斜线段会被逐格补齐
+    def pathPositions(self):
+        nodes = []
+        node = self.foundEndNode
+        while node != None:
+            nodes.append(node)
+            node = node.frontNode
+        nodes.reverse()
+
+        result = [nodes[0].pos] if nodes else []
+        for frontNode, node in zip(nodes, nodes[1:]):
+            x, y = frontNode.pos.X, frontNode.pos.Y
+            dx = (node.pos.X > x) - (node.pos.X < x)
+            dy = (node.pos.Y > y) - (node.pos.Y < y)
+            while x != node.pos.X or y != node.pos.Y:
+                x += dx
+                y += dy
+                result.append(Vector(x, y))
+        return result
+
+
+# 策略名与 open 集合优先级函数的对应关系，jps 单独由 processJPS 实现
+STRATEGY_PRIORITIES = {
+    "bfs": "priorityBFS",
+    "dijkstra": "priorityDijkstra",
+    "astar": "priorityAStar",
+}
+STRATEGIES = list(STRATEGY_PRIORITIES) + ["jps"]
 
 
 # 这个文件里面的内容已经全部移动到 Control 中
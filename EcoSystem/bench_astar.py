@@ -0,0 +1,141 @@
+# A* 寻路性能对比：旧版（deque 线性扫描 + 遍历整棵树判断 closed）与新版（二叉堆 + 代数标记），
+# 以及 bfs、dijkstra、astar、jps 四种策略在开阔地图上的扩展节点数与耗时
+# 用法：python bench_astar.py [--queries 50] [--density 0.2] [--seed 0]
+import argparse
+import random
+from collections import deque
+from time import perf_counter
+
+from AStar import *
+from vector import Vector
+
+
+# 旧版搜索核心，原样保留在这里仅用于对比
+class LegacySpMap(spMap):
+    def search(self, strategy="astar"):
+        self.process()
+
+    def isClosedPos(self, pos):
+        if self.tree == None:
+            return False
+        nodes = []
+        nodes.append(self.tree)
+        while len(nodes) != 0:
+            node = nodes.pop()
+            if node.pos == pos:
+                return True
+            if node.childNodes != None:
+                for nodeTmp in node.childNodes:
+                    nodes.append(nodeTmp)
+        return False
+
+    def process(self, priority=None):
+        willProcessNodes = deque()
+        self.tree = Vector2Node(self.startPoint)
+        willProcessNodes.append(self.tree)
+
+        counter = 0
+        while (
+            self.foundEndNode == None
+            and len(willProcessNodes) != 0
+            and counter <= self.maxExpand
+        ):
+            counter += 1
+            node = self.popLowGHNode(willProcessNodes)
+            neighbors = self.getNeighbors(node.pos)
+            for neighbor in neighbors:
+                childNode = Vector2Node(neighbor)
+                childNode.frontNode = node
+                childNode.calcGH(self.endPoint)
+                node.childNodes.append(childNode)
+                willProcessNodes.append(childNode)
+                if neighbor == self.endPoint:
+                    self.foundEndNode = childNode
+        self.expandedCount = counter
+
+    def popLowGHNode(self, willProcessNodes):
+        foundNode = None
+        for node in willProcessNodes:
+            if foundNode == None:
+                foundNode = node
+            else:
+                if node.f() < foundNode.f():
+                    foundNode = node
+        if foundNode != None:
+            willProcessNodes.remove(foundNode)
+        return foundNode
+
+
+# 随机生成障碍地图，density 为障碍所占比例
+def randomMap(size, density, rnd):
+    return [
+        [1 if rnd.random() < density else 0 for _ in range(size)] for _ in range(size)
+    ]
+
+
+# 随机挑选起点和终点都不是障碍的查询，终点落在起点周围 reach 的范围内
+def randomQueries(_map, size, num, reach, rnd):
+    queries = []
+    while len(queries) < num:
+        x1, y1 = rnd.randrange(size), rnd.randrange(size)
+        x2 = min(max(x1 + rnd.randint(-reach, reach), 0), size - 1)
+        y2 = min(max(y1 + rnd.randint(-reach, reach), 0), size - 1)
+        if _map[y1][x1] == 0 and _map[y2][x2] == 0 and (x1, y1) != (x2, y2):
+            queries.append((Vector(x1, y1), Vector(x2, y2)))
+    return queries
+
+
+# 跑一遍所有查询，返回 (总耗时, 找到路径的次数, 扩展的节点总数)
+def runQueries(sp, queries, strategy="astar"):
+    found, expanded = 0, 0
+    t0 = perf_counter()
+    for startPos, endPos in queries:
+        sp.setStartEnd(startPos, endPos)
+        sp.search(strategy)
+        found += sp.foundEndNode != None
+        expanded += sp.expandedCount
+    return perf_counter() - t0, found, expanded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # (地图边长, 终点离起点的最大距离, 最大扩展节点数)
+    cases = [(50, 25, 300), (500, 25, 300), (500, 60, 2000)]
+    print(f"{'地图':>9} {'扩展上限':>8} {'实现':>6} {'总耗时(ms)':>12} {'找到':>6} {'扩展节点':>8}")
+    for size, reach, maxExpand in cases:
+        rnd = random.Random(args.seed)
+        _map = randomMap(size, args.density, rnd)
+        queries = randomQueries(_map, size, args.queries, reach, rnd)
+        for name, cls in (("旧版", LegacySpMap), ("新版", spMap)):
+            sp = cls(size, _map)
+            sp.maxExpand = maxExpand
+            cost, found, expanded = runQueries(sp, queries)
+            print(
+                f"{size:>4}x{size:<4} {maxExpand:>8} {name:>6} {cost * 1000:>12.1f} "
+                f"{found:>6} {expanded:>8}"
+            )
+
+    # 各策略对比：不设扩展上限，(地图边长, 障碍比例)
+    print()
+    print(f"{'地图':>9} {'障碍':>6} {'策略':>8} {'总耗时(ms)':>12} {'找到':>6} {'扩展节点':>8}")
+    for size, density in [(100, 0.0), (100, 0.05), (200, 0.0), (200, 0.05)]:
+        rnd = random.Random(args.seed)
+        _map = randomMap(size, density, rnd)
+        queries = randomQueries(_map, size, args.queries // 5 or 1, size, rnd)
+        sp = spMap(size, _map)
+        sp.maxExpand = size * size
+        for strategy in STRATEGIES:
+            cost, found, expanded = runQueries(sp, queries, strategy)
+            print(
+                f"{size:>4}x{size:<4} {density:>6} {strategy:>8} {cost * 1000:>12.1f} "
+                f"{found:>6} {expanded:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
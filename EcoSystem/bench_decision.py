@@ -0,0 +1,56 @@
+# 决策阶段耗时随种群规模的变化：空间索引 vs 遍历整个物种列表
+# 用法：python bench_decision.py [--map-size 200] [--scales 1 2 4 8] [--seed 0]
+import argparse
+import random
+from time import perf_counter
+
+from control import Control
+from creature import Creature
+
+
+# 所有老虎、牛各做一次决策并结算寻路请求，返回耗时（秒）
+def decisionPhase(control):
+    t0 = perf_counter()
+    broker = control.brokers[0]
+    for tiger in control.CreatureLst[0]:
+        control.decisionForPredator(tiger, control.CreatureLst[1], broker)
+    broker.resolve()
+    control.syncGrassField()
+    control.syncDangerField()
+    broker = control.brokers[1]
+    for cow in control.CreatureLst[1]:
+        if not cow.dead:
+            control.decisionForPrey(
+                cow, control.CreatureLst[2], control.CreatureLst[0], broker
+            )
+    broker.resolve()
+    return perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--map-size", type=int, default=200)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'规模':>4} {'生物总数':>8} {'索引(ms)':>10} {'遍历(ms)':>10} {'索引 us/只':>11}")
+    for scale in args.scales:
+        nums = [n * scale for n in Creature.INIT_NUM]
+        costs = []
+        for useSpatialIndex in (True, False):
+            random.seed(args.seed)
+            control = Control(args.map_size)
+            control.barrier_init([0])
+            control.creature_init(*nums)
+            control.useSpatialIndex = useSpatialIndex
+            costs.append(decisionPhase(control))
+        total = sum(nums)
+        print(
+            f"{scale:>4} {total:>8} {costs[0] * 1000:>10.1f} {costs[1] * 1000:>10.1f} "
+            f"{costs[0] / total * 1e6:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# 草的两种模型对比：每棵草一个 Creature（objects）与网格化的元胞自动机（field）。
+# 先比较初始化后的内存占用与草自身的簿记（老化、繁殖、与距离场同步）耗时，再各跑若干周期比较种群变化
+# 用法：python bench_grass.py [--map-size 100] [--grass 3000] [--ticks 30] [--seed 0]
+import argparse
+import io
+import random
+import tracemalloc
+from contextlib import redirect_stdout
+from time import perf_counter
+
+from control import Control
+from creature import Creature
+
+
+def makeControl(model, mapSize, grassNum, seed):
+    random.seed(seed)
+    with redirect_stdout(io.StringIO()):
+        control = Control(mapSize, seed=seed, grassModel=model)
+        control.barrier_init([0])
+        control.creature_init(Creature.INIT_TIGER_NUM, Creature.INIT_COW_NUM, grassNum)
+    return control
+
+
+# 草的簿记耗时（毫秒/周期）
+def grassBookkeeping(control, ticks):
+    t0 = perf_counter()
+    for _ in range(ticks):
+        control.agePass(2)
+        control.SingleCreatureReproduce(2, control.CreatureLst)
+        control.syncGrassField()
+    return (perf_counter() - t0) / ticks * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--map-size", type=int, default=100)
+    parser.add_argument("--grass", type=int, default=3000)
+    parser.add_argument("--ticks", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'模型':>8} {'内存(KB)':>12} {'簿记(ms/周期)':>14}")
+    for model in ("objects", "field"):
+        tracemalloc.start()
+        control = makeControl(model, args.map_size, args.grass, args.seed)
+        memory = tracemalloc.get_traced_memory()[0] / 1024
+        tracemalloc.stop()
+        cost = grassBookkeeping(control, 10)
+        print(f"{model:>8} {memory:>12.0f} {cost:>14.2f}")
+
+    print()
+    print("种群变化（虎, 牛, 草）")
+    controls = {
+        model: makeControl(model, args.map_size, args.grass, args.seed)
+        for model in ("objects", "field")
+    }
+    for i in range(args.ticks):
+        line = []
+        for model, control in controls.items():
+            control.dayPass()
+            line.append(f"{model}: {[len(lst) for lst in control.CreatureLst]}")
+        if i % 5 == 4:
+            print(f"{i + 1:>4}  " + "  ".join(line))
+
+
+if __name__ == "__main__":
+    main()
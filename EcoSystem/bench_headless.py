@@ -0,0 +1,81 @@
+# 整个周期的吞吐量随种群规模的变化，用 headless.run 在不同规模下各跑若干周期。
+# 规模 s 时初始数量与数量上限都乘以 s，地图面积也乘以 s，密度不变。
+# 给了 --save 时把结果存成 JSON；给了 --baseline 时与之前存下的结果比较，
+# 任一规模的每秒周期数比基线低出 --tolerance 以上就以非零状态退出，方便在没有显示器的机器上跑回归
+# 用法：python bench_headless.py [--scales 1 2 4] [--ticks 20] [--map-size 100] [--seed 0]
+#       [--save bench.json] [--baseline bench.json] [--tolerance 0.2]
+import argparse
+import json
+import sys
+
+from control import maxCreatureNum
+from creature import Creature
+from headless import run
+from scheduler import PHASES
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--map-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(
+        f"{'规模':>4} {'地图':>6} {'周期/秒':>10} "
+        + " ".join(f"{phase:>9}" for phase in PHASES)
+        + f" {'最终数量':>20}"
+    )
+    results = {}
+    for scale in args.scales:
+        mapSize = int(args.map_size * scale**0.5)
+        result = run(
+            args.ticks,
+            mapSize=mapSize,
+            seed=args.seed,
+            initNum=[n * scale for n in Creature.INIT_NUM],
+            maxNum=[n * scale for n in maxCreatureNum],
+        )
+        results[str(scale)] = {
+            "mapSize": mapSize,
+            "ticksPerSecond": result["ticksPerSecond"],
+            "phaseMsPerTick": result["phaseMsPerTick"],
+            "final": result["final"],
+        }
+        print(
+            f"{scale:>4} {mapSize:>6} {result['ticksPerSecond']:>10.2f} "
+            + " ".join(f"{result['phaseMsPerTick'][phase]:>9.1f}" for phase in PHASES)
+            + f" {str(result['final']):>20}"
+        )
+
+    if args.save != None:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline != None:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressed = []
+        for scale, result in results.items():
+            if scale not in baseline:
+                continue
+            before = baseline[scale]["ticksPerSecond"]
+            ratio = result["ticksPerSecond"] / before
+            print(
+                f"规模 {scale}：{before:.2f} → {result['ticksPerSecond']:.2f} 周期/秒"
+            )
+            if ratio < 1 - args.tolerance:
+                regressed.append(scale)
+        if len(regressed) != 0:
+            print(
+                f"以下规模的吞吐量下降超过 {args.tolerance:.0%}：{', '.join(regressed)}"
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# 栅格渲染的耗时随种群规模的变化：同一张地图上放不同数量的生物，
+# 比较 Rasterizer.render 与转成 PPM 的耗时，应当基本不随数量变化（只与像素数有关）
+# 用法：python bench_raster.py [--map-size 50] [--cell 12] [--fill 0.05 0.2 0.5 0.9] [--repeat 50]
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from raster import Rasterizer, toPPM
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--map-size", type=int, default=50)
+    parser.add_argument("--cell", type=int, default=12)
+    parser.add_argument("--fill", type=float, nargs="+", default=[0.05, 0.2, 0.5, 0.9])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    size = args.map_size
+    rng = np.random.default_rng(0)
+    rasterizer = Rasterizer(size, args.cell)
+    height, width = rasterizer.shape
+    print(f"地图 {size}×{size}，图像 {width}×{height} 像素")
+    print(f"{'每种占格比例':>12} {'生物数':>8} {'render ms':>10} {'PPM ms':>8}")
+    for fill in args.fill:
+        number = int(size * size * fill)
+        positions = [
+            np.divmod(rng.choice(size * size, number, replace=False), size)[::-1]
+            for _ in range(3)
+        ]
+        t0 = perf_counter()
+        for _ in range(args.repeat):
+            image = rasterizer.render(positions)
+        t1 = perf_counter()
+        for _ in range(args.repeat):
+            toPPM(image)
+        t2 = perf_counter()
+        print(
+            f"{fill:>12.2f} {number * 3:>8} {(t1 - t0) / args.repeat * 1000:>10.2f} "
+            f"{(t2 - t1) / args.repeat * 1000:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# 分块多进程模拟的扩展性：同一张地图分别用 1 到 N 个进程（分成 N 块）运行，
+# 比较每周期耗时、相对单块的加速比，以及与单进程 Control 的种群数量是否一致
+# 用法：python bench_tiles.py [--map-size 300] [--ticks 20] [--cores 4] [--seed 0]
+import argparse
+import io
+import os
+from contextlib import redirect_stdout
+from time import perf_counter
+
+import numpy as np
+
+from control import Control
+from creature import Creature
+from tiles import TiledSimulation
+
+
+# 把 cores 块排成尽量接近正方形的 (tilesX, tilesY)
+def layout(cores):
+    tilesY = max(d for d in range(1, int(cores**0.5) + 1) if cores % d == 0)
+    return cores // tilesY, tilesY
+
+
+def single(mapSize, ticks, seed):
+    with redirect_stdout(io.StringIO()):
+        control = Control(mapSize, seed=seed)
+        control.barrier_init([0])
+        control.creature_init(*Creature.INIT_NUM)
+    counts = []
+    t0 = perf_counter()
+    for _ in range(ticks):
+        control.dayPass()
+        counts.append([len(lst) for lst in control.CreatureLst])
+    return counts, perf_counter() - t0
+
+
+def tiled(mapSize, ticks, seed, cores):
+    with TiledSimulation(mapSize, tiles=layout(cores), seed=seed) as sim:
+        counts = sim.run(ticks)
+        return counts, sim.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--map-size", type=int, default=300)
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--cores", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    def report(name, counts, elapsed, base):
+        mean = np.mean(counts, axis=0).round(1).tolist()
+        print(
+            f"{name:>10} {elapsed / args.ticks * 1000:>12.1f} "
+            f"{base / elapsed:>8.2f} {str(mean):>24} {str(counts[-1]):>20}"
+        )
+
+    print(f"地图 {args.map_size}×{args.map_size}，{args.ticks} 个周期")
+    print(
+        f"{'运行方式':>10} {'ms/周期':>12} {'加速比':>8} {'平均数量(虎,牛,草)':>24} {'最终数量':>20}"
+    )
+    counts, elapsed = single(args.map_size, args.ticks, args.seed)
+    report("单进程", counts, elapsed, elapsed)
+    base = None
+    for cores in range(1, args.cores + 1):
+        counts, elapsed = tiled(args.map_size, args.ticks, args.seed, cores)
+        base = base if base != None else elapsed
+        tilesX, tilesY = layout(cores)
+        report(f"{tilesX}×{tilesY} 块", counts, elapsed, base)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# 寻路请求的批处理：决策阶段各个生物只提交 (起点, 终点, 步数) 请求并拿到一张票据，
+# 到了结算阶段再统一求解。完全相同的请求只算一次；终点相同的多个请求
+# 合并成一次从终点出发的一对多搜索（地图是无向的，终点到起点的最短路反过来就是所求）。
+# 请求很多时可以把各组交给进程池并行求解
+from concurrent.futures import ProcessPoolExecutor
+
+from AStar import spMap
+from vector import Vector
+
+
+class PathTicket:
+    def __init__(self, startPos, endPos, steps, strategy, planner):
+        self.startPos = startPos
+        self.endPos = endPos
+        self.steps = steps
+        self.strategy = strategy
+        self.planner = planner
+        self.pos = None  # 结算之后填入的下一步位置
+
+
+# 进程池中每个进程自己持有一份地图
+_workerMap = None
+
+
+def _initWorker(msize, _map, maxExpand):
+    global _workerMap
+    _workerMap = spMap(msize, _map)
+    _workerMap.maxExpand = maxExpand
+
+
+def _solveGroupInWorker(goal, starts, strategy):
+    return solveGroup(_workerMap, goal, starts, strategy)
+
+
+# 求解终点相同的一组请求，返回 (结果, 搜索次数, 扩展节点数)，
+# 结果为 {起点: 从起点到终点的逐格路径 [(X, Y), ...] 或 None}
+def solveGroup(sp, goal, starts, strategy):
+    goalPos = Vector(*goal)
+    result = {}
+    searches = expanded = 0
+    if len(starts) > 1:
+        sp.setStartEnd(goalPos, None)
+        found = sp.processMulti([Vector(*start) for start in starts])
+        searches += 1
+        expanded += sp.expandedCount
+        for start in starts:
+            node = found.get(start[1] * sp.mapsize + start[0])
+            if node == None:
+                continue
+            path = []
+            while node != None:
+                path.append((node.pos.X, node.pos.Y))
+                node = node.frontNode
+            result[start] = path
+
+    # 单个请求，或一对多搜索在扩展上限内没有搜到的，逐个按原策略搜索
+    for start in starts:
+        if start in result:
+            continue
+        sp.setStartEnd(Vector(*start), goalPos)
+        sp.search(strategy)
+        searches += 1
+        expanded += sp.expandedCount
+        result[start] = (
+            [(pos.X, pos.Y) for pos in sp.pathPositions()]
+            if sp.foundEndNode != None
+            else None
+        )
+    return result, searches, expanded
+
+
+class PathBroker:
+    def __init__(self, control, processes=0, poolThreshold=32):
+        self.control = control
+        self.processes = processes  # 进程池大小，0 表示不用进程池
+        self.poolThreshold = poolThreshold  # 终点分组数达到这个值才用进程池
+        self.pool = None
+        self.poolVersion = None
+        self.tickets = []
+        self.cacheHits = 0  # 与之前的请求完全相同而直接复用结果的次数
+
+    def submit(self, startPos, endPos, steps, strategy=None, planner=None):
+        ticket = PathTicket(
+            Vector(startPos.X, startPos.Y),
+            Vector(endPos.X, endPos.Y),
+            steps,
+            strategy if strategy != None else self.control.pathStrategy,
+            planner,
+        )
+        self.tickets.append(ticket)
+        return ticket
+
+    # 统一求解已提交的请求，并把结果写回各自的票据
+    def resolve(self):
+        control = self.control
+        metrics = control.metrics
+        tickets, self.tickets = self.tickets, []
+        metrics.count("pathRequests", len(tickets))
+
+        # 带增量寻路器的请求各自有独立的搜索状态，不参与合并
+        groups = {}
+        for ticket in tickets:
+            if ticket.planner != None:
+                ticket.pos = control.findPath(
+                    ticket.startPos, ticket.endPos, ticket.steps, planner=ticket.planner
+                )
+                continue
+            key = ((ticket.endPos.X, ticket.endPos.Y), ticket.strategy)
+            groups.setdefault(key, []).append(ticket)
+
+        paths = {}
+        flatGroups = []
+        for (goal, strategy), group in groups.items():
+            starts = list(dict.fromkeys((t.startPos.X, t.startPos.Y) for t in group))
+            self.cacheHits += len(group) - len(starts)
+            metrics.count("pathCacheHits", len(group) - len(starts))
+            if strategy == "hpa" and control.hpamap != None:
+                # 分层寻路本身已经很快，只去掉完全重复的请求
+                metrics.count("pathSearches", len(starts))
+                for start in starts:
+                    path = control.hpamap.pathPrefix(
+                        Vector(*start),
+                        Vector(*goal),
+                        max(t.steps for t in group) + 1,
+                    )
+                    paths[(goal, strategy, start)] = (
+                        [(pos.X, pos.Y) for pos in path] if path != None else None
+                    )
+            else:
+                flatGroups.append((goal, starts, strategy))
+
+        for (goal, starts, strategy), (result, searches, expanded) in zip(
+            flatGroups, self.solveGroups(flatGroups)
+        ):
+            metrics.count("pathSearches", searches)
+            metrics.count("nodesExpanded", expanded)
+            for start, path in result.items():
+                paths[(goal, strategy, start)] = path
+
+        for (goal, strategy), group in groups.items():
+            for ticket in group:
+                path = paths[(goal, strategy, (ticket.startPos.X, ticket.startPos.Y))]
+                ticket.pos = control.stepAlong(
+                    [Vector(*cell) for cell in path] if path != None else None,
+                    ticket.startPos,
+                    ticket.endPos,
+                    ticket.steps,
+                )
+
+    def solveGroups(self, flatGroups):
+        control = self.control
+        if self.processes > 0 and len(flatGroups) >= self.poolThreshold:
+            pool = self.getPool()
+            return list(
+                pool.map(
+                    _solveGroupInWorker,
+                    *zip(*flatGroups),
+                    chunksize=max(len(flatGroups) // (self.processes * 4), 1),
+                )
+            )
+        sp = control.getSpMap()
+        return [solveGroup(sp, *group) for group in flatGroups]
+
+    # 地图变化后旧进程里的地图就过期了，需要重新建立进程池
+    def getPool(self):
+        control = self.control
+        if self.pool == None or self.poolVersion != control.barrierVersion:
+            self.close()
+            self.pool = ProcessPoolExecutor(
+                self.processes,
+                initializer=_initWorker,
+                initargs=(control.MAP_SIZE, control.BarrierMap, spMap.maxExpand),
+            )
+            self.poolVersion = control.barrierVersion
+        return self.pool
+
+    def close(self):
+        if self.pool != None:
+            self.pool.shutdown()
+            self.pool = None
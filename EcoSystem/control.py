@@ -1,7 +1,21 @@
+import math
 import random
 import numpy as np
-from time import time
 from AStar import *
+from hpa import HierarchicalMap
+from planner import ChasePlanner
+from flowfield import DistanceField
+from danger import DangerField
+from grass import GrassField
+from moves import resolveMoves
+from metrics import NULL_METRICS
+import snapshot
+from scheduler import TickScheduler
+from broker import PathBroker
+from occupancy import OccupancyGrid
+from spatial import SpatialHash
+import hunting
+from population import PopulationStore
 from creature import *
 from vector import *
 
@@ -22,47 +36,172 @@ prop = [
 
 mEnergy = 10
 emergencyLevel = 500
+preyVisibleRange = 7  # 牛的视野范围
+predatorVisibleRange = 10  # 老虎的视野范围
 
 maxCreatureNum = [300, 1000, 3000]  # 最大物种数量（虎，牛，草）
 
+# 物种接近地图容量时，新生物放在母体周围这个范围内最近的空格
+BIRTH_RADIUS = 3
+
+# 地图边长达到这个值时，barrier_init 会建立分层寻路图，findPath 默认改用 hpa
+HPA_MIN_SIZE = 200
+
+
+# 默认障碍物：地图三分之一与三分之二高度处各一道横墙
+def defaultBarrierMap(size):
+    barrierMap = np.zeros((size, size), dtype=np.uint8)
+    barrierMap[int(size / 3), int(size / 4) : int(size / 2)] = 1
+    barrierMap[int(size * 2 / 3), int(size / 2) : int(size - (size / 4))] = 1
+    return barrierMap
+
 
 class Control:
-    def __init__(self, map_size):
+    # pathProcesses 大于 0 时，同一周期内寻路请求较多会交给这么多进程并行求解
+    # columnar 为 True 时生物属性按列存放在 PopulationStore 中，老化与死亡判定整列计算
+    # seed 为繁殖等批量随机抽样所用随机数生成器的种子
+    # grassModel 为 "objects" 时每棵草是一个 Creature，为 "field" 时草用 GrassField 网格表示
+    # props、initNum、maxNum 为这一次模拟的物种属性表、初始数量（出生概率以它为基准）与数量上限，
+    # 不给时分别用模块里的 prop、Creature.INIT_NUM 与 maxCreatureNum
+    def __init__(
+        self,
+        map_size,
+        pathProcesses=0,
+        columnar=False,
+        seed=None,
+        grassModel="objects",
+        props=None,
+        initNum=None,
+        maxNum=None,
+    ):
         self.MAP_SIZE = map_size
+        self.rng = np.random.default_rng(seed)
+        self.grassModel = grassModel
+        self.prop = [dict(p) for p in (props if props != None else prop)]
+        self.initNum = list(initNum if initNum != None else Creature.INIT_NUM)
+        # 各物种的数量上限，繁殖时新生数不超过它
+        self.maxCreatureNum = list(maxNum if maxNum != None else maxCreatureNum)
         self.BarrierMap = [[0] * self.MAP_SIZE for _ in range(self.MAP_SIZE)]
-        self.CreLoc = [
-            [[0] * self.MAP_SIZE for _ in range(self.MAP_SIZE)] for _ in range(0, 3)
+        # 生物位置标记，移动、出生、死亡都通过它更新；CreLoc[code][Y][X] 仍可直接读取
+        self.occupancy = OccupancyGrid(self.MAP_SIZE)
+        self.CreLoc = self.occupancy.grid
+        # 每个物种一份空间索引，视野查询只看附近的桶
+        self.useSpatialIndex = True
+        self.spatial = [SpatialHash(predatorVisibleRange) for _ in range(3)]
+        self.stores = [PopulationStore(code) for code in range(3)] if columnar else None
+        # 按列存储时物种列表就是各 PopulationStore 的视图列表
+        self.CreatureLst = (
+            [store.views for store in self.stores] if columnar else [[], [], []]
+        )
+        # 网格化的草直接充当草的列表
+        if grassModel == "field":
+            self.CreatureLst[2] = GrassField(
+                self.MAP_SIZE,
+                self.prop[2]["mEnergy"],
+                self.prop[2]["life"],
+                self.prop[2]["cost"],
+                self.rng,
+            )
+        # 每个线程各用一份 spMap，寻路之间互不干扰
+        self.spLocal = threading.local()
+        self.barrierVersion = 0  # 障碍每变化一次加一
+        self.pathStrategy = "astar"  # findPath 默认使用的寻路策略
+        # 为 True 时一只牛在一个周期内只能被一只老虎吃掉（排在前面的老虎优先）
+        self.exclusiveHunting = False
+        # 多只生物要走进同一格时谁能走："random"、"energy" 或 "first"，见 moves.resolveMoves
+        self.movePolicy = "random"
+        # 寻路请求的批处理，老虎和牛各一个
+        self.brokers = [
+            PathBroker(self, pathProcesses),
+            PathBroker(self, pathProcesses),
         ]
-        self.CreatureLst = [[], [], []]
-        self.spmap = spMap(self.MAP_SIZE, self.BarrierMap)
+        self.hpamap = None  # 分层寻路图，大地图时在 barrier_init 中建立
+        # 草的距离场，牛找草时沿着它下降即可，每个周期开始时与草的分布同步一次
+        self.grassField = None
+        self.grassAt = {}  # (X, Y) -> (草在 CreatureLst[2] 中的下标, 草)
+        self.grassLock = threading.Lock()
+        # 老虎的危险场，牛决策时直接查表得到危险水平和逃跑方向；设为 None 则逐只老虎计算
+        self.dangerField = DangerField(self.MAP_SIZE, preyVisibleRange)
         self.threads = []
+        # 决策时用的随机数，按周期调度时每只生物换成各自播种的生成器，见 useRandomFor
+        self.random = random
+        self.tickSeed = None
+        # 决策阶段的进食先记在这里，到进食阶段统一结算；为 None 时立即吃掉
+        self.eatQueue = None
+        # 运行指标，换成 metrics.Metrics() 即开始按周期记录各阶段耗时与计数
+        self.metrics = NULL_METRICS
+        self.scheduler = TickScheduler(self)
+
+    # 从快照文件恢复一个 Control，继续运行的结果与没有中断时逐位相同，见 snapshot.py
+    @classmethod
+    def resume(cls, path, pathProcesses=0):
+        meta, arrays = snapshot.readSnapshot(path)
+        control = cls(
+            meta["mapSize"],
+            pathProcesses,
+            columnar=meta["columnar"],
+            grassModel=meta["grassModel"],
+            props=meta["props"],
+            initNum=meta["initNum"],
+            maxNum=meta["maxNum"],
+        )
+        return snapshot.restore(control, meta, arrays)
+
+    # 把当前状态存成一个完整的快照，应在两个周期之间调用
+    def saveSnapshot(self, path):
+        snapshot.save(self, path)
 
     # 障碍物初始化
     # 定义障碍物 - 可通过传入二维数组_map以设定特定形状的障碍物
 
     def barrier_init(self, _map):
         # 默认障碍物
-        if (type(_map) != type([]) and type(_map) != type(np.array([]))) or np.array(
-            _map
-        ).size != [self.MAP_SIZE, self.MAP_SIZE]:
-            for i in range(int(self.MAP_SIZE / 4), int(self.MAP_SIZE / 2)):
-                self.BarrierMap[int(self.MAP_SIZE / 3)][i] = 1
-            for i in range(
-                int(self.MAP_SIZE / 2), int(self.MAP_SIZE - (self.MAP_SIZE / 4))
-            ):
-                self.BarrierMap[int(self.MAP_SIZE * 2 / 3)][i] = 1
-        # 自定义障碍物
-        else:
-            self.BarrierMap.copy(_map)
+        if np.shape(_map) != (self.MAP_SIZE, self.MAP_SIZE):
+            _map = defaultBarrierMap(self.MAP_SIZE)
+        # 自定义障碍物：逐行原地复制，各线程的 spMap 仍然引用同一个列表
+        for Y, row in enumerate(np.asarray(_map, dtype=int).tolist()):
+            self.BarrierMap[Y][:] = row
+
+        # 各线程的 spMap 与 BarrierMap 是同一个列表，只需标记障碍已变化
+        self.barrierVersion += 1
+        self.occupancy.setBarrier(self.BarrierMap)
+        if self.grassModel == "field":
+            self.CreatureLst[2].setBarrier(self.BarrierMap)
+
+        self.grassField = DistanceField(
+            self.MAP_SIZE, self.BarrierMap, maxDist=preyVisibleRange
+        )
 
-        # 给Map对象更新障碍物
-        self.spmap.map = self.BarrierMap
+        # 大地图上逐个生物做完整的 A* 太慢，预处理出分层寻路图
+        if self.MAP_SIZE >= HPA_MIN_SIZE:
+            self.hpamap = HierarchicalMap(self.MAP_SIZE, self.BarrierMap)
+            self.pathStrategy = "hpa"
+
+    # 修改单个格子的障碍，分层寻路图只重建受影响的簇
+    def setBarrier(self, X, Y, value):
+        self.BarrierMap[Y][X] = value
+        self.barrierVersion += 1
+        self.occupancy.setBarrierCell(X, Y, value)
+        if self.grassModel == "field":
+            self.CreatureLst[2].setBarrier(self.BarrierMap)
+        if self.hpamap != None:
+            self.hpamap.updateCell(X, Y)
+        if self.grassField != None:
+            self.grassField.setBarrier(self.BarrierMap)
+        # 追捕寻路器学到的启发值只对不变的地图有效
+        for tiger in self.CreatureLst[0]:
+            tiger.planner = None
 
     # 在地图内随机位置生成相应只数的tiger，cow，grass
     def creature_init(self, tiger_num, cow_num, grass_num):
-        self.CreatureLst[0].clear()
-        self.CreatureLst[1].clear()
-        self.CreatureLst[2].clear()
+        for code in range(0, 3):
+            if code == 2 and self.grassModel == "field":
+                self.CreatureLst[2].clear()
+            elif self.stores != None:
+                self.stores[code].clear()
+                self.CreatureLst[code] = self.stores[code].views
+            else:
+                self.CreatureLst[code].clear()
         # 清除位置标记
         for _ in range(0, 3):
             self.ClearPos(_)
@@ -70,17 +209,20 @@ class Control:
             newcre = self.create_new(0, -1, -1)
             # randomize会按正态分布随机设定年龄与能量水平
             if newcre != None:
-                self.CreatureLst[0].append(newcre.randomize())
+                self.register(newcre.randomize(rng=self.rng))
         for i in range(0, cow_num):
             newcre = self.create_new(1, -1, -1)
             # randomize会按正态分布随机设定年龄与能量水平
             if newcre != None:
-                self.CreatureLst[1].append(newcre.randomize())
+                self.register(newcre.randomize(rng=self.rng))
+        if self.grassModel == "field":
+            self.CreatureLst[2].seed(grass_num)
+            grass_num = 0
         for i in range(0, grass_num):
             newcre = self.create_new(2, -1, -1)
             # randomize会按正态分布随机设定年龄与能量水平
             if newcre != None:
-                self.CreatureLst[2].append(newcre.randomize())
+                self.register(newcre.randomize(rng=self.rng))
         print("Initialize with numbers")
         print(
             f"In list {len(self.CreatureLst[0])} {len(self.CreatureLst[1])} {len(self.CreatureLst[2])}"
@@ -92,52 +234,25 @@ class Control:
     # 不允许同种生物相互重叠
 
     def create_new(self, code, X, Y):
-        # 若单种生物数量超过地图容量上限则跳过生成新生物
-        if len(self.CreatureLst[code]) >= self.MAP_SIZE**2 - np.sum(self.BarrierMap):
+        # 该物种已经没有可以落脚的格子则跳过生成新生物
+        if len(self.occupancy.free[code]) == 0:
             return None
-        elif (
-            len(self.CreatureLst[code])
-            >= (self.MAP_SIZE**2 - np.sum(self.BarrierMap)) * 0.7
-        ):
-            flag = False
-            X = int(random.uniform(0, self.MAP_SIZE))
-            Y = int(random.uniform(0, self.MAP_SIZE))
-            for i in range(0, self.MAP_SIZE):
-                tX = (X + i) % self.MAP_SIZE
-                for j in range(0, self.MAP_SIZE):
-                    tY = (Y + j) % self.MAP_SIZE
-                    if self.isPosValid(Vector(tX, tY), code):
-                        flag = True
-                        break
-                if flag:
-                    break
-            X, Y = tX, tY
-        # tx,ty均为-1时，在地图内随机生成一个编码为code的生物
+        # 生物容量过大时，放弃随机，直接从空格索引中取位置：
+        # 有母体时取母体附近最近的空格，附近没有或没有母体时随机取一个空格
+        elif len(self.CreatureLst[code]) >= self.occupancy.openCells * 0.7:
+            pos = None
+            if X != -1 or Y != -1:
+                pos = self.occupancy.nearestFree(code, X, Y, BIRTH_RADIUS)
+            pos = pos if pos != None else self.occupancy.sampleFree(code, self.rng)
+            if pos == None:
+                return None
+            X, Y = pos
+        # tx,ty均为-1时，在地图内随机取一个空格生成一个编码为code的生物
         elif X == -1 and Y == -1:
-            # 生物容量过大时，放弃随机，直接搜索空位生成新生物
-            if (
-                len(self.CreatureLst[code])
-                >= (self.MAP_SIZE**2 - np.sum(self.BarrierMap)) * 0.7
-            ):
-                flag = False
-                X = int(random.uniform(0, self.MAP_SIZE))
-                Y = int(random.uniform(0, self.MAP_SIZE))
-                for i in range(0, self.MAP_SIZE):
-                    tX = (X + i) % self.MAP_SIZE
-                    for j in range(0, self.MAP_SIZE):
-                        tY = (Y + j) % self.MAP_SIZE
-                        if self.isPosValid(Vector(tX, tY), code):
-                            flag = True
-                            break
-                    if flag:
-                        break
-                X, Y = tX, tY
-            # 随机确定一个非障碍的位置，生成新的生物
-            else:
-                while not self.isPosValid(Vector(X, Y), code):
-                    X, Y = (int)(random.uniform(0, self.MAP_SIZE)), (int)(
-                        random.uniform(0, self.MAP_SIZE)
-                    )
+            pos = self.occupancy.sampleFree(code, self.rng)
+            if pos == None:
+                return None
+            X, Y = pos
         # tx,ty不均为-1时，在地图内以(tx,ty)为中心，按正态分布概率
         # 确定一个非障碍的位置,随机生成一个编码为code的生物
         else:
@@ -150,134 +265,242 @@ class Control:
             if retries >= RETRY_TIMES:
                 return None
         # print(f"繁殖 - 母体位置：({X0}, {Y0})，子体位置：({X}, {Y})")
-        self.CreLoc[code][Y][X] = 1
+        return self.spawn(code, X, Y)
+
+    # 在已经确定可以落脚的 (X, Y) 生成一个编码为 code 的生物
+    def spawn(self, code, X, Y):
+        self.occupancy.markOne(code, X, Y)
         # print(f"new creature {code} at ({X},{Y})")
-        newCreature = Creature(
-            prop[code]["mEnergy"],
-            prop[code]["Speed"],
-            prop[code]["life"],
+        newCreature = (Creature if self.stores == None else self.stores[code].add)(
+            self.prop[code]["mEnergy"],
+            self.prop[code]["Speed"],
+            self.prop[code]["life"],
             X,
             Y,
-            prop[code]["cost"],
-            prop[code]["rate"],
+            self.prop[code]["cost"],
+            self.prop[code]["rate"],
             type=code,
         )
 
+        self.spatial[code].insert(newCreature)
+
         # print(newCreature)
         return newCreature
 
+    # 把新生物加入物种列表；按列存储时 PopulationStore.add 已经加过了
+    def register(self, creature):
+        if self.stores == None:
+            self.CreatureLst[creature.type].append(creature)
+
     def dayPass(self):
         """
-        在用decision决定下一步时，希望获得的返回值是“目标坐标”
-        随后根据“目标坐标”，结合生物自身位置、速度，利用A*计算最终位置
-        然后在timePass里检查是否饿死/自然死亡
-        然后删去已经死亡的生物
-
-        整个过程从tiger->cow->grass进行处理，保证先由高级捕食者将猎物吃掉，
-        随后被吃掉的猎物就不需要进行寿命/能量的判定了
-        同时先删掉了死去的tiger，那么cow在逃跑时就不会被这些死去的tiger干扰了
-        最后的繁殖过程只对现存的生物进行处理，生成的下一代的初始位置是符合以母体生物为中心正态分布的
+        按阶段推进一个周期，见 TickScheduler：
+        感知（同步草的距离场与危险场）→ 决策（老虎、牛提交移动目标、寻路请求与进食）
+        → 结算移动（统一求解寻路请求后移动）→ 进食 → 老化（先虎后牛再草，清除死亡的生物）
+        → 繁殖（只对现存的生物进行）
+        每个阶段完成后才开始下一个阶段，dayPass 返回时整个周期已经结束
         """
+        self.scheduler.tick()
 
-        # self.printmarker(0)
-        # self.printmarker(1)
-        # self.printmarker(2)
-
-        def TigerAction(i):
-            nextPos = self.CreatureLst[0][i].pos
-            nextPos = self.decisionForPredator(
-                self.CreatureLst[0][i], self.CreatureLst[1]
+    # 一个物种的所有生物都经过一个周期，死亡的一次性清除位置标记并移出列表
+    def agePass(self, code):
+        if code == 2 and self.grassModel == "field":
+            self.CreatureLst[2].step()
+            return
+        if self.stores != None:
+            self.agePassColumnar(code)
+            return
+        alive, dead = [], []
+        for creature in self.CreatureLst[code]:
+            if creature.timePass():
+                alive.append(creature)
+            else:
+                dead.append(creature)
+        if len(dead) != 0:
+            self.occupancy.unmark(
+                code, [c.pos.X for c in dead], [c.pos.Y for c in dead]
             )
-            self.CreLoc[0][self.CreatureLst[0][i].pos.Y][
-                self.CreatureLst[0][i].pos.X
-            ] = 0
-            self.CreLoc[0][nextPos.Y][nextPos.X] = 1
-            # print(
-            #    f"Tiger at ({self.CreatureLst[0][i].pos.X},{self.CreatureLst[0][i].pos.Y}) move to ({nextPos.X},{nextPos.Y})")
-            self.CreatureLst[0][i].moveTo(nextPos)
-
-            # print(f"{tiger} 移动到 {nextPos}")
-
-        def CowAction(i):
-            if not self.CreatureLst[1][i].dead:
-                # nextPos=self.CreatureLst[1][i].pos
-                nextPos = self.decisionForPrey(
-                    self.CreatureLst[1][i], self.CreatureLst[2], self.CreatureLst[0]
+            for creature in dead:
+                creature.planner = None
+                self.spatial[code].remove(creature)
+        self.CreatureLst[code] = alive
+
+    # 按列存储时的 agePass：整列老化、按死亡掩码清除位置标记，再压缩掉死亡的行
+    def agePassColumnar(self, code):
+        store = self.stores[code]
+        with store.lock:
+            alive = store.timePass()
+            deadRows = np.flatnonzero(~alive)
+            if len(deadRows) != 0:
+                self.occupancy.unmark(
+                    code,
+                    store.column("x")[deadRows],
+                    store.column("y")[deadRows],
                 )
-                self.CreLoc[1][self.CreatureLst[1][i].pos.Y][
-                    self.CreatureLst[1][i].pos.X
-                ] = 0
-                self.CreLoc[1][nextPos.Y][nextPos.X] = 1
-                # print(
-                #    f"Cow at ({self.CreatureLst[1][i].pos.X},{self.CreatureLst[1][i].pos.Y}) move to ({nextPos.X},{nextPos.Y})")
-                self.CreatureLst[1][i].moveTo(nextPos)
-
-        # tiger
-
-        def TigerProcess():
-            t001 = time()
-            tigerNum = len(self.CreatureLst[0])
-            for i in range(tigerNum):
-                threading.Thread(target=TigerAction, args=(i,)).start()
-            temp = []
-            for tiger in self.CreatureLst[0]:
-                if tiger.timePass():
-                    temp.append(tiger)
-                else:
-                    self.CreLoc[0][tiger.pos.Y][tiger.pos.X] = 0
-                    # print(f"Tiger at ({tiger.pos.X},{tiger.pos.Y}) died")
-            self.CreatureLst[0] = temp
-            # print("tiger 决策耗时：", (time() - t001))
-
-        # cow
-        def CowProcess():
-            t002 = time()
-            cowNum = len(self.CreatureLst[1])
-            for i in range(cowNum):
-                threading.Thread(target=CowAction, args=(i,)).start()
-            temp = []
-            for cow in self.CreatureLst[1]:
-                if cow.timePass():
-                    temp.append(cow)
-                else:
-                    self.CreLoc[1][cow.pos.Y][cow.pos.X] = 0
-                    # print(f"Cow at ({cow.pos.X},{cow.pos.Y}) died")
-            self.CreatureLst[1] = temp
-            # print("cow 决策耗时：", (time() - t002))
-
-        # grass
-        temp = []
-        for grass in self.CreatureLst[2]:
-            if grass.timePass():
-                temp.append(grass)
-            else:
-                self.CreLoc[2][grass.pos.Y][grass.pos.X] = 0
-                # print(f"Grass at ({grass.pos.X},{grass.pos.Y}) died")
-        self.CreatureLst[2] = temp
-        # 存活的生物进行繁殖
+            for creature in store.compact():
+                creature.planner = None
+                self.spatial[code].remove(creature)
+            self.CreatureLst[code] = store.views
+
+    # 吃掉食物：决策阶段先记下来，到进食阶段再吃
+    def feed(self, eater, food):
+        if self.eatQueue != None:
+            self.eatQueue.append((eater, food))
+        else:
+            eater.eat(food)
 
-        threading.Thread(target=TigerProcess).start()
-        threading.Thread(target=CowProcess).start()
-        threading.Thread(target=self.AllCreatureReproduce).start()
+    # 第 code 个物种列表中下标为 index 的生物接下来决策所用的随机数
+    def useRandomFor(self, code, index):
+        if self.tickSeed == None:
+            self.random = random
+        else:
+            self.random = random.Random(f"{self.tickSeed}:{code}:{index}")
+
+    # 移动一只生物，同时更新位置标记
+    def moveCreature(self, creature: Creature, nextPos: Vector):
+        self.occupancy.moveOne(
+            creature.type, creature.pos.X, creature.pos.Y, nextPos.X, nextPos.Y
+        )
+        creature.moveTo(nextPos)
+        self.spatial[creature.type].move(creature, creature.pos.X, creature.pos.Y)
+
+    # 同一物种的一批移动 [(生物, 目标位置或 None), ...] 一起结算：
+    # 目标不能落脚或与别的生物抢同一格落败的留在原地，位置标记一次更新
+    def applyMoves(self, code, moves):
+        moves = [(creature, pos) for creature, pos in moves if pos is not None]
+        if len(moves) == 0:
+            return
+        creatures = [creature for creature, _ in moves]
+        Xs = np.array([creature.pos.X for creature in creatures], dtype=np.int64)
+        Ys = np.array([creature.pos.Y for creature in creatures], dtype=np.int64)
+        nXs = np.array([pos.X for _, pos in moves], dtype=np.int64)
+        nYs = np.array([pos.Y for _, pos in moves], dtype=np.int64)
+        moved = resolveMoves(
+            self.occupancy,
+            code,
+            Xs,
+            Ys,
+            nXs,
+            nYs,
+            self.movePolicy,
+            energy=(
+                [creature.energy for creature in creatures]
+                if self.movePolicy == "energy"
+                else None
+            ),
+            rng=self.rng,
+        )
+        self.occupancy.move(code, Xs[moved], Ys[moved], nXs[moved], nYs[moved])
+        self.metrics.count("moves", int(np.count_nonzero(moved)))
+        self.metrics.count(
+            "moveConflicts", int(np.count_nonzero(((Xs != nXs) | (Ys != nYs)) & ~moved))
+        )
+        for i in np.flatnonzero(moved).tolist():
+            creature = creatures[i]
+            creature.moveTo(moves[i][1])
+            self.spatial[code].move(creature, creature.pos.X, creature.pos.Y)
 
     # 对所有生物进行繁殖
+    # 一个物种整体繁殖。原来逐个生物抽样时，每生一只种群数量加一、出生概率随之下降；
+    # 这里按同样的分布直接抽出哪些生物会繁殖：出生概率只在种群数量变化时算一次，
+    # 不在地图边缘的生物里下一个繁殖者之前的失败次数服从几何分布，一次抽出。
+    # 新生数不超过 maxCreatureNum，本周期新出生的生物不参与繁殖
     def SingleCreatureReproduce(self, creature_type, CreatureLst):
-        def reproduce(creature: Creature):
-            if len(self.CreatureLst[creature_type]) >= maxCreatureNum[creature_type]:
-                return
-            if creature.shouldReproduce(CreatureLst):
-                # 最耗时的部分是在 create_new 这里
-                newcre = self.create_new(creature.type, creature.pos.X, creature.pos.Y)
-                if newcre != None:
-                    self.CreatureLst[creature.type].append(newcre)
+        if creature_type not in [0, 1, 2]:
+            return
+        creatureLst = CreatureLst[creature_type]
+        room = self.maxCreatureNum[creature_type] - len(creatureLst)
+        if len(creatureLst) == 0 or room <= 0:
+            return
+        # 与 Creature.shouldReproduce 相同的边缘判定
+        edgeSize = self.MAP_SIZE // 8
+
+        # 网格化的草：母株是随机挑的，新草长在母株旁边
+        if isinstance(creatureLst, GrassField):
+            Xs, Ys = creatureLst.eligible(edgeSize)
+            births = len(self.drawParents(2, len(creatureLst), len(Xs), room))
+            chosen = self.rng.choice(len(Xs), size=births, replace=False)
+            creatureLst.spread(Xs[chosen], Ys[chosen])
+            return
+
+        Xs, Ys, _, _ = self.creatureArrays(creature_type, creatureLst)
+        Xs, Ys = Xs.copy(), Ys.copy()
+        eligible = np.flatnonzero(self.canReproduceAt(Xs, Ys))
+        parents = eligible[
+            self.drawParents(creature_type, len(Xs), len(eligible), room)
+        ]
+        if len(parents) == 0:
+            return
 
-        if creature_type in [0, 1, 2]:
-            for c in self.CreatureLst[creature_type]:
-                reproduce(c)
+        # 生物容量过大时，逐个放在母体附近最近的空格
+        if len(creatureLst) >= self.occupancy.openCells * 0.7:
+            for parent in parents.tolist():
+                newcre = self.create_new(
+                    creature_type, int(Xs[parent]), int(Ys[parent])
+                )
+                if newcre != None:
+                    self.register(newcre)
+            return
+        for X, Y in self.placeNewborns(creature_type, Xs[parents], Ys[parents]):
+            self.register(self.spawn(creature_type, X, Y))
+
+    # 位于 (Xs, Ys) 的生物是否可以繁殖：与 Creature.shouldReproduce 相同，地图边缘的不繁殖
+    def canReproduceAt(self, Xs, Ys):
+        edgeSize = self.MAP_SIZE // 8
+        return (
+            (Xs >= edgeSize)
+            & (Xs < self.MAP_SIZE - edgeSize)
+            & (Ys >= edgeSize)
+            & (Ys < self.MAP_SIZE - edgeSize)
+        )
 
-        # for creature in self.CreatureLst[creature_type]:
-        # threading.Thread(target=reproduce, args=(creature,)).start()
-        #    reproduce(creature)
+    # 种群数量为 number、有 eligibleCount 只生物可以繁殖时，按顺序抽出繁殖者的下标，
+    # 最多 room 只。每生一只数量加 step（通常是一），概率随之重新计算
+    def drawParents(self, code, number, eligibleCount, room, step=1):
+        parents = []
+        i = 0
+        while len(parents) < room:
+            probability = self.birthProbability(code, number)
+            if probability <= 0:
+                break
+            i += int(self.rng.geometric(probability)) - 1
+            if i >= eligibleCount:
+                break
+            parents.append(i)
+            number += step
+            i += 1
+        return np.array(parents, dtype=np.int64)
+
+    # 种群数量为 number 时每只生物的繁殖概率，与 Creature.shouldReproduce 相同
+    def birthProbability(self, code, number):
+        excess = number - self.initNum[code]
+        # 数量远超初始值时 exp 会溢出，概率视为 0
+        return 0.0 if excess > 700 else 1 / (1 + math.exp(excess))
+
+    # 以各母体为中心按正态分布一起为新生物挑位置，返回 [(X, Y), ...]。
+    # 每轮只保留落在空格上、且不与本轮其他新生物或已选位置重叠的（重叠时排在前面的母体优先），
+    # 其余的再抽一次，最多 RETRY_TIMES 轮，仍没有位置的就不生了
+    def placeNewborns(self, code, Xs, Ys):
+        size = self.MAP_SIZE
+        pending = np.arange(len(Xs))
+        placed = np.full(len(Xs), -1, dtype=np.int64)
+        for _ in range(RETRY_TIMES):
+            if len(pending) == 0:
+                break
+            offsets = self.rng.normal(0, 0.5, (2, len(pending))) * size * 0.5
+            # 与 int() 一样向零取整
+            cX = (Xs[pending] + offsets[0]).astype(np.int64)
+            cY = (Ys[pending] + offsets[1]).astype(np.int64)
+            ok = self.occupancy.validMask(code, cX, cY)
+            cells = cY * size + cX
+            ok &= ~np.isin(cells, placed)
+            candidates = np.flatnonzero(ok)
+            _, first = np.unique(cells[candidates], return_index=True)
+            winners = candidates[first]
+            placed[pending[winners]] = cells[winners]
+            pending = np.delete(pending, winners)
+        cells = placed[placed != -1]
+        return list(zip((cells % size).tolist(), (cells // size).tolist()))
 
     def AllCreatureReproduce(self):
         # 次序不限
@@ -298,11 +521,7 @@ class Control:
     def printmarker(self, code):
         if code not in [0, 1, 2]:
             return
-        toprint = []
-        for i in range(0, self.MAP_SIZE):
-            for j in range(0, self.MAP_SIZE):
-                if (self.CreLoc[code][i][j]) == 1:
-                    toprint.append((j, i))
+        toprint = [(X, Y) for Y, X in np.argwhere(self.CreLoc[code] != 0)]
         print(toprint)
         toprintcre = []
         for c in self.CreatureLst[code]:
@@ -310,86 +529,146 @@ class Control:
         print(toprintcre)
 
     def ClearPos(self, code):
-        self.CreLoc[code] = [[0] * self.MAP_SIZE for _ in range(self.MAP_SIZE)]
+        self.occupancy.clear(code)
+        self.spatial[code].clear()
 
     def isPosValid(self, pos, creature_type):
-        if pos.X < 0 or pos.X >= MAP_SIZE:
-            return False
-        if pos.Y < 0 or pos.Y >= MAP_SIZE:
-            return False
-        if self.BarrierMap[pos.Y][pos.X] == 1:
-            return False
-
-        if creature_type == 0:  # 老虎
-            if self.CreLoc[0][pos.Y][pos.X] == 1:
-                return False
-        if creature_type == 1:  # 牛
-            if self.CreLoc[1][pos.Y][pos.X] == 1:
-                return False
-            if self.CreLoc[0][pos.Y][pos.X] == 1:
-                return False
-        if creature_type == 2:  # 草
-            if self.CreLoc[2][pos.Y][pos.X] == 1:
-                return False
-        return True
+        return self.occupancy.isValid(creature_type, pos.X, pos.Y)
+
+    # 物种 code 在 pos 周围 radius 范围内的候选生物（按 CreatureLst 中的顺序），
+    # 不用空间索引时就是整个列表
+    def nearby(self, code, creatureLst, pos, radius):
+        if isinstance(creatureLst, GrassField):
+            return creatureLst.cellsInRange(pos.X, pos.Y, radius)
+        if not self.useSpatialIndex:
+            return creatureLst
+        return self.spatial[code].query(pos.X, pos.Y, radius)
+
+    # 让草的距离场与当前存活的草同步，只更新有变化的格子
+    def syncGrassField(self):
+        if self.grassField == None:
+            return
+        if self.grassModel == "field":
+            with self.grassLock:
+                self.grassField.sync(self.CreatureLst[2].presence)
+            return
+        presence = np.zeros((self.MAP_SIZE, self.MAP_SIZE), dtype=bool)
+        self.grassAt = {}
+        for i, grass in enumerate(self.CreatureLst[2]):
+            if not grass.dead:
+                presence[grass.pos.Y, grass.pos.X] = True
+                self.grassAt[(grass.pos.X, grass.pos.Y)] = (i, grass)
+        with self.grassLock:
+            self.grassField.sync(presence)
+
+    # 用当前老虎的位置重建危险场
+    def syncDangerField(self):
+        if self.dangerField == None:
+            return
+        Xs, Ys, speeds, _ = self.creatureArrays(0, self.CreatureLst[0])
+        self.dangerField.update(Xs, Ys, speeds)
+
+    # pos 周围 range 范围内每只老虎相对 pos 的方向
+    def predatorDirections(self, pos, PredatorLst, range):
+        return [
+            pos.direction(predator.pos)
+            for predator in self.nearby(0, PredatorLst, pos, range)
+            if pos.inRange(predator.pos, range)
+        ]
+
+    # 牛沿草的距离场找草：身旁有草就原地吃，视野内有草就往下降方向走，
+    # 都没有则返回 None，交给调用者随机移动
+    def seekGrass(self, prey: Creature):
+        X, Y = prey.pos.X, prey.pos.Y
+        with self.grassLock:
+            distance = self.grassField.distanceAt(X, Y)
+            if distance <= 1 and self.grassModel == "field":
+                # 网格化的草：吃掉身旁按行优先最靠前的那一格
+                nearby = self.CreatureLst[2].cellsInRange(X, Y, 1)
+                if len(nearby) != 0:
+                    self.feed(prey, nearby[0])
+                    self.grassField.removeSource(nearby[0].X, nearby[0].Y)
+                    return prey.pos
+            elif distance <= 1:
+                # 有多棵草相邻时，和原来一样吃掉列表中最靠前的那棵
+                nearby = [
+                    self.grassAt[(X + dX, Y + dY)]
+                    for dX in (-1, 0, 1)
+                    for dY in (-1, 0, 1)
+                    if (X + dX, Y + dY) in self.grassAt
+                ]
+                if len(nearby) != 0:
+                    _, grass = min(nearby, key=lambda item: item[0])
+                    self.feed(prey, grass)
+                    del self.grassAt[(grass.pos.X, grass.pos.Y)]
+                    self.grassField.removeSource(grass.pos.X, grass.pos.Y)
+                    return prey.pos
+            if distance > preyVisibleRange:
+                return None
+            return Vector(*self.grassField.descend(X, Y, prey.speed))
 
     # @timeit
     # A* 寻路调用函数
-    def findPath(self, startPos: Vector, endPos: Vector, steps):
-        self.spmap.setStartEnd(startPos, endPos)
-        self.spmap.process()
-
-        if self.spmap.foundEndNode == None:
+    # strategy 可选 bfs、dijkstra、astar、jps、hpa，不传则使用 self.pathStrategy
+    # 传入 planner（ChasePlanner）时改用它做增量寻路，搜索状态会跨周期保留
+    def findPath(
+        self, startPos: Vector, endPos: Vector, steps, strategy=None, planner=None
+    ):
+        strategy = strategy if strategy != None else self.pathStrategy
+        self.metrics.count("pathSearches")
+        if planner != None:
+            path = planner.plan(startPos, endPos)
+            self.metrics.count("nodesExpanded", planner.expandedCount)
+        elif strategy == "hpa" and self.hpamap != None:
+            # 分层寻路只细化出走 steps 步所需的那一段路径
+            path = self.hpamap.pathPrefix(startPos, endPos, steps + 1)
+        else:
+            spmap = self.getSpMap()
+            spmap.setStartEnd(startPos, endPos)
+            spmap.search(strategy if strategy != "hpa" else "astar")
+            self.metrics.count("nodesExpanded", spmap.expandedCount)
+            path = spmap.pathPositions() if spmap.foundEndNode != None else None
+        return self.stepAlong(path, startPos, endPos, steps)
+
+    # 沿逐格路径（含起点）最多走 steps 步，不会走到终点上；没有路径则留在原地
+    def stepAlong(self, path, startPos, endPos, steps):
+        if path == None:
             # print("没有找到路径")  # 没有找到路径
             return startPos
-        else:
-            nodes = []
-            node = self.spmap.foundEndNode  # 一个结点
-            if node == None:
-                return startPos
-            else:
-                while node != None:
-                    nodes.append(node)
-                    node = node.frontNode  # 之后这里可能可以优化
 
-                for nodeTmp in nodes[::-1]:
-                    if nodeTmp.pos == startPos or nodeTmp.pos == endPos:
-                        continue
-                    # plt.pause(0.05)
-                    startPos.X, startPos.Y = nodeTmp.pos.X, nodeTmp.pos.Y
-
-                    if steps == 1:
-                        break
-                    else:
-                        steps -= 1
-
-            # nextPos = nodes[(-1) * steps - 1]
-            return Vector(startPos.X, startPos.Y)
+        # 去掉起点和终点，沿路径最多走 steps 步
+        path = path[1:]
+        if len(path) != 0 and path[-1] == endPos:
+            path.pop()
+        if len(path) == 0:
+            return startPos
+        nextPos = path[min(steps, len(path)) - 1]
+        return Vector(nextPos.X, nextPos.Y)
+
+    # 当前线程自己的 spMap
+    def getSpMap(self):
+        spmap = getattr(self.spLocal, "spmap", None)
+        if spmap == None or spmap.mapsize != self.MAP_SIZE:
+            spmap = spMap(self.MAP_SIZE, self.BarrierMap)
+            self.spLocal.spmap = spmap
+        return spmap
+
+    # 决策时的寻路：有 broker 时只提交请求、返回票据，否则立即寻路
+    def requestPath(self, broker, startPos, endPos, steps, planner=None):
+        if broker == None:
+            return self.findPath(startPos, endPos, steps, planner=planner)
+        return broker.submit(startPos, endPos, steps, planner=planner)
 
     # 创建search list时判断能量是否归零：避免该猎物已经被吃掉
-    def decisionForPredator(self, predator: Creature, PreyLst):
+    # broker 不为空时，返回值可能是尚未结算的 PathTicket
+    def decisionForPredator(self, predator: Creature, PreyLst, broker=None):
         predatorPos = Vector(predator.pos.X, predator.pos.Y)
         predatorSpeed = predator.speed
         eatRange = 2
-        predatorVisibleRange = 10
         # 环境内无猎物：随机移动
         if len(PreyLst) == 0:
-            nextPos = (
-                Vector(*Vector.moveIncrement[random.randint(0, 7)]) * predatorSpeed
-                + predatorPos
-            )
-            retries = 0
-            while not self.isPosValid(nextPos, 0) and retries < RETRY_TIMES:
-                retries += 1
-                nextPos = (
-                    Vector(*Vector.moveIncrement[random.randint(0, 7)]) * predatorSpeed
-                    + predatorPos
-                )
-            if retries >= RETRY_TIMES:
-                return predatorPos
-            return nextPos
+            return self.randomStep(predatorPos, predatorSpeed, 0)
 
-        t004 = time()
         preySearchLst = [
             {
                 "entity": prey,
@@ -397,25 +676,13 @@ class Control:
                 "huntingTime": predatorPos.distance2(prey.pos)
                 / (predator.speed - prey.speed) ** 2,
             }
-            for prey in PreyLst
+            for prey in self.nearby(1, PreyLst, predatorPos, predatorVisibleRange)
             if prey.pos.inRange(predatorPos, predatorVisibleRange) and prey.energy > 0
         ]
 
         if len(preySearchLst) == 0:
-            nextPos = (
-                Vector(*Vector.moveIncrement[random.randint(0, 7)]) * predatorSpeed
-                + predatorPos
-            )
-            retries = 0
-            while not self.isPosValid(nextPos, 0) and retries < RETRY_TIMES:
-                retries += 1
-                nextPos = (
-                    Vector(*Vector.moveIncrement[random.randint(0, 7)]) * predatorSpeed
-                    + predatorPos
-                )
-            if retries >= RETRY_TIMES:
-                return predatorPos
-            return nextPos
+            predator.planner = None
+            return self.randomStep(predatorPos, predatorSpeed, 0)
 
         # preySearchLst.sort(key=lambda x: x["distance"])
 
@@ -426,21 +693,21 @@ class Control:
         for i, item in enumerate(preySearchLst):
             if item["distance"] <= eatRange:
                 # print(f'{predator} 吃掉 {item["entity"]}')
-                predator.eat(item["entity"])
-                # print("创建 preySearchLst 耗时：", (time() - t004)  * 1000)
+                self.feed(predator, item["entity"])
                 return predatorPos
             if item["huntingTime"] < huntingTime:
                 huntingTime = item["huntingTime"]
                 preyToHuntIdx = i
 
-        # print("创建 preySearchLst 耗时：", (time() - t004)  * 1000)
+        # 换了追捕目标就丢掉旧的寻路器，继续追同一只猎物则复用
+        target = preySearchLst[preyToHuntIdx]["entity"]
+        if predator.planner == None or predator.planner.target is not target:
+            predator.planner = ChasePlanner(self.MAP_SIZE, self.BarrierMap, target)
 
-        t005 = time()
-        nextPos = self.findPath(
-            predatorPos, preySearchLst[preyToHuntIdx]["entity"].pos, predatorSpeed
+        nextPos = self.requestPath(
+            broker, predatorPos, target.pos, predatorSpeed, planner=predator.planner
         )
 
-        # print("老虎寻路耗时：", (time() - t005)  * 1000)
         # print(
         #     f'{predator} 正在追赶 {preySearchLst[preyToHuntIdx]["entity"]}，其下一步位置是 {nextPos}'
         # )
@@ -448,15 +715,107 @@ class Control:
         # print(f'虎距离牛的距离^2为 {preySearchLst[preyToHuntIdx]["distance"]}')
 
         if 2 < preySearchLst[preyToHuntIdx]["distance"] <= 9:
-            predator.eat(preySearchLst[preyToHuntIdx]["entity"])
+            self.feed(predator, preySearchLst[preyToHuntIdx]["entity"])
 
         return nextPos
 
-    def decisionForPrey(self, prey: Creature, grassLst: list, PredatorLst: list):
+    # 物种 code 的 (X, Y, 速度, 能量) 数组，按列存储时直接取列
+    def creatureArrays(self, code, creatureLst):
+        if self.stores != None and creatureLst is self.stores[code].views:
+            store = self.stores[code]
+            return (
+                store.column("x"),
+                store.column("y"),
+                np.full(len(store), self.prop[code]["Speed"]),
+                store.column("energy"),
+            )
+        n = len(creatureLst)
+        return (
+            np.fromiter((c.pos.X for c in creatureLst), np.int64, n),
+            np.fromiter((c.pos.Y for c in creatureLst), np.int64, n),
+            np.fromiter((c.speed for c in creatureLst), np.float64, n),
+            np.fromiter((c.energy for c in creatureLst), np.float64, n),
+        )
+
+    # 物种 code 所有生物的位置 (Xs, Ys)，网格化的草直接从网格取
+    def positions(self, code):
+        if code == 2 and self.grassModel == "field":
+            Ys, Xs = np.nonzero(self.CreatureLst[2].presence)
+            return Xs, Ys
+        if self.stores != None:
+            return self.stores[code].column("x"), self.stores[code].column("y")
+        creatureLst = self.CreatureLst[code]
+        n = len(creatureLst)
+        return (
+            np.fromiter((c.pos.X for c in creatureLst), np.int64, n),
+            np.fromiter((c.pos.Y for c in creatureLst), np.int64, n),
+        )
+
+    # 所有老虎一起决策：选哪只牛、吃不吃由 hunting.huntDecisions 一次算出，
+    # 之后按老虎的顺序随机移动或提交寻路，结果与逐只调用 decisionForPredator 相同
+    def decisionsForPredators(self, PredatorLst, PreyLst, broker=None):
+        if len(PreyLst) == 0:
+            decisions = []
+            for i, predator in enumerate(PredatorLst):
+                self.useRandomFor(0, i)
+                decisions.append(self.decisionForPredator(predator, PreyLst, broker))
+            return decisions
+        tX, tY, tSpeed, _ = self.creatureArrays(0, PredatorLst)
+        cX, cY, cSpeed, cEnergy = self.creatureArrays(1, PreyLst)
+        actions, targets = hunting.huntDecisions(
+            tX,
+            tY,
+            tSpeed,
+            cX,
+            cY,
+            cSpeed,
+            cEnergy,
+            predatorVisibleRange,
+            exclusive=self.exclusiveHunting,
+        )
+        decisions = []
+        for i, (predator, action, target) in enumerate(
+            zip(PredatorLst, actions.tolist(), targets.tolist())
+        ):
+            self.useRandomFor(0, i)
+            predatorPos = Vector(predator.pos.X, predator.pos.Y)
+            if action == hunting.WANDER:
+                predator.planner = None
+                decisions.append(self.randomStep(predatorPos, predator.speed, 0))
+                continue
+            prey = PreyLst[target]
+            if action == hunting.EAT:
+                self.feed(predator, prey)
+                decisions.append(predatorPos)
+                continue
+            if predator.planner == None or predator.planner.target is not prey:
+                predator.planner = ChasePlanner(self.MAP_SIZE, self.BarrierMap, prey)
+            decisions.append(
+                self.requestPath(
+                    broker,
+                    predatorPos,
+                    prey.pos,
+                    predator.speed,
+                    planner=predator.planner,
+                )
+            )
+            if action == hunting.CHASE_EAT:
+                self.feed(predator, prey)
+        return decisions
+
+    # 朝 directions 中随机一个方向走 speed 步，能否落脚留到移动结算时统一判定
+    def randomStep(self, pos, speed, code, directions=range(8)):
+        return (
+            Vector(*Vector.moveIncrement[self.random.choice(directions)]) * speed + pos
+        )
+
+    def decisionForPrey(
+        self, prey: Creature, grassLst: list, PredatorLst: list, broker=None
+    ):
         preyPos = Vector(prey.pos.X, prey.pos.Y)
         preySpeed = prey.speed
         preyEnergy = prey.energy
-        range = 7
+        range = preyVisibleRange
         predatorSearchLst = []
         dangerLevelLst = []
         predatorDirectionLst = []
@@ -489,14 +848,17 @@ class Control:
                     escapeDirection, preySpeed + i, reverse=True
                 )
                 # 极端情况，为了避免程序崩溃，返回 prey 原来的位置，不做任何操作
-                if escapePos.X >= self.MAP_SIZE or escapePos.Y >= self.MAP_SIZE:
+                if not (
+                    0 <= escapePos.X < self.MAP_SIZE
+                    and 0 <= escapePos.Y < self.MAP_SIZE
+                ):
                     return preyPos
                 i += 1
 
             # 找到了合适的 escapePos，对此进行寻路找到走下一步的点
             # print(f"逃离位置：{escapePos}有效，进行AStar寻路")
             # print(f"猎物速度：{preySpeed}")
-            nextPos = self.findPath(preyPos, escapePos, preySpeed)
+            nextPos = self.requestPath(broker, preyPos, escapePos, preySpeed)
             # print(f"寻路结果，下一步位置：{nextPos}")
             return nextPos
 
@@ -506,23 +868,15 @@ class Control:
         if (
             not predFlag
         ):  # 如果没有捕食者就随机移动  就退出 不然死循环 修改测试bylw-------------------------------------
-            nextPos = (
-                Vector(*Vector.moveIncrement[random.randint(0, 7)]) * preySpeed
-                + preyPos
-            )
-            retries = 0
-            while not self.isPosValid(nextPos, 1) and retries < RETRY_TIMES:
-                retries += 1
-                nextPos = (
-                    Vector(*Vector.moveIncrement[random.randint(0, 7)]) * preySpeed
-                    + preyPos
-                )
-            if retries >= RETRY_TIMES:
-                return preyPos
-            return nextPos
-
-        if predFlag:
-            for i, predator in enumerate(PredatorLst):
+            return self.randomStep(preyPos, preySpeed, 1)
+
+        # 有危险场时直接查出视野内老虎的只数、危险水平与逃跑方向，
+        # 各只老虎的方向只在下面需要判断安全方向时才逐只计算
+        danger = None
+        if predFlag and self.dangerField != None:
+            danger = self.dangerField.at(preyPos.X, preyPos.Y, preySpeed)
+        elif predFlag:
+            for predator in self.nearby(0, PredatorLst, preyPos, range):
                 # print(predator)
                 if prey.pos.inRange(predator.pos, range):
                     dangerLevelLst.append(
@@ -534,23 +888,12 @@ class Control:
                     predatorDirectionLst.append(prey.pos.direction(predator.pos))
 
         if not grasFlag:  # 如果草都灭绝了就随机移动
-            nextPos = (
-                Vector(*Vector.moveIncrement[random.randint(0, 7)]) * preySpeed
-                + preyPos
-            )
-            retries = 0
-            while not self.isPosValid(nextPos, 1) and retries < RETRY_TIMES:
-                retries += 1
-                nextPos = (
-                    Vector(*Vector.moveIncrement[random.randint(0, 7)]) * preySpeed
-                    + preyPos
-                )
-            if retries >= RETRY_TIMES:
-                return preyPos
-            return nextPos
+            return self.randomStep(preyPos, preySpeed, 1)
+
+        inDanger = danger[0] != 0 if danger != None else len(dangerLevelLst) != 0
 
         # 没有危险，牛要找草吃了
-        if len(dangerLevelLst) == 0:
+        if not inDanger:
             # 体力值都是满的，我睡个觉先
             if preyEnergy == mEnergy:
                 return preyPos
@@ -561,54 +904,51 @@ class Control:
                 infinityDistance = 9999
                 grassDistance = infinityDistance
 
-                # 所有的草
-                for i, grass in enumerate(grassLst):
-                    # 视野内的草
-                    if prey.pos.inRange(grass.pos, range):
-                        # 在牛身旁的草
-                        if prey.pos.distance2(grass.pos) <= 2:
-                            # 牛原地吃草
-                            prey.eat(grass)
-                            return prey.pos
-
-                        # 不在我身旁，当我能看到的草。找到最近的草
-                        if prey.pos.distance2(grass.pos) < grassDistance**2:
-                            grassIdx = i
-                            grassDistance = prey.pos.distance2(grass.pos)
+                # 有距离场时直接沿距离场找草，视野内没有草才走到下面的随机移动
+                if self.grassField != None:
+                    nextPos = self.seekGrass(prey)
+                    if nextPos is not None:
+                        return nextPos
+                else:
+                    # 所有的草
+                    for grass in self.nearby(2, grassLst, preyPos, range):
+                        # 视野内的草
+                        if prey.pos.inRange(grass.pos, range):
+                            # 在牛身旁的草
+                            if prey.pos.distance2(grass.pos) <= 2:
+                                # 牛原地吃草
+                                self.feed(prey, grass)
+                                return prey.pos
+
+                            # 不在我身旁，当我能看到的草。找到最近的草
+                            if prey.pos.distance2(grass.pos) < grassDistance**2:
+                                targetGrass = grass
+                                grassDistance = prey.pos.distance2(grass.pos)
 
                 # 说明视野内没发现草，随机移动
                 # 牛牛近视了，视野范围太小，找不到草，要扩大视野范围额
                 if grassDistance == infinityDistance:
-                    nextPos = (
-                        Vector(*Vector.moveIncrement[random.randint(0, 7)]) * preySpeed
-                        + preyPos
-                    )
-                    retries = 0
-                    while not self.isPosValid(nextPos, 1) and retries < RETRY_TIMES:
-                        retries += 1
-                        nextPos = (
-                            Vector(*Vector.moveIncrement[random.randint(0, 7)])
-                            * preySpeed
-                            + preyPos
-                        )
-                    if retries >= RETRY_TIMES:
-                        return preyPos
-                    return nextPos
+                    return self.randomStep(preyPos, preySpeed, 1)
                 # 找到草了，牛开始寻路
                 elif grassDistance < infinityDistance:
-                    # print(f"{prey} 想吃草：{grassLst[grassIdx]}")
-                    nextPos = self.findPath(preyPos, grassLst[grassIdx].pos, preySpeed)
+                    # print(f"{prey} 想吃草：{targetGrass}")
+                    nextPos = self.requestPath(
+                        broker, preyPos, targetGrass.pos, preySpeed
+                    )
                     # print(f"猎物速度：{preySpeed}")
                     # print(f"通过AStar找草，下一步：{nextPos}")
                     return nextPos
 
         # 视野范围之内有捕食者。危险，快跑！
         # 要确定有多危险，便于后面权衡逃跑和吃草。同时确定逃跑的方向
-        elif len(dangerLevelLst) != 0:
+        elif inDanger:
             # print(f"{prey} 有危险，计算危险水平")
-            totalDangerLevel, escapeDirection = Vector.weightedSum(
-                dangerLevelLst, predatorDirectionLst, reverse=True
-            )
+            if danger != None:
+                _, totalDangerLevel, escapeDirection = danger
+            else:
+                totalDangerLevel, escapeDirection = Vector.weightedSum(
+                    dangerLevelLst, predatorDirectionLst, reverse=True
+                )
 
             # 牛牛体力还可以，先不吃草，逃命要紧
             if preyEnergy >= 0.4 * mEnergy:
@@ -620,6 +960,10 @@ class Control:
                 # 如果危险水平低的话，牛牛假定捕食者不是奔我而来
                 # 那么我，先苟活一波，找草吃
                 if totalDangerLevel < emergencyLevel:
+                    if danger != None:
+                        predatorDirectionLst = self.predatorDirections(
+                            prey.pos, PredatorLst, range
+                        )
                     predatorDirectionIdxLst = [
                         (
                             ((direction + Vector.radians202_5) % Vector.radians360)
@@ -647,14 +991,14 @@ class Control:
                     grassDistance = infinityDistance
 
                     # 所有的草
-                    for i, grass in enumerate(grassLst):
+                    for grass in self.nearby(2, grassLst, preyPos, range):
                         # 视野内的草
                         if prey.pos.inRange(grass.pos, range):
                             # 在牛身旁的草
                             if prey.pos.distance2(grass.pos) <= 2:
                                 # 牛原地吃草
                                 # print(f"{prey} 原地吃草")
-                                prey.eat(grass)
+                                self.feed(prey, grass)
                                 return prey.pos
 
                             # 不在牛身旁，但在牛视野范围内的草，并且符合这样的条件：
@@ -673,57 +1017,31 @@ class Control:
                                 )
                                 not in predatorDirectionIdxSet
                             ):
-                                grassIdx = i
+                                targetGrass = grass
                                 grassDistance = prey.pos.distance2(grass.pos)
 
                     # 说明视野内没发现草，往安全的方向随机移动
                     # 牛牛近视了，视野范围太小，找不到艹，要扩大视野范围
                     # 不扩大视野范围了，随机移动
                     if grassDistance == infinityDistance:
-                        nextPos = (
-                            Vector(
-                                *Vector.moveIncrement[
-                                    random.choice(
-                                        list(
-                                            set((0, 1, 2, 3, 4, 5, 6, 7)).difference(
-                                                predatorDirectionIdxSet
-                                            )
-                                        )
-                                    )
-                                ]
-                            )
-                            * preySpeed
-                            + preyPos
-                        )
-                        retries = 0
-                        while not self.isPosValid(nextPos, 1) and retries < RETRY_TIMES:
-                            retries += 1
-                            nextPos = (
-                                Vector(
-                                    *Vector.moveIncrement[
-                                        random.choice(
-                                            list(
-                                                set(
-                                                    (0, 1, 2, 3, 4, 5, 6, 7)
-                                                ).difference(predatorDirectionIdxSet)
-                                            )
-                                        )
-                                    ]
+                        return self.randomStep(
+                            preyPos,
+                            preySpeed,
+                            1,
+                            sorted(
+                                set((0, 1, 2, 3, 4, 5, 6, 7)).difference(
+                                    predatorDirectionIdxSet
                                 )
-                                * preySpeed
-                                + preyPos
-                            )
-                        if retries >= RETRY_TIMES:
-                            return preyPos
-                        return nextPos
+                            ),
+                        )
 
                     # 找到草了，牛开始寻路
                     if grassDistance < infinityDistance:
-                        nextPos = self.findPath(
-                            preyPos, grassLst[grassIdx].pos, preySpeed
+                        nextPos = self.requestPath(
+                            broker, preyPos, targetGrass.pos, preySpeed
                         )
                         # print(
-                        # f"{prey} 准备吃 {grassLst[grassIdx]}，其下一步位置是 {nextPos}")
+                        # f"{prey} 准备吃 {targetGrass}，其下一步位置是 {nextPos}")
                         return nextPos
 
                 # 情况特别紧急，不吃草，纯逃跑
@@ -5,6 +5,7 @@
 # 函数
 # 出生、 死亡、 捕食、 能量消耗、 随机移动(?)
 import random
+from itertools import count
 from vector import Vector
 import math
 
@@ -21,6 +22,8 @@ class Creature:
     INIT_COW_NUM = INIT_NUM[1] = 150
     INIT_GRASS_NUM = INIT_NUM[2] = 500
 
+    uidCounter = count()  # 生物编号，按出生先后递增
+
     def __init__(self, mEnergy, Speed, life, X, Y, cost, rate, type):
         self.energy = mEnergy / 3  # 当前体力值，初始化为最大值的三分之一
         self.maxEnergy = mEnergy  # 最大体力值maxEnergy(?被吃掉的话对面获得哪个呢
@@ -33,6 +36,8 @@ class Creature:
         self.dead = False
         self.type = type
         self.typeStr = Creature.TypeLst[type]
+        self.planner = None  # 捕食者追捕猎物时复用的增量寻路器
+        self.uid = next(Creature.uidCounter)
 
     def __str__(self) -> str:
         return f"{self.typeStr}（位置: {self.pos}，能量：{self.energy}，{'存活' if self.dead==False else '死亡'})"
@@ -50,7 +55,8 @@ class Creature:
         # print(f"捕食者是 {self}")
 
     # 繁殖函数（应不应该繁殖），对于个体，以一定概率进行繁殖
-    def shouldReproduce(self, CreatureLst):
+    # mapSize 为所在地图的边长，不传则使用 Creature.MAP_SIZE
+    def shouldReproduce(self, CreatureLst, mapSize=None):
         # if (
         #     self.energy > self.maxEnergy / 3
         #     and self.age > self.lifespan / 5
@@ -65,8 +71,8 @@ class Creature:
             / (1 + math.exp(len(CreatureLst[self.type]) - Creature.INIT_NUM[self.type]))
         )
 
-        mapSize = Creature.MAP_SIZE
-        edgeSize = Creature.MAP_SIZE // 8
+        mapSize = mapSize if mapSize != None else Creature.MAP_SIZE
+        edgeSize = mapSize // 8
 
         IN_CORNER = (
             (self.pos.X < edgeSize and self.pos.Y < edgeSize)
@@ -102,13 +108,14 @@ class Creature:
         return self.dead
 
     # 按平均分布随机设定年龄与能量水平，主要用在初始化的时候
-    def randomize(self, ageflag=True, energyflag=True):
+    # rng 可以换成 random.Random 或 numpy 的 Generator，以便复现
+    def randomize(self, ageflag=True, energyflag=True, rng=random):
         if ageflag:
             # self.age = abs((int)((self.lifespan * random.normalvariate(0.5, 0.5))))
-            self.age = int(random.uniform(0, self.lifespan / 2))
+            self.age = int(rng.uniform(0, self.lifespan / 2))
         if energyflag:
             # self.energy = abs((int)(self.maxEnergy * random.normalvariate(0.5, 0.5)))
-            self.energy = int(random.uniform(self.maxEnergy / 2, self.maxEnergy))
+            self.energy = int(rng.uniform(self.maxEnergy / 2, self.maxEnergy))
         return self
 
     def moveTo(self, nextPos: Vector):
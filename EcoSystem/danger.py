@@ -0,0 +1,119 @@
+# 危险场：把所有老虎的位置铺到网格上，与一个逐偏移量预先算好的核做相关，
+# 一次得到每个格子上牛会看到的危险信息——视野内有几只老虎、危险水平和逃跑方向，
+# 与 Control.decisionForPrey 里逐只老虎累加 Vector.weightedSum 的结果相同。
+#
+# 牛在 c、老虎在 p 时，老虎的危险权重为 (牛速 - 虎速) / (|p - c|² + 0.001)，
+# 方向为 c.direction(p)；两者都只取决于偏移量 p - c，所以
+#   Σ 权重 × (cos, sin) = 牛速 × Σ K(p - c) - Σ 虎速 × K(p - c)，
+# 其中 K(d) = (cos θ(d), sin θ(d)) / (|d|² + 0.001)。
+# 老虎少时把核逐只“盖”到网格上，老虎多或视野大时改用 FFT 做卷积
+import math
+
+import numpy as np
+
+from vector import Vector
+
+
+# 与 Vector.direction 相同的方向，单位弧度，范围 (-PI, PI]
+def direction(x, y):
+    L = (x**2 + y**2) ** 0.5 + 0.0001
+    return math.acos(x / L) if y >= 0 else -1 * math.acos(x / L)
+
+
+class DangerField:
+    def __init__(self, msize, visibleRange):
+        self.mapsize = msize
+        self.range = visibleRange
+        r = visibleRange
+        # 核按偏移量 (dy, dx) 存放，下标 [dy + r, dx + r]
+        self.cosKernel = np.zeros((2 * r + 1, 2 * r + 1))
+        self.sinKernel = np.zeros((2 * r + 1, 2 * r + 1))
+        for dy in range(-r, r + 1):
+            for dx in range(-r, r + 1):
+                theta = direction(dx, dy)
+                weight = 1 / (dx**2 + dy**2 + 0.001)
+                self.cosKernel[dy + r, dx + r] = weight * math.cos(theta)
+                self.sinKernel[dy + r, dx + r] = weight * math.sin(theta)
+        self.boxKernel = np.ones((2 * r + 1, 2 * r + 1))
+        self.clear()
+
+    def clear(self):
+        shape = (self.mapsize, self.mapsize)
+        self.count = np.zeros(shape, dtype=np.int64)  # 视野内的老虎只数
+        self.cosSum = np.zeros(shape)  # Σ K 的 cos 分量
+        self.sinSum = np.zeros(shape)
+        self.cosSpeedSum = np.zeros(shape)  # Σ 虎速 × K 的 cos 分量
+        self.sinSpeedSum = np.zeros(shape)
+
+    # 用当前所有老虎的位置与速度重建整个场
+    def update(self, Xs, Ys, speeds):
+        Xs, Ys = np.asarray(Xs, np.int64), np.asarray(Ys, np.int64)
+        speeds = np.asarray(speeds, np.float64)
+        if len(Xs) == 0:
+            self.clear()
+            return
+        n = self.mapsize
+        side = 2 * self.range + 1
+        # 逐只盖核与 FFT 的大致开销比较
+        if len(Xs) * side * side <= 4 * n * n * math.log2(n + side):
+            self.splat(Xs, Ys, speeds)
+        else:
+            self.convolve(Xs, Ys, speeds)
+
+    # 逐只老虎把核盖到视野覆盖的格子上
+    def splat(self, Xs, Ys, speeds):
+        n, r = self.mapsize, self.range
+        dy, dx = np.mgrid[-r : r + 1, -r : r + 1]
+        # 老虎在 p 时，受影响的牛在 c = p - d
+        cX = Xs[:, None] - dx.ravel()[None, :]
+        cY = Ys[:, None] - dy.ravel()[None, :]
+        inside = (cX >= 0) & (cY >= 0) & (cX < n) & (cY < n)
+        cells = (cY * n + cX)[inside]
+        offsets = np.broadcast_to(np.arange(dx.size)[None, :], cX.shape)[inside]
+        tigerSpeed = np.broadcast_to(speeds[:, None], cX.shape)[inside]
+
+        def scatter(weights):
+            return np.bincount(cells, weights, minlength=n * n).reshape(n, n)
+
+        cosK, sinK = self.cosKernel.ravel()[offsets], self.sinKernel.ravel()[offsets]
+        self.count = np.bincount(cells, minlength=n * n).reshape(n, n)
+        self.cosSum, self.sinSum = scatter(cosK), scatter(sinK)
+        self.cosSpeedSum = scatter(cosK * tigerSpeed)
+        self.sinSpeedSum = scatter(sinK * tigerSpeed)
+
+    # 老虎密度与核做相关（即与翻转后的核做卷积），用补零的 FFT 计算
+    def convolve(self, Xs, Ys, speeds):
+        n, r = self.mapsize, self.range
+        density = np.zeros((n, n))
+        speedDensity = np.zeros((n, n))
+        np.add.at(density, (Ys, Xs), 1)
+        np.add.at(speedDensity, (Ys, Xs), speeds)
+
+        size = n + 2 * r
+        densityF = np.fft.rfft2(density, (size, size))
+        speedF = np.fft.rfft2(speedDensity, (size, size))
+
+        def correlate(spectrum, kernel):
+            # 场[c] = Σ_d 密度[c + d] × 核[d]，卷积结果要平移 r 格
+            kernelF = np.fft.rfft2(kernel[::-1, ::-1], (size, size))
+            return np.fft.irfft2(spectrum * kernelF, (size, size))[r : r + n, r : r + n]
+
+        self.count = np.rint(correlate(densityF, self.boxKernel)).astype(np.int64)
+        self.cosSum = correlate(densityF, self.cosKernel)
+        self.sinSum = correlate(densityF, self.sinKernel)
+        self.cosSpeedSum = correlate(speedF, self.cosKernel)
+        self.sinSpeedSum = correlate(speedF, self.sinKernel)
+
+    # 速度为 speed 的牛在 (X, Y) 处：(视野内老虎只数, 危险水平, 逃跑方向)，
+    # 后两项与 Vector.weightedSum(..., reverse=True) 的返回值相同；没有老虎时为 (0, 0, 0)
+    def at(self, X, Y, speed):
+        count = int(self.count[Y, X])
+        if count == 0:
+            return 0, 0, 0
+        x = speed * self.cosSum[Y, X] - self.cosSpeedSum[Y, X]
+        y = speed * self.sinSum[Y, X] - self.sinSpeedSum[Y, X]
+        L = (x**2 + y**2) ** 0.5 + 0.001
+        sumDirection = math.acos(x / L) if y >= 0 else -1 * math.acos(x / L)
+        if sumDirection > 0:
+            return count, L, sumDirection - Vector.radians180
+        return count, L, sumDirection + Vector.radians180
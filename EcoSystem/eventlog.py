@@ -0,0 +1,273 @@
+# 事件日志：把每个周期的出生、死亡、移动与进食记成定长的二进制记录，追加写进一个日志文件，
+# 每隔 keyframeEvery 个周期再追加一个关键帧（当时所有生物的编号与位置）。
+# Replay 跳到任意周期时先载入不晚于它的最近一个关键帧，再依次应用之后各周期的事件，
+# 不必重新运行模拟；得到的各物种位置与记录时 Control.positions 的结果逐个相同。
+# 生物用 uid 标识；网格化的草没有 uid，用格子编号 Y * 地图边长 + X 代替。
+# 日志文件：8 字节魔数 b"ECOEVT01"，8 字节头部长度，JSON 头部，地图边长 × 地图边长 字节的障碍图，
+# 之后是一个个块：块头（周期、记录条数、是否关键帧）加上若干条记录。
+# 另有一个 <日志>.idx 索引文件，每个块一条（周期、块在日志中的偏移、是否关键帧），打开时直接读入
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b"ECOEVT01"
+# 记录的种类：关键帧里的一只生物、出生、死亡、移动（X、Y 为新位置）、进食（other 为食物的编号）
+STATE, BIRTH, DEATH, MOVE, EAT = range(5)
+EVENT = np.dtype(
+    [
+        ("kind", np.uint8),
+        ("code", np.uint8),
+        ("uid", np.int64),
+        ("other", np.int64),
+        ("X", np.int32),
+        ("Y", np.int32),
+    ]
+)
+BLOCK = np.dtype([("tick", np.int64), ("count", np.int64), ("keyframe", np.uint8)])
+INDEX = np.dtype([("tick", np.int64), ("offset", np.int64), ("keyframe", np.uint8)])
+
+
+def records(kind, code, uids, Xs, Ys, other=-1):
+    result = np.zeros(len(uids), EVENT)
+    result["kind"] = kind
+    result["code"] = code
+    result["uid"] = uids
+    result["other"] = other
+    result["X"] = Xs
+    result["Y"] = Ys
+    return result
+
+
+# 每个周期结束后调用 tick() 记下这一周期的事件
+class EventRecorder:
+    def __init__(self, control, path, keyframeEvery=50):
+        self.control = control
+        self.path = path
+        self.keyframeEvery = keyframeEvery
+        self.file = open(path, "wb")
+        self.indexFile = open(path + ".idx", "wb")
+        header = json.dumps(
+            {
+                "mapSize": control.MAP_SIZE,
+                "grassModel": control.grassModel,
+                "keyframeEvery": keyframeEvery,
+            }
+        ).encode("utf-8")
+        self.file.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        self.file.write(np.asarray(control.BarrierMap, dtype=np.uint8).tobytes())
+        self.previous = self.current()
+        self.writeKeyframe(control.scheduler.tickCount, self.previous)
+
+    # 各物种 (按编号排好的 uid, Xs, Ys)
+    def current(self):
+        control = self.control
+        state = []
+        for code in range(3):
+            if code == 2 and control.grassModel == "field":
+                cells = np.flatnonzero(control.CreatureLst[2].presence)
+                Ys, Xs = np.divmod(cells, control.MAP_SIZE)
+                state.append((cells, Xs, Ys))
+                continue
+            creatureLst = control.CreatureLst[code]
+            uids = np.fromiter((c.uid for c in creatureLst), np.int64, len(creatureLst))
+            Xs, Ys = control.positions(code)
+            state.append((uids, np.array(Xs), np.array(Ys)))
+        return state
+
+    def writeBlock(self, tick, block, keyframe):
+        offset = self.file.tell()
+        np.array([(tick, len(block), keyframe)], BLOCK).tofile(self.file)
+        block.tofile(self.file)
+        np.array([(tick, offset, keyframe)], INDEX).tofile(self.indexFile)
+
+    def writeKeyframe(self, tick, state):
+        block = np.concatenate(
+            [records(STATE, code, *state[code]) for code in range(3)]
+        )
+        self.writeBlock(tick, block, True)
+        self.flush()
+
+    # 与上一周期比较得到出生、死亡与移动，再加上调度器记下的进食
+    def tick(self):
+        control = self.control
+        tick = control.scheduler.tickCount
+        state = self.current()
+        parts = []
+        for code in range(3):
+            uids, Xs, Ys = state[code]
+            oldUids, oldXs, oldYs = self.previous[code]
+            born = ~np.isin(uids, oldUids)
+            died = ~np.isin(oldUids, uids)
+            parts.append(records(DEATH, code, oldUids[died], oldXs[died], oldYs[died]))
+            stayed = ~born
+            where = np.searchsorted(oldUids, uids[stayed])
+            moved = (oldXs[where] != Xs[stayed]) | (oldYs[where] != Ys[stayed])
+            parts.append(
+                records(
+                    MOVE,
+                    code,
+                    uids[stayed][moved],
+                    Xs[stayed][moved],
+                    Ys[stayed][moved],
+                )
+            )
+            parts.append(records(BIRTH, code, uids[born], Xs[born], Ys[born]))
+        eaten = control.scheduler.eaten
+        if len(eaten) != 0:
+            eats = np.zeros(len(eaten), EVENT)
+            eats["kind"] = EAT
+            for i, (eater, food) in enumerate(eaten):
+                pos = food.pos
+                eats[i]["code"] = eater.type
+                eats[i]["uid"] = eater.uid
+                eats[i]["other"] = getattr(
+                    food, "uid", pos.Y * control.MAP_SIZE + pos.X
+                )
+                eats[i]["X"] = pos.X
+                eats[i]["Y"] = pos.Y
+            parts.append(eats)
+        self.writeBlock(tick, np.concatenate(parts), False)
+        if tick % self.keyframeEvery == 0:
+            self.writeKeyframe(tick, state)
+        self.flush()
+        self.previous = state
+
+    # 每个周期都把缓冲写进文件，边记录边回放时也能读到最新的周期
+    def flush(self):
+        self.file.flush()
+        self.indexFile.flush()
+
+    def close(self):
+        self.file.close()
+        self.indexFile.close()
+
+
+class Replay:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} 不是事件日志")
+        (length,) = struct.unpack("<Q", self.file.read(8))
+        self.meta = json.loads(self.file.read(length).decode("utf-8"))
+        self.mapSize = size = self.meta["mapSize"]
+        self.barrierMap = np.frombuffer(self.file.read(size * size), np.uint8).reshape(
+            size, size
+        )
+        self.cache = None  # (周期, 状态)，向后拖动时从这里接着应用，不必回到关键帧
+        self.refresh()
+
+    # 重新读索引，正在记录的日志会读到新追加的周期。
+    # 两个文件各自有缓冲，索引可能先于日志落盘，所以从末尾往前去掉块还没写完整的索引项
+    def refresh(self):
+        with open(self.path + ".idx", "rb") as f:
+            data = f.read()
+        index = np.frombuffer(
+            data[: len(data) // INDEX.itemsize * INDEX.itemsize], INDEX
+        )
+        self.file.seek(0, 2)
+        end = self.file.tell()
+        while len(index) != 0:
+            offset = int(index[-1]["offset"])
+            self.file.seek(offset)
+            header = np.frombuffer(self.file.read(BLOCK.itemsize), BLOCK)
+            if (
+                len(header) != 0
+                and offset + BLOCK.itemsize + header[0]["count"] * EVENT.itemsize <= end
+            ):
+                break
+            index = index[:-1]
+        self.index = index
+        self.keyframes = self.index[self.index["keyframe"] == 1]
+        self.deltas = self.index[self.index["keyframe"] == 0]
+
+    @property
+    def firstTick(self):
+        return int(self.keyframes["tick"][0])
+
+    @property
+    def lastTick(self):
+        return int(self.index["tick"].max())
+
+    def readBlock(self, offset):
+        self.file.seek(offset)
+        header = np.frombuffer(self.file.read(BLOCK.itemsize), BLOCK)[0]
+        return np.frombuffer(
+            self.file.read(int(header["count"]) * EVENT.itemsize), EVENT
+        )
+
+    # 第 tick 个周期里发生的事件
+    def events(self, tick):
+        found = self.deltas[self.deltas["tick"] == tick]
+        if len(found) == 0:
+            return np.zeros(0, EVENT)
+        return self.readBlock(int(found[0]["offset"]))
+
+    # 第 tick 个周期结束时各物种的 (uid, Xs, Ys)
+    def state(self, tick):
+        if not self.firstTick <= tick <= self.lastTick:
+            raise ValueError(f"日志里只有第 {self.firstTick} 到 {self.lastTick} 个周期")
+        keyframe = self.keyframes[self.keyframes["tick"] <= tick][-1]
+        if self.cache != None and int(keyframe["tick"]) <= self.cache[0] <= tick:
+            start, state = self.cache
+        else:
+            start = int(keyframe["tick"])
+            state = self.fromKeyframe(self.readBlock(int(keyframe["offset"])))
+        deltas = self.deltas[
+            (self.deltas["tick"] > start) & (self.deltas["tick"] <= tick)
+        ]
+        for offset in deltas["offset"].tolist():
+            state = self.apply(state, self.readBlock(offset))
+        self.cache = (tick, state)
+        return state
+
+    def fromKeyframe(self, block):
+        state = []
+        for code in range(3):
+            rows = block[block["code"] == code]
+            state.append(
+                (
+                    rows["uid"].copy(),
+                    rows["X"].astype(np.int64),
+                    rows["Y"].astype(np.int64),
+                )
+            )
+        return state
+
+    def apply(self, state, block):
+        result = []
+        for code in range(3):
+            uids, Xs, Ys = state[code]
+            rows = block[block["code"] == code]
+            deaths = rows[rows["kind"] == DEATH]
+            if len(deaths) != 0:
+                keep = ~np.isin(uids, deaths["uid"])
+                uids, Xs, Ys = uids[keep], Xs[keep], Ys[keep]
+            moves = rows[rows["kind"] == MOVE]
+            if len(moves) != 0:
+                Xs, Ys = Xs.copy(), Ys.copy()
+                where = np.searchsorted(uids, moves["uid"])
+                Xs[where] = moves["X"]
+                Ys[where] = moves["Y"]
+            births = rows[rows["kind"] == BIRTH]
+            if len(births) != 0:
+                uids = np.concatenate([uids, births["uid"]])
+                Xs = np.concatenate([Xs, births["X"]])
+                Ys = np.concatenate([Ys, births["Y"]])
+                # 新生物的 uid 总比已有的大；草的格子编号不是，需要重新排序
+                if np.any(np.diff(uids) < 0):
+                    order = np.argsort(uids, kind="stable")
+                    uids, Xs, Ys = uids[order], Xs[order], Ys[order]
+            result.append((uids, Xs, Ys))
+        return result
+
+    # 第 tick 个周期结束时各物种的位置 [(Xs, Ys), ...]，可以直接交给 raster.Rasterizer
+    def positions(self, tick):
+        return [(Xs, Ys) for _, Xs, Ys in self.state(tick)]
+
+    def counts(self, tick):
+        return [len(uids) for uids, _, _ in self.state(tick)]
+
+    def close(self):
+        self.file.close()
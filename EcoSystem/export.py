@@ -0,0 +1,248 @@
+# 离屏导出：不开窗口，把一次模拟（现场运行，或者 Checkpointer 存下的一串快照）直接画成
+# PNG 序列、GIF 或 MP4。每一帧用 raster.Rasterizer 画成 NumPy 数组，
+# 编码交给后台线程池：PNG 各帧互不相关，多个线程并行压缩（zlib 压缩时会释放 GIL）；
+# GIF 与 MP4 要按顺序写进同一个文件，由线程池里的一个线程依次写入。模拟本身不等编码。
+# 三种格式都是每编码好一帧就写进文件，导出多长的模拟内存都不会随帧数增长。
+# PNG 只用标准库的 zlib；GIF 需要 Pillow，MP4 需要 imageio 与 imageio-ffmpeg，用到时才导入
+# 用法：python export.py --output run.gif [--ticks 200] [--stride 2] [--resolution 600] [--fps 10]
+#       [--map-size 100] [--seed 0] [--init 30 150 500] [--max 300 1000 3000] [--props props.json]
+#       [--columnar] [--grass-model field] [--workers 4] [--from-snapshots ckpt]
+# --output 以 .gif、.mp4 结尾时写成动图或视频，否则当作目录，写成 frame-<周期>.png
+# 给了 --from-snapshots 时不运行模拟，按顺序把目录里的每个快照画成一帧（--stride 仍然适用）
+import argparse
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from control import maxCreatureNum
+from creature import Creature
+from headless import loadProps, makeControl
+from raster import BACKGROUND, BARRIER_COLOR, COLORS, Rasterizer
+from snapshot import readSnapshot
+
+
+def pngChunk(kind, data):
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    )
+
+
+# 把 (高, 宽, 3) 的 uint8 数组编码成 PNG，每行都不做滤波
+def encodePNG(image, level=6):
+    height, width = image.shape[:2]
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 1:] = np.ascontiguousarray(image).reshape(height, width * 3)
+    return b"".join(
+        [
+            b"\x89PNG\r\n\x1a\n",
+            pngChunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+            pngChunk(b"IDAT", zlib.compress(rows.tobytes(), level)),
+            pngChunk(b"IEND", b""),
+        ]
+    )
+
+
+# 把地图画成 resolution × resolution 像素：先按整数像素的格子画，再最近邻缩放到目标大小
+class FrameRenderer:
+    def __init__(self, msize, resolution, barrierMap=None):
+        cell = max(-(-resolution // msize), 1)
+        self.rasterizer = Rasterizer(msize, cell, barrierMap)
+        side = msize * cell
+        self.index = np.arange(resolution) * side // resolution
+
+    def render(self, positions):
+        image = self.rasterizer.render(positions)
+        return image[self.index[:, None], self.index[None, :]]
+
+
+class PNGSequenceWriter:
+    def __init__(self, directory, workers):
+        self.directory = directory
+        self.pool = ThreadPoolExecutor(workers)
+        os.makedirs(directory, exist_ok=True)
+
+    def submit(self, tick, image):
+        return self.pool.submit(self.write, tick, image)
+
+    def write(self, tick, image):
+        with open(os.path.join(self.directory, f"frame-{tick:06d}.png"), "wb") as f:
+            f.write(encodePNG(image))
+
+    def close(self):
+        self.pool.shutdown()
+
+
+# 渲染出的图只有背景、障碍与三个物种这几种颜色，GIF 的每一帧都用这一个调色板
+PALETTE = np.array([BACKGROUND, BARRIER_COLOR, *COLORS], dtype=np.uint8)
+PALETTE_KEYS = PALETTE.astype(np.int64) @ [1 << 16, 1 << 8, 1]
+PALETTE_ORDER = np.argsort(PALETTE_KEYS)
+
+
+# 把 RGB 图换成 PALETTE 的下标
+def paletteIndices(image):
+    keys = image.astype(np.int64) @ [1 << 16, 1 << 8, 1]
+    where = np.searchsorted(PALETTE_KEYS[PALETTE_ORDER], keys)
+    return PALETTE_ORDER[np.minimum(where, len(PALETTE) - 1)].astype(np.uint8)
+
+
+# GIF 与 MP4：帧要按顺序写，只用一个后台线程
+class AnimationWriter:
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.pool = ThreadPoolExecutor(1)
+        self.video = None
+        self.file = None
+        if path.lower().endswith(".mp4"):
+            try:
+                import imageio
+            except ImportError:
+                raise RuntimeError("导出 MP4 需要 imageio 与 imageio-ffmpeg")
+            self.video = imageio.get_writer(path, fps=fps, macro_block_size=1)
+        else:
+            try:
+                from PIL import GifImagePlugin, Image
+            except ImportError:
+                raise RuntimeError("导出 GIF 需要 Pillow")
+            self.Image = Image
+            self.gif = GifImagePlugin
+            self.file = open(path, "wb")
+            self.frames = 0
+
+    def submit(self, tick, image):
+        return self.pool.submit(self.write, image)
+
+    def write(self, image):
+        if self.video != None:
+            self.video.append_data(image)
+            return
+        # GIF 逐帧追加：第一帧前写文件头（含循环播放），之后每帧一个图像块，close 时写结束符
+        frame = self.Image.fromarray(paletteIndices(image), "P")
+        frame.putpalette(PALETTE.flatten().tolist())
+        duration = int(1000 / self.fps)
+        if self.frames == 0:
+            header, _ = self.gif.getheader(
+                frame, info={"loop": 0, "duration": duration}
+            )
+            self.file.write(b"".join(header))
+        self.file.write(b"".join(self.gif.getdata(frame, duration=duration)))
+        self.frames += 1
+
+    def close(self):
+        self.pool.shutdown()
+        if self.video != None:
+            self.video.close()
+        elif self.file != None:
+            self.file.write(b";")
+            self.file.close()
+            # 一帧都没有时不留下不完整的 GIF
+            if self.frames == 0:
+                os.remove(self.path)
+
+
+def makeWriter(output, fps=10, workers=4):
+    if output.lower().endswith((".gif", ".mp4")):
+        return AnimationWriter(output, fps)
+    return PNGSequenceWriter(output, workers)
+
+
+# 现场运行：每 stride 个周期产出一帧 (周期, 各物种的位置)，包括开始时的一帧
+def liveFrames(control, ticks, stride=1):
+    yield control.scheduler.tickCount, [control.positions(c) for c in range(3)]
+    for tick in range(1, ticks + 1):
+        control.dayPass()
+        if tick % stride == 0:
+            yield control.scheduler.tickCount, [control.positions(c) for c in range(3)]
+
+
+# 快照目录：按周期顺序每 stride 个快照产出一帧；返回 (地图边长, 障碍, 帧的迭代器)
+def snapshotFrames(directory, stride=1):
+    paths = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.startswith("snapshot-") and name.endswith(".eco")
+    )[::stride]
+    if len(paths) == 0:
+        raise ValueError(f"{directory} 里没有快照")
+    meta, arrays = readSnapshot(paths[0])
+
+    def frames():
+        for path in paths:
+            meta, arrays = readSnapshot(path)
+            positions = [(arrays[f"{c}/x"], arrays[f"{c}/y"]) for c in (0, 1)]
+            if "grass/presence" in arrays:
+                Ys, Xs = np.nonzero(arrays["grass/presence"])
+                positions.append((Xs, Ys))
+            else:
+                positions.append((arrays["2/x"], arrays["2/y"]))
+            yield meta["tick"], positions
+
+    return meta["mapSize"], np.array(arrays["barrier"]), frames()
+
+
+# 把 frames 里的每一帧画好交给 writer；排队等编码的帧不超过 backlog 个，内存不会无限增长。
+# 返回导出的帧数
+def export(frames, renderer, writer, backlog=16):
+    pending = []
+    count = 0
+    try:
+        for tick, positions in frames:
+            pending.append(writer.submit(tick, renderer.render(positions)))
+            count += 1
+            if len(pending) >= backlog:
+                pending.pop(0).result()
+        for future in pending:
+            future.result()
+    finally:
+        writer.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--stride", type=int, default=1)
+    parser.add_argument("--resolution", type=int, default=600)
+    parser.add_argument("--fps", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--map-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--init", type=int, nargs=3, default=Creature.INIT_NUM)
+    parser.add_argument("--max", type=int, nargs=3, default=maxCreatureNum)
+    parser.add_argument("--props", default=None)
+    parser.add_argument("--columnar", action="store_true")
+    parser.add_argument(
+        "--grass-model", choices=("objects", "field"), default="objects"
+    )
+    parser.add_argument("--from-snapshots", default=None)
+    args = parser.parse_args()
+
+    if args.from_snapshots != None:
+        mapSize, barrier, frames = snapshotFrames(args.from_snapshots, args.stride)
+    else:
+        control = makeControl(
+            args.map_size,
+            seed=args.seed,
+            initNum=args.init,
+            maxNum=args.max,
+            props=loadProps(args.props) if args.props != None else None,
+            columnar=args.columnar,
+            grassModel=args.grass_model,
+        )
+        mapSize, barrier = args.map_size, control.BarrierMap
+        frames = liveFrames(control, args.ticks, args.stride)
+    renderer = FrameRenderer(mapSize, args.resolution, barrier)
+    writer = makeWriter(args.output, args.fps, args.workers)
+    count = export(frames, renderer, writer)
+    print(f"导出 {count} 帧到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
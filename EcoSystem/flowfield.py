@@ -0,0 +1,138 @@
+# 多源距离场：所有源点（例如草）到地图上每个格子的八方向步数，障碍不可通行。
+# 牛找草时不必各自做 A*，只要沿距离场下降的方向走即可。
+# 距离超过 maxDist 的格子记为 INF，这样源点增减时只需要在局部窗口内更新
+import numpy as np
+
+from AStar import NEIGHBOR_STEPS
+
+INF = np.iinfo(np.int32).max
+
+
+# 八邻域膨胀：返回 mask 中任一格子的八个邻居组成的掩码
+def dilate8(mask):
+    result = mask.copy()
+    result[1:, :] |= mask[:-1, :]
+    result[:-1, :] |= mask[1:, :]
+    result[:, 1:] |= mask[:, :-1]
+    result[:, :-1] |= mask[:, 1:]
+    result[1:, 1:] |= mask[:-1, :-1]
+    result[1:, :-1] |= mask[:-1, 1:]
+    result[:-1, 1:] |= mask[1:, :-1]
+    result[:-1, :-1] |= mask[1:, 1:]
+    return result
+
+
+# 在 free 的范围内从 sources 出发做向量化的广度优先，返回步数（不超过 maxDist）
+def bfsField(sources, free, maxDist=None):
+    dist = np.full(sources.shape, INF, dtype=np.int32)
+    dist[sources] = 0
+    frontier = sources.copy()
+    d = 0
+    while frontier.any() and (maxDist == None or d < maxDist):
+        d += 1
+        frontier = dilate8(frontier) & free & (dist == INF)
+        dist[frontier] = d
+    return dist
+
+
+class DistanceField:
+    # 单次同步时变化的源点超过这个比例，就直接整张重算
+    rebuildRatio = 0.25
+
+    def __init__(self, msize, barrier, maxDist=None):
+        self.mapsize = msize
+        self.free = np.asarray(barrier) != 1
+        self.maxDist = maxDist
+        self.sources = np.zeros((msize, msize), dtype=bool)
+        self.dist = np.full((msize, msize), INF, dtype=np.int32)
+
+    # 障碍变化后调用，整张重算
+    def setBarrier(self, barrier):
+        self.free = np.asarray(barrier) != 1
+        self.rebuild()
+
+    def rebuild(self):
+        self.dist = bfsField(self.sources, self.free, self.maxDist)
+
+    # 与当前的源点分布同步：变化少时逐个增量更新，变化多时整张重算
+    def sync(self, presence):
+        presence = np.asarray(presence, dtype=bool)
+        added = np.argwhere(presence & ~self.sources)
+        removed = np.argwhere(self.sources & ~presence)
+        if (
+            self.maxDist == None
+            or len(added) + len(removed) > self.rebuildRatio * max(presence.sum(), 1)
+        ):
+            self.sources = presence.copy()
+            self.rebuild()
+            return
+        for y, x in removed:
+            self.removeSource(x, y)
+        for y, x in added:
+            self.addSource(x, y)
+
+    # 新增一个源点：从它出发做一次局部的广度优先，只更新变近了的格子
+    def addSource(self, x, y):
+        if self.sources[y, x]:
+            return
+        self.sources[y, x] = True
+        if not self.free[y, x]:
+            return
+        size = self.mapsize
+        dist = self.dist
+        free = self.free
+        dist[y, x] = 0
+        frontier = [(x, y)]
+        d = 0
+        while frontier and (self.maxDist == None or d < self.maxDist):
+            d += 1
+            nextFrontier = []
+            for cx, cy in frontier:
+                for dx, dy, _ in NEIGHBOR_STEPS:
+                    nx, ny = cx + dx, cy + dy
+                    if 0 <= nx < size and 0 <= ny < size and free[ny, nx]:
+                        if dist[ny, nx] > d:
+                            dist[ny, nx] = d
+                            nextFrontier.append((nx, ny))
+            frontier = nextFrontier
+
+    # 删除一个源点：受它影响的格子都在 maxDist 的窗口 R 里，
+    # 而 R 中格子的最短路又都落在半径 2 * maxDist 的窗口 W 里，
+    # 所以只需要在 W 上重新做一次广度优先，再把 R 的结果写回
+    def removeSource(self, x, y):
+        if not self.sources[y, x]:
+            return
+        self.sources[y, x] = False
+        if self.maxDist == None:
+            self.rebuild()
+            return
+        size = self.mapsize
+        r = self.maxDist
+        wx0, wy0 = max(x - 2 * r, 0), max(y - 2 * r, 0)
+        wx1, wy1 = min(x + 2 * r + 1, size), min(y + 2 * r + 1, size)
+        local = bfsField(
+            self.sources[wy0:wy1, wx0:wx1], self.free[wy0:wy1, wx0:wx1], r
+        )
+        rx0, ry0 = max(x - r, 0), max(y - r, 0)
+        rx1, ry1 = min(x + r + 1, size), min(y + r + 1, size)
+        self.dist[ry0:ry1, rx0:rx1] = local[ry0 - wy0 : ry1 - wy0, rx0 - wx0 : rx1 - wx0]
+
+    def distanceAt(self, x, y):
+        return int(self.dist[y, x])
+
+    # 从 (x, y) 沿距离下降的方向最多走 steps 步，走到与源点相邻（距离 <= 1）时停下
+    def descend(self, x, y, steps):
+        size = self.mapsize
+        dist = self.dist
+        for _ in range(steps):
+            if dist[y, x] <= 1:
+                break
+            bestX, bestY, best = x, y, dist[y, x]
+            for dx, dy, _ in NEIGHBOR_STEPS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < size and 0 <= ny < size and dist[ny, nx] < best:
+                    bestX, bestY, best = nx, ny, dist[ny, nx]
+            if (bestX, bestY) == (x, y):
+                break
+            x, y = bestX, bestY
+        return x, y
@@ -0,0 +1,78 @@
+# 空格索引：某个物种当前可以落脚的所有格子。
+# cells 是空格编号的无序数组，position[cell] 是该格在 cells 中的下标（不空时为 -1），
+# 增删都是与末尾交换后 O(1) 完成，随机抽一个空格也是 O(1)。
+# 格子编号为 Y * mapsize + X
+import random
+
+import numpy as np
+
+
+class FreeCellIndex:
+    def __init__(self, msize, mask=None):
+        self.mapsize = msize
+        self.reset(mask if mask is not None else np.ones((msize, msize), dtype=bool))
+
+    # 按掩码（True 为空）整体重建
+    def reset(self, mask):
+        cells = np.flatnonzero(np.asarray(mask).reshape(-1))
+        position = np.full(self.mapsize * self.mapsize, -1, dtype=np.int64)
+        position[cells] = np.arange(len(cells))
+        self.cells = cells.tolist()
+        self.position = position.tolist()
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, cell):
+        return self.position[cell] != -1
+
+    def add(self, cell):
+        if self.position[cell] == -1:
+            self.position[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def remove(self, cell):
+        i = self.position[cell]
+        if i == -1:
+            return
+        last = self.cells.pop()
+        if last != cell:
+            self.cells[i] = last
+            self.position[last] = i
+        self.position[cell] = -1
+
+    # 随机取一个空格，没有空格时返回 None
+    def sample(self, rng=random):
+        if len(self.cells) == 0:
+            return None
+        return self.cells[int(rng.random() * len(self.cells))]
+
+    # 离 (X, Y) 最近的空格，只找切比雪夫距离 radius 以内的；找不到返回 None
+    def nearest(self, X, Y, radius):
+        size = self.mapsize
+        for dX, dY in ringOffsets(radius):
+            nX, nY = X + dX, Y + dY
+            if 0 <= nX < size and 0 <= nY < size:
+                cell = nY * size + nX
+                if self.position[cell] != -1:
+                    return cell
+        return None
+
+
+_ringCache = {}
+
+
+# 半径 radius（切比雪夫距离）内的所有偏移量，按距离平方由近到远排列，距离相同时先上后下、先左后右
+def ringOffsets(radius):
+    offsets = _ringCache.get(radius)
+    if offsets == None:
+        offsets = sorted(
+            (
+                (dX, dY)
+                for dY in range(-radius, radius + 1)
+                for dX in range(-radius, radius + 1)
+            ),
+            key=lambda offset: (offset[0] ** 2 + offset[1] ** 2, offset[1], offset[0]),
+        )
+        _ringCache[radius] = offsets
+    return offsets
@@ -0,0 +1,150 @@
+# 网格化的草：不再为每棵草建一个 Creature，而是用 presence / energy / age 三张网格表示，
+# 生长、老化、死亡与扩散都是整张网格上的元胞自动机规则，牛吃草就是清空一个格子。
+# GrassField 本身可以当作草的列表使用：len() 是草的棵数，遍历得到每棵草的 GrassCell 代理，
+# 代理有 pos、energy、dead 等属性，Creature.eat 吃掉它时会清空对应的格子。
+# 一口吃掉整格而不是按口减少格子里的能量，是有意与 grassModel="objects" 保持一致：
+# 那里 Creature.eat 也是拿走整棵草的能量并让它死掉，两种模型的种群动态才可以互相比较
+import threading
+
+import numpy as np
+
+from vector import Vector
+
+
+class GrassCell:
+    type = 2
+    typeStr = "草"
+    speed = 0
+
+    def __init__(self, field, X, Y):
+        self.field = field
+        self.X = X
+        self.Y = Y
+
+    @property
+    def pos(self):
+        return Vector(self.X, self.Y)
+
+    @property
+    def energy(self):
+        return float(self.field.energy[self.Y, self.X])
+
+    @property
+    def dead(self):
+        return not self.field.presence[self.Y, self.X]
+
+    @dead.setter
+    def dead(self, value):
+        if value:
+            self.field.remove(self.X, self.Y)
+
+    def __str__(self) -> str:
+        return f"{self.typeStr}（位置: {self.pos}，能量：{self.energy}，{'存活' if not self.dead else '死亡'})"
+
+
+class GrassField:
+    # 扩散时新草落在母株八邻域中的一格
+    SPREAD_STEPS = np.array(
+        [(-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1)]
+    )
+
+    def __init__(self, msize, mEnergy, life, cost, rng=None):
+        self.mapsize = msize
+        self.maxEnergy = mEnergy
+        self.lifespan = life
+        self.energyCostPerTime = cost
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.barrier = np.zeros((msize, msize), dtype=bool)
+        self.presence = np.zeros((msize, msize), dtype=bool)
+        self.energy = np.zeros((msize, msize))
+        self.age = np.zeros((msize, msize), dtype=np.int64)
+        self.count = 0
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(
+            [GrassCell(self, X, Y) for Y, X in np.argwhere(self.presence).tolist()]
+        )
+
+    def setBarrier(self, barrierMap):
+        with self.lock:
+            self.barrier = np.asarray(barrierMap) == 1
+            self.presence &= ~self.barrier
+            self.count = int(np.count_nonzero(self.presence))
+
+    def clear(self):
+        with self.lock:
+            self.presence[:] = False
+            self.count = 0
+
+    # 在随机的空格上种下 number 棵草，年龄与能量和 Creature.randomize 一样均匀随机
+    def seed(self, number):
+        with self.lock:
+            free = np.flatnonzero(~(self.presence | self.barrier).reshape(-1))
+            cells = self.rng.choice(free, size=min(number, len(free)), replace=False)
+            Ys, Xs = np.divmod(cells, self.mapsize)
+            self.presence[Ys, Xs] = True
+            self.age[Ys, Xs] = self.rng.uniform(0, self.lifespan / 2, len(cells))
+            self.energy[Ys, Xs] = np.floor(
+                self.rng.uniform(self.maxEnergy / 2, self.maxEnergy, len(cells))
+            )
+            self.count += len(cells)
+
+    def remove(self, X, Y):
+        with self.lock:
+            if self.presence[Y, X]:
+                self.presence[Y, X] = False
+                self.count -= 1
+
+    # 所有草经过一个周期，规则与 Creature.timePass 相同；返回这一周期死掉的棵数
+    def step(self):
+        with self.lock:
+            alive = self.presence
+            self.age[alive] += 1
+            energy = np.minimum(self.energy - self.energyCostPerTime, self.maxEnergy)
+            self.energy = np.where(alive, energy, self.energy)
+            dead = alive & ((self.age > self.lifespan) | (self.energy <= 0))
+            self.presence &= ~dead
+            died = int(np.count_nonzero(dead))
+            self.count -= died
+            return died
+
+    # 不在地图边缘的草的位置 (Xs, Ys)，即可以繁殖的母株
+    def eligible(self, edgeSize):
+        inner = np.zeros_like(self.presence)
+        inner[
+            edgeSize : self.mapsize - edgeSize, edgeSize : self.mapsize - edgeSize
+        ] = True
+        Ys, Xs = np.nonzero(self.presence & inner)
+        return Xs, Ys
+
+    # 每棵母株往八邻域中随机一格扩散，落在障碍、已有草或地图外的作废，
+    # 多棵母株落在同一格时只长一棵；返回新长出的棵数
+    def spread(self, Xs, Ys):
+        with self.lock:
+            steps = self.SPREAD_STEPS[self.rng.integers(0, 8, len(Xs))]
+            nXs, nYs = Xs + steps[:, 0], Ys + steps[:, 1]
+            size = self.mapsize
+            ok = (nXs >= 0) & (nYs >= 0) & (nXs < size) & (nYs < size)
+            nXs, nYs = nXs[ok], nYs[ok]
+            ok = ~(self.presence[nYs, nXs] | self.barrier[nYs, nXs])
+            cells = np.unique(nYs[ok] * size + nXs[ok])
+            Ys, Xs = np.divmod(cells, size)
+            self.presence[Ys, Xs] = True
+            self.age[Ys, Xs] = 0
+            self.energy[Ys, Xs] = self.maxEnergy / 3
+            self.count += len(cells)
+            return len(cells)
+
+    # (X, Y) 周围切比雪夫距离 radius 以内的草，按行优先的顺序
+    def cellsInRange(self, X, Y, radius):
+        x0, y0 = max(X - radius, 0), max(Y - radius, 0)
+        x1 = min(X + radius + 1, self.mapsize)
+        y1 = min(Y + radius + 1, self.mapsize)
+        return [
+            GrassCell(self, x0 + dX, y0 + dY)
+            for dY, dX in np.argwhere(self.presence[y0:y1, x0:x1]).tolist()
+        ]
@@ -0,0 +1,193 @@
+# 不开窗口运行模拟：给定地图边长、种子、初始数量、数量上限与物种属性表跑 N 个周期，
+# 以 JSON 报告每秒周期数、各阶段耗时与种群数量的变化，不需要 Tk 和显示器
+# 用法：python headless.py --ticks 100 [--map-size 100] [--seed 0] [--init 30 150 500]
+#       [--max 300 1000 3000] [--props props.json] [--columnar] [--grass-model field]
+#       [--path-processes 0] [--every 1] [--output result.json]
+#       [--metrics-csv metrics.csv] [--trace trace.json]
+#       [--checkpoint-dir ckpt] [--checkpoint-every 100] [--resume ckpt] [--event-log run.events]
+# 给了 --metrics-csv 或 --trace 时记录运行指标（见 metrics.py），JSON 里附上各计数器的总计
+# 给了 --checkpoint-dir 时每隔 --checkpoint-every 个周期存一次快照（见 snapshot.py）；
+# --resume 给出快照文件或目录（取其中最新的）时从快照继续再跑 --ticks 个周期，地图、种子与属性表都来自快照
+# 给了 --event-log 时把每个周期的出生、死亡、移动与进食记进事件日志，之后可以用 eventlog.Replay 回放
+# --props 可以是 JSON 文件路径，也可以直接是 JSON 文本：三个物种各一个字典，只写要改的属性，
+# 例如 '[{"Speed": 4}, {}, {"rate": 0.5}]'
+import argparse
+import io
+import json
+import os
+from contextlib import redirect_stdout
+from time import perf_counter
+
+from control import Control, maxCreatureNum, prop
+from creature import Creature
+from metrics import Metrics
+from scheduler import PHASES
+from eventlog import EventRecorder
+from snapshot import Checkpointer, latestSnapshot
+
+
+# 在默认属性表上按物种覆盖部分属性
+def mergeProps(overrides=None):
+    props = [dict(p) for p in prop]
+    for p, override in zip(props, overrides or []):
+        p.update(override)
+    return props
+
+
+def loadProps(text):
+    if os.path.exists(text):
+        with open(text, encoding="utf-8") as f:
+            text = f.read()
+    return mergeProps(json.loads(text))
+
+
+def makeControl(
+    mapSize,
+    seed=None,
+    initNum=None,
+    maxNum=None,
+    props=None,
+    barrierMap=None,
+    **options
+):
+    initNum = list(initNum if initNum != None else Creature.INIT_NUM)
+    # creature_init 会打印初始数量，不混进 JSON 输出
+    with redirect_stdout(io.StringIO()):
+        control = Control(
+            mapSize, seed=seed, props=props, initNum=initNum, maxNum=maxNum, **options
+        )
+        control.barrier_init(barrierMap if barrierMap is not None else [0])
+        control.creature_init(*initNum)
+    return control
+
+
+# 跑 ticks 个周期，每 every 个周期记一次各物种数量；metrics 为 metrics.Metrics 时记录运行指标；
+# checkpointDir 给出时每 checkpointEvery 个周期存一次快照；resume 为快照文件或目录时从快照继续，
+# 此时忽略地图与物种的参数；eventLog 给出时把事件记进这个日志文件。其余参数见 makeControl 与 Control
+def run(
+    ticks,
+    mapSize=100,
+    every=1,
+    metrics=None,
+    checkpointDir=None,
+    checkpointEvery=100,
+    resume=None,
+    eventLog=None,
+    **kwargs
+):
+    t0 = perf_counter()
+    if resume != None:
+        if os.path.isdir(resume):
+            resume = latestSnapshot(resume)
+        control = Control.resume(resume, kwargs.get("pathProcesses", 0))
+        mapSize = control.MAP_SIZE
+    else:
+        control = makeControl(mapSize, **kwargs)
+    if metrics != None:
+        control.metrics = metrics
+    checkpointer = (
+        Checkpointer(control, checkpointDir, checkpointEvery)
+        if checkpointDir != None
+        else None
+    )
+    recorder = EventRecorder(control, eventLog) if eventLog != None else None
+    setup = perf_counter() - t0
+    first = control.scheduler.tickCount
+    populations = [[first, *[len(lst) for lst in control.CreatureLst]]]
+    t0 = perf_counter()
+    try:
+        for tick in range(first + 1, first + ticks + 1):
+            control.dayPass()
+            if checkpointer != None:
+                checkpointer.tick()
+            if recorder != None:
+                recorder.tick()
+            if tick % every == 0 or tick == first + ticks:
+                populations.append([tick, *[len(lst) for lst in control.CreatureLst]])
+    finally:
+        for broker in control.brokers:
+            broker.close()
+        if recorder != None:
+            recorder.close()
+    elapsed = perf_counter() - t0
+    phaseTimes = control.scheduler.phaseTimes
+    result = {
+        "mapSize": mapSize,
+        "seed": kwargs.get("seed") if resume == None else None,
+        "resumedFrom": resume,
+        "ticks": ticks,
+        "initNum": control.initNum,
+        "maxNum": control.maxCreatureNum,
+        "props": control.prop,
+        "setupSeconds": setup,
+        "elapsedSeconds": elapsed,
+        "ticksPerSecond": ticks / elapsed if elapsed > 0 else None,
+        "phaseSeconds": {phase: phaseTimes[phase] for phase in PHASES},
+        "phaseMsPerTick": {
+            phase: phaseTimes[phase] / max(ticks, 1) * 1000 for phase in PHASES
+        },
+        # 每行为 [周期, 虎, 牛, 草]
+        "populations": populations,
+        "final": populations[-1][1:],
+    }
+    if control.metrics.enabled:
+        result["metrics"] = control.metrics.summary()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ticks", type=int, default=100)
+    parser.add_argument("--map-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--init", type=int, nargs=3, default=Creature.INIT_NUM)
+    parser.add_argument("--max", type=int, nargs=3, default=maxCreatureNum)
+    parser.add_argument("--props", default=None)
+    parser.add_argument("--columnar", action="store_true")
+    parser.add_argument(
+        "--grass-model", choices=("objects", "field"), default="objects"
+    )
+    parser.add_argument("--path-processes", type=int, default=0)
+    parser.add_argument("--every", type=int, default=1)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--metrics-csv", default=None)
+    parser.add_argument("--trace", default=None)
+    parser.add_argument("--checkpoint-dir", default=None)
+    parser.add_argument("--checkpoint-every", type=int, default=100)
+    parser.add_argument("--resume", default=None)
+    parser.add_argument("--event-log", default=None)
+    args = parser.parse_args()
+
+    metrics = Metrics() if args.metrics_csv != None or args.trace != None else None
+
+    result = run(
+        args.ticks,
+        mapSize=args.map_size,
+        every=args.every,
+        seed=args.seed,
+        initNum=args.init,
+        maxNum=args.max,
+        props=loadProps(args.props) if args.props != None else None,
+        columnar=args.columnar,
+        grassModel=args.grass_model,
+        pathProcesses=args.path_processes,
+        metrics=metrics,
+        checkpointDir=args.checkpoint_dir,
+        checkpointEvery=args.checkpoint_every,
+        resume=args.resume,
+        eventLog=args.event_log,
+    )
+    if args.metrics_csv != None:
+        metrics.toCSV(args.metrics_csv)
+    if args.trace != None:
+        metrics.toChromeTrace(args.trace)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output != None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+# 分层寻路（HPA*）：把 BarrierMap 切成 clusterSize × clusterSize 的簇，
+# 在相邻簇的公共边界上放置过渡点（抽象节点），预先算好同一个簇内抽象节点之间的距离。
+# 查询时只在抽象图上搜索，再把前几段细化成逐格的路径，findPath 只需要走 steps 步
+from heapq import heappush, heappop
+
+from AStar import NEIGHBOR_STEPS, octile
+from vector import Vector
+
+CLUSTER_SIZE = 10
+# 入口段长度达到这个值时在两端各放一个过渡点，否则只在中点放一个
+LONG_ENTRANCE = 6
+
+
+class HierarchicalMap:
+    def __init__(self, msize, _map, clusterSize=CLUSTER_SIZE):
+        self.mapsize = msize
+        self.map = _map  # 地图，0是空位，1是障碍
+        self.clusterSize = clusterSize
+        self.clusterNum = (msize + clusterSize - 1) // clusterSize
+        self.build()
+
+    # 预处理整张地图
+    def build(self):
+        self.borders = {}  # 边界 -> [(簇A一侧的格子, 簇B一侧的格子), ...]
+        self.inter = {}  # 抽象节点 -> {跨边界相邻的抽象节点: 代价}
+        self.intra = {}  # 簇 -> {抽象节点: {同簇抽象节点: 代价}}
+        self.blocked = {}  # 簇 -> 簇内有没有障碍
+        n = self.clusterNum
+        for cy in range(n):
+            for cx in range(n):
+                self.blocked[(cx, cy)] = self.hasBarrier((cx, cy))
+        for cy in range(n):
+            for cx in range(n):
+                if cx + 1 < n:
+                    self.buildBorder(("h", cx, cy))
+                if cy + 1 < n:
+                    self.buildBorder(("v", cx, cy))
+        for cy in range(n):
+            for cx in range(n):
+                self.buildCluster((cx, cy))
+
+    # 障碍发生变化时，只重建该格所在的簇、它的四条边界以及边界另一侧的簇
+    def updateCell(self, x, y):
+        cluster = self.clusterOf(x, y)
+        cx, cy = cluster
+        n = self.clusterNum
+        self.blocked[cluster] = self.hasBarrier(cluster)
+
+        affected = {cluster}
+        for border, other in (
+            (("h", cx - 1, cy), (cx - 1, cy)),
+            (("h", cx, cy), (cx + 1, cy)),
+            (("v", cx, cy - 1), (cx, cy - 1)),
+            (("v", cx, cy), (cx, cy + 1)),
+        ):
+            if 0 <= other[0] < n and 0 <= other[1] < n:
+                self.buildBorder(border)
+                affected.add(other)
+        for c in affected:
+            self.buildCluster(c)
+
+    def cellId(self, x, y):
+        return y * self.mapsize + x
+
+    def cellXY(self, cell):
+        return cell % self.mapsize, cell // self.mapsize
+
+    def clusterOf(self, x, y):
+        return x // self.clusterSize, y // self.clusterSize
+
+    # 簇的范围 (x0, y0, x1, y1)，不含 x1、y1
+    def bounds(self, cluster):
+        C = self.clusterSize
+        cx, cy = cluster
+        return (
+            cx * C,
+            cy * C,
+            min((cx + 1) * C, self.mapsize),
+            min((cy + 1) * C, self.mapsize),
+        )
+
+    def hasBarrier(self, cluster):
+        x0, y0, x1, y1 = self.bounds(cluster)
+        return any(1 in row[x0:x1] for row in self.map[y0:y1])
+
+    def isFree(self, x, y):
+        return self.map[y][x] != 1
+
+    # 重新计算一条边界上的过渡点。
+    # ("h", cx, cy) 是簇 (cx, cy) 与右侧簇之间的边界，("v", cx, cy) 是与上方簇之间的边界
+    def buildBorder(self, border):
+        for a, b in self.borders.get(border, []):
+            for u, v in ((a, b), (b, a)):
+                edges = self.inter[u]
+                edges.pop(v, None)
+                if len(edges) == 0:
+                    del self.inter[u]
+
+        kind, cx, cy = border
+        x0, y0, x1, y1 = self.bounds((cx, cy))
+        if kind == "h":
+            pairs = [((x1 - 1, y), (x1, y)) for y in range(y0, y1)]
+        else:
+            pairs = [((x, y1 - 1), (x, y1)) for x in range(x0, x1)]
+
+        # 两侧都不是障碍的连续格子构成一个入口段
+        segments = []
+        segment = []
+        for a, b in pairs:
+            if self.isFree(*a) and self.isFree(*b):
+                segment.append((a, b))
+            elif segment:
+                segments.append(segment)
+                segment = []
+        if segment:
+            segments.append(segment)
+
+        transitions = []
+        for segment in segments:
+            if len(segment) >= LONG_ENTRANCE:
+                chosen = [segment[0], segment[-1]]
+            else:
+                chosen = [segment[len(segment) // 2]]
+            for a, b in chosen:
+                a, b = self.cellId(*a), self.cellId(*b)
+                transitions.append((a, b))
+                self.inter.setdefault(a, {})[b] = 1.0
+                self.inter.setdefault(b, {})[a] = 1.0
+        self.borders[border] = transitions
+
+    # 簇内所有的抽象节点
+    def clusterNodes(self, cluster):
+        cx, cy = cluster
+        nodes = set()
+        for border, side in (
+            (("h", cx - 1, cy), 1),
+            (("h", cx, cy), 0),
+            (("v", cx, cy - 1), 1),
+            (("v", cx, cy), 0),
+        ):
+            for pair in self.borders.get(border, []):
+                nodes.add(pair[side])
+        return nodes
+
+    # 重新计算簇内抽象节点两两之间的距离
+    def buildCluster(self, cluster):
+        nodes = list(self.clusterNodes(cluster))
+        edges = {u: {} for u in nodes}
+        for i, u in enumerate(nodes):
+            others = nodes[i + 1 :]
+            if len(others) == 0:
+                continue
+            costs = self.clusterDistances(cluster, u, others)
+            for v, cost in costs.items():
+                edges[u][v] = cost
+                edges[v][u] = cost
+        self.intra[cluster] = edges
+
+    # 从 source 出发，只在簇内搜索，返回到各个 targets 的距离（走不到的不在结果里）
+    def clusterDistances(self, cluster, source, targets):
+        sx, sy = self.cellXY(source)
+        if not self.blocked[cluster]:
+            # 没有障碍的矩形里，两点之间的最短路就是 octile 距离
+            result = {}
+            for target in targets:
+                tx, ty = self.cellXY(target)
+                result[target] = octile(tx - sx, ty - sy)
+            return result
+        dist, _ = self.clusterSearch(cluster, source, set(targets))
+        return {target: dist[target] for target in targets if target in dist}
+
+    # 簇内的 Dijkstra，所有 targets 都确定后提前结束，返回 (距离表, 前驱表)
+    def clusterSearch(self, cluster, source, targets):
+        x0, y0, x1, y1 = self.bounds(cluster)
+        size = self.mapsize
+        grid = self.map
+        dist = {source: 0.0}
+        parent = {source: None}
+        closed = set()
+        remaining = len(targets)
+        heap = [(0.0, source)]
+        while heap and remaining > 0:
+            d, cell = heappop(heap)
+            if cell in closed:
+                continue
+            closed.add(cell)
+            if cell in targets:
+                remaining -= 1
+            x, y = cell % size, cell // size
+            for dx, dy, cost in NEIGHBOR_STEPS:
+                nx, ny = x + dx, y + dy
+                if nx < x0 or ny < y0 or nx >= x1 or ny >= y1 or grid[ny][nx] == 1:
+                    continue
+                nCell = ny * size + nx
+                nd = d + cost
+                if nCell not in closed and nd < dist.get(nCell, nd + 1):
+                    dist[nCell] = nd
+                    parent[nCell] = cell
+                    heappush(heap, (nd, nCell))
+        return {cell: dist[cell] for cell in closed}, parent
+
+    # 把抽象路径上相邻的两个点 a -> b 细化成逐格路径（不含 a）
+    def refine(self, a, b):
+        ax, ay = self.cellXY(a)
+        bx, by = self.cellXY(b)
+        if abs(ax - bx) <= 1 and abs(ay - by) <= 1:
+            return [Vector(bx, by)]
+        cluster = self.clusterOf(ax, ay)
+        if not self.blocked[cluster]:
+            # 先斜着走，再直着走，全程都在两点的包围盒里
+            result = []
+            while ax != bx or ay != by:
+                ax += (bx > ax) - (bx < ax)
+                ay += (by > ay) - (by < ay)
+                result.append(Vector(ax, ay))
+            return result
+        _, parent = self.clusterSearch(cluster, a, {b})
+        result = []
+        cell = b
+        while cell != a:
+            result.append(Vector(*self.cellXY(cell)))
+            cell = parent[cell]
+        result.reverse()
+        return result
+
+    # 在抽象图上搜索 startPos -> endPos，然后只细化出从起点开始的至少 length 个格子。
+    # 返回从起点开始的逐格路径（含起点，到达终点时含终点），找不到路径返回 None
+    def pathPrefix(self, startPos, endPos, length):
+        if not self.isFree(endPos.X, endPos.Y):
+            return None
+        start = self.cellId(startPos.X, startPos.Y)
+        goal = self.cellId(endPos.X, endPos.Y)
+        if start == goal:
+            return [Vector(startPos.X, startPos.Y)]
+
+        startCluster = self.clusterOf(startPos.X, startPos.Y)
+        goalCluster = self.clusterOf(endPos.X, endPos.Y)
+
+        # 临时把起点、终点接入抽象图
+        startNodes = self.clusterNodes(startCluster)
+        goalNodes = self.clusterNodes(goalCluster)
+        startEdges = self.clusterDistances(startCluster, start, list(startNodes))
+        goalEdges = self.clusterDistances(goalCluster, goal, list(goalNodes))
+        if startCluster == goalCluster:
+            direct = self.clusterDistances(startCluster, start, [goal])
+            startEdges.update(direct)
+
+        def neighbors(u):
+            cluster = self.clusterOf(*self.cellXY(u))
+            result = list(self.intra[cluster].get(u, {}).items())
+            result += self.inter.get(u, {}).items()
+            if u == start:
+                result += startEdges.items()
+            if u in goalEdges:
+                result.append((goal, goalEdges[u]))
+            return result
+
+        ex, ey = endPos.X, endPos.Y
+        g = {start: 0.0}
+        parent = {start: None}
+        closed = set()
+        seq = 0
+        heap = [(0.0, seq, start)]
+        while heap:
+            _, _, u = heappop(heap)
+            if u in closed:
+                continue
+            closed.add(u)
+            if u == goal:
+                break
+            for v, cost in neighbors(u):
+                ng = g[u] + cost
+                if v in closed or ng >= g.get(v, ng + 1):
+                    continue
+                g[v] = ng
+                parent[v] = u
+                vx, vy = self.cellXY(v)
+                seq += 1
+                heappush(heap, (ng + octile(ex - vx, ey - vy), seq, v))
+        if goal not in closed:
+            return None
+
+        abstractPath = []
+        cell = goal
+        while cell != None:
+            abstractPath.append(cell)
+            cell = parent[cell]
+        abstractPath.reverse()
+
+        # 只细化够用的前几段
+        result = [Vector(startPos.X, startPos.Y)]
+        for a, b in zip(abstractPath, abstractPath[1:]):
+            if len(result) > length:
+                break
+            result += self.refine(a, b)
+        return result
@@ -0,0 +1,170 @@
+# 老虎决策的批处理内核：一次算出所有老虎视野内的牛，为每只老虎选出吃掉或追捕的牛，
+# 规则与 Control.decisionForPredator 逐只计算时相同：
+#   视野（切比雪夫距离）内且能量大于 0 的牛才是候选，候选按牛在列表中的顺序排列；
+#   第一只距离平方不超过 EAT_RANGE 的牛直接吃掉；
+#   否则追捕时间（距离平方 / 速度差的平方）最短的牛，都不小于 9999 时追第一只候选；
+#   追捕目标的距离平方在 (EAT_RANGE, CHASE_EAT_RANGE] 内时顺便吃掉。
+# 牛按 visibleRange 大小的网格分桶，每只老虎只与相邻 3 × 3 个桶里的牛配对，
+# 老虎很多时再按 chunk 只一块分批配对，内存只与配对数成正比
+import numpy as np
+
+EAT_RANGE = 2
+CHASE_EAT_RANGE = 9
+INITIAL_HUNTING_TIME = 9999
+
+# 每只老虎的动作
+WANDER = 0  # 视野内没有候选，随机移动
+EAT = 1  # 原地吃掉身旁的牛
+CHASE = 2  # 追捕目标
+CHASE_EAT = 3  # 追捕目标的同时把它吃掉
+
+
+# 牛按网格分桶：返回 (排好序的桶号, 对应的牛下标, 网格宽度)。同一个桶内保持列表顺序
+def bucketCows(cowX, cowY, bucketSize, width):
+    key = (cowY // bucketSize + 1) * width + cowX // bucketSize + 1
+    order = np.argsort(key, kind="stable")
+    return key[order], order
+
+
+# 一块老虎与相邻桶里的牛配成对，返回 (老虎下标, 牛下标)，同一只老虎的牛按下标升序
+def candidatePairs(tX, tY, sortedKey, order, bucketSize, width):
+    tigerKey = (tY // bucketSize + 1) * width + tX // bucketSize + 1
+    offsets = np.array([dy * width + dx for dy in (-1, 0, 1) for dx in (-1, 0, 1)])
+    keys = tigerKey[:, None] + offsets[None, :]
+    lo = np.searchsorted(sortedKey, keys, "left").ravel()
+    hi = np.searchsorted(sortedKey, keys, "right").ravel()
+    counts = hi - lo
+    total = int(counts.sum())
+    tigers = np.repeat(np.arange(len(tX)).repeat(len(offsets)), counts)
+    starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+    cows = order[starts + np.arange(total)]
+    pairOrder = np.lexsort((cows, tigers))
+    return tigers[pairOrder], cows[pairOrder]
+
+
+# 每只老虎在 mask 选中的配对里 key 最小的那一对（key 相同取牛下标最小的），
+# 返回 (有没有, 牛下标)
+def firstPerTiger(nTiger, tigers, cows, mask, key=None):
+    tigers, cows = tigers[mask], cows[mask]
+    if key is not None:
+        order = np.lexsort((cows, key[mask], tigers))
+        tigers, cows = tigers[order], cows[order]
+    found = np.zeros(nTiger, dtype=bool)
+    result = np.full(nTiger, -1, dtype=np.int64)
+    first = np.ones(len(tigers), dtype=bool)
+    first[1:] = tigers[1:] != tigers[:-1]
+    found[tigers[first]] = True
+    result[tigers[first]] = cows[first]
+    return found, result
+
+
+# 一块老虎的决策。eatenBy 不为空时，第 i 只老虎不能选 eatenBy 小于 i 的牛
+def decideChunk(
+    offset,
+    tX,
+    tY,
+    tSpeed,
+    cowX,
+    cowY,
+    cowSpeed,
+    cowAlive,
+    buckets,
+    visibleRange,
+    eatenBy,
+):
+    sortedKey, order, width = buckets
+    nTiger = len(tX)
+    tigers, cows = candidatePairs(tX, tY, sortedKey, order, visibleRange, width)
+    dX = cowX[cows] - tX[tigers]
+    dY = cowY[cows] - tY[tigers]
+    visible = (np.abs(dX) <= visibleRange) & (np.abs(dY) <= visibleRange)
+    visible &= cowAlive[cows]
+    if eatenBy is not None:
+        visible &= eatenBy[cows] >= tigers + offset
+    d2 = dX * dX + dY * dY
+
+    hasPrey, firstPrey = firstPerTiger(nTiger, tigers, cows, visible)
+    hasEat, eatTarget = firstPerTiger(nTiger, tigers, cows, visible & (d2 <= EAT_RANGE))
+    # 速度相同时追捕时间为 inf（距离为零时为 nan），不会被选作追捕目标，不必报警告
+    with np.errstate(divide="ignore", invalid="ignore"):
+        huntingTime = d2 / (tSpeed[tigers] - cowSpeed[cows]) ** 2
+        _, best = firstPerTiger(nTiger, tigers, cows, visible, huntingTime)
+
+        # 目标的追捕时间与距离平方
+        bestTime = np.full(nTiger, np.inf)
+        bestTime[hasPrey] = (
+            (cowX[best[hasPrey]] - tX[hasPrey]) ** 2
+            + (cowY[best[hasPrey]] - tY[hasPrey]) ** 2
+        ) / (tSpeed[hasPrey] - cowSpeed[best[hasPrey]]) ** 2
+    chosen = np.where(bestTime < INITIAL_HUNTING_TIME, best, firstPrey)
+    chosenD2 = (cowX[chosen] - tX) ** 2 + (cowY[chosen] - tY) ** 2
+
+    action = np.full(nTiger, WANDER, dtype=np.int8)
+    target = np.full(nTiger, -1, dtype=np.int64)
+    chase = hasPrey & ~hasEat
+    action[chase] = np.where(chosenD2[chase] <= CHASE_EAT_RANGE, CHASE_EAT, CHASE)
+    target[chase] = chosen[chase]
+    action[hasEat] = EAT
+    target[hasEat] = eatTarget[hasEat]
+    return action, target
+
+
+# 返回 (action, target)：每只老虎的动作与目标牛的下标（没有目标时为 -1）。
+# exclusive 为 False 时与原来逐只决策完全一致——被吃掉的牛能量不变，后面的老虎仍可能再吃它；
+# 为 True 时一只牛只能被吃一次，相当于老虎按顺序决策、并跳过前面的老虎已经吃掉的牛
+def huntDecisions(
+    tigerX,
+    tigerY,
+    tigerSpeed,
+    cowX,
+    cowY,
+    cowSpeed,
+    cowEnergy,
+    visibleRange,
+    exclusive=False,
+    chunk=4096,
+):
+    tigerX, tigerY = np.asarray(tigerX, np.int64), np.asarray(tigerY, np.int64)
+    tigerSpeed = np.asarray(tigerSpeed, np.float64)
+    cowX, cowY = np.asarray(cowX, np.int64), np.asarray(cowY, np.int64)
+    cowSpeed = np.asarray(cowSpeed, np.float64)
+    cowAlive = np.asarray(cowEnergy) > 0
+    nTiger, nCow = len(tigerX), len(cowX)
+
+    action = np.full(nTiger, WANDER, dtype=np.int8)
+    target = np.full(nTiger, -1, dtype=np.int64)
+    if nTiger == 0 or nCow == 0:
+        return action, target
+
+    bucketSize = max(int(visibleRange), 1)
+    width = int(max(tigerX.max(), cowX.max())) // bucketSize + 3
+    sortedKey, order = bucketCows(cowX, cowY, bucketSize, width)
+    buckets = (sortedKey, order, width)
+
+    # 每只牛被编号最小的哪只老虎吃掉；前面的老虎定下来之后后面的才会定，最多 nTiger 轮
+    eatenBy = np.full(nCow, nTiger, dtype=np.int64) if exclusive else None
+    for _ in range(nTiger + 1):
+        for start in range(0, nTiger, chunk):
+            end = min(start + chunk, nTiger)
+            action[start:end], target[start:end] = decideChunk(
+                start,
+                tigerX[start:end],
+                tigerY[start:end],
+                tigerSpeed[start:end],
+                cowX,
+                cowY,
+                cowSpeed,
+                cowAlive,
+                buckets,
+                bucketSize,
+                eatenBy,
+            )
+        if not exclusive:
+            break
+        eats = np.flatnonzero((action == EAT) | (action == CHASE_EAT))
+        newEatenBy = np.full(nCow, nTiger, dtype=np.int64)
+        np.minimum.at(newEatenBy, target[eats], eats)
+        if np.array_equal(newEatenBy, eatenBy):
+            break
+        eatenBy = newEatenBy
+    return action, target
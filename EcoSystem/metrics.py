@@ -0,0 +1,115 @@
+# 运行指标：每个周期各阶段的耗时与若干计数器（寻路次数、扩展节点数、缓存命中、出生、死亡、进食、移动冲突等）。
+# Control.metrics 默认是 NULL_METRICS，所有方法都是空操作，埋点处几乎没有开销；
+# 换成 Metrics() 之后按周期汇总，可以导出为 CSV（一行一个周期）或 Chrome trace
+# （chrome://tracing 或 Perfetto 打开，能看到每个周期的时间花在了哪里）
+import csv
+import json
+from time import perf_counter
+
+# 常用计数器，导出 CSV 时排在前面
+COUNTERS = (
+    "pathRequests",  # 提交给 PathBroker 的寻路请求
+    "pathCacheHits",  # 与同一周期内的请求完全相同、直接复用结果的
+    "pathSearches",  # 实际做的搜索次数（A*、JPS、一对多搜索、增量寻路、分层寻路）
+    "nodesExpanded",  # 搜索扩展过的节点数（分层寻路不计）
+    "moves",  # 实际移动的生物
+    "moveConflicts",  # 想移动但目标格不能落脚或抢格落败、留在原地的生物
+    "eats",  # 成功的进食
+    "births",
+    "deaths",  # 老化阶段清除的生物，含被吃掉的
+)
+
+
+class NullMetrics:
+    enabled = False
+
+    def count(self, name, n=1):
+        pass
+
+    def phase(self, name, start, end):
+        pass
+
+    def endTick(self, tick, start, end):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+class Metrics(NullMetrics):
+    enabled = True
+
+    def __init__(self):
+        self.origin = perf_counter()
+        self.current = {}  # 本周期到目前为止的计数
+        self.currentPhases = {}  # 本周期各阶段的耗时（秒）
+        self.totals = {}  # 所有周期累计的计数
+        self.rows = []  # 每个周期一行：{"tick", 阶段耗时..., 计数...}
+        self.events = []  # Chrome trace 事件
+
+    def count(self, name, n=1):
+        self.current[name] = self.current.get(name, 0) + n
+
+    def event(self, name, start, end, tid=0):
+        return {
+            "name": name,
+            "ph": "X",
+            "ts": (start - self.origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": 0,
+            "tid": tid,
+        }
+
+    # 记下一段从 start 到 end（perf_counter 的读数）的耗时，同名的在一个周期内累加
+    def phase(self, name, start, end):
+        self.currentPhases[name] = self.currentPhases.get(name, 0.0) + end - start
+        self.events.append(self.event(name, start, end))
+
+    # 一个周期结束：把本周期的耗时与计数存成一行；trace 里周期本身单独占一行，计数画成曲线
+    def endTick(self, tick, start, end):
+        self.events.append(self.event(f"tick {tick}", start, end, tid=1))
+        self.events.append(
+            {
+                "name": "counters",
+                "ph": "C",
+                "ts": (end - self.origin) * 1e6,
+                "pid": 0,
+                "args": dict(self.current),
+            }
+        )
+        row = {"tick": tick, "seconds": end - start}
+        row.update({f"{name}Seconds": t for name, t in self.currentPhases.items()})
+        row.update(self.current)
+        self.rows.append(row)
+        for name, n in self.current.items():
+            self.totals[name] = self.totals.get(name, 0) + n
+        self.current = {}
+        self.currentPhases = {}
+
+    # 所有周期的总计：计数与各阶段的累计耗时
+    def summary(self):
+        result = dict(self.totals)
+        for row in self.rows:
+            for key, value in row.items():
+                if key.endswith("Seconds") or key == "seconds":
+                    result[key] = result.get(key, 0.0) + value
+        result["ticks"] = len(self.rows)
+        return result
+
+    def columns(self):
+        keys = {key for row in self.rows for key in row}
+        ordered = ["tick", "seconds"]
+        ordered += sorted(k for k in keys if k.endswith("Seconds"))
+        ordered += [k for k in COUNTERS if k in keys]
+        ordered += sorted(keys.difference(ordered))
+        return ordered
+
+    def toCSV(self, path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, self.columns(), restval=0)
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+    def toChromeTrace(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,73 @@
+# 移动结算：同一物种的所有生物先各自提出目标格，再统一决定谁能走。
+# 目标格越界、是障碍或被其他物种挡住的直接作废；同一格有多只要去时按策略选出一只，
+# 其余的退回原地。退回原地的生物仍占着原来的格子，要去那里的生物也随之作废，
+# 如此反复直到没有变化（能走的只会越来越少，一定会停下来）。
+# 互换位置、跟着前面的生物走进它刚让出的格子都是允许的。
+# 格子编号为 Y * mapsize + X
+import numpy as np
+
+from occupancy import BLOCKING_LAYERS
+
+# random：随机选一只；energy：能量高的优先；first：决策在前的优先。
+# 同等条件下都是决策在前的优先
+POLICIES = ("random", "energy", "first")
+
+
+# 物种 code 的 N 只生物从 (Xs, Ys) 走向 (nXs, nYs)，返回哪些生物可以移动的布尔数组。
+# occupancy 中该物种的标记应当包含这 N 只生物；energy 在 policy 为 "energy" 时使用，
+# rng 在 policy 为 "random" 时使用
+def resolveMoves(
+    occupancy, code, Xs, Ys, nXs, nYs, policy="first", energy=None, rng=None
+):
+    if policy not in POLICIES:
+        raise ValueError(f"未知的移动结算策略：{policy}")
+    Xs, Ys = np.asarray(Xs, np.int64), np.asarray(Ys, np.int64)
+    nXs, nYs = np.asarray(nXs, np.int64), np.asarray(nYs, np.int64)
+    N = len(Xs)
+    if N == 0:
+        return np.zeros(0, dtype=bool)
+    size = occupancy.mapsize
+    cells = size * size
+
+    # 越界、障碍与其他物种的阻挡与本物种怎么走无关，先一次判定
+    moving = (Xs != nXs) | (Ys != nYs)
+    moving &= occupancy.validMask(
+        code,
+        nXs,
+        nYs,
+        layers=[layer for layer in BLOCKING_LAYERS[code] if layer != code],
+    )
+    current = Ys * size + Xs
+    target = np.where(moving, nYs * size + nXs, 0)
+
+    # 本物种中不参与这次结算的生物一直占着自己的格子
+    others = occupancy.grid[code].reshape(-1).astype(np.int64)
+    others -= np.bincount(current, minlength=cells)
+    others = others > 0
+
+    # 同一格的竞争者按 (目标格, 策略优先级, 决策顺序) 排序，每格排第一的胜出
+    index = np.arange(N)
+    if policy == "random":
+        keys = (
+            index,
+            (rng if rng is not None else np.random.default_rng()).permutation(N),
+        )
+    elif policy == "energy":
+        keys = (index, -np.asarray(energy, np.float64))
+    else:
+        keys = (index,)
+
+    while True:
+        staying = np.bincount(current[~moving], minlength=cells) > 0
+        contenders = moving & ~others[target] & ~staying[target]
+        candidates = np.flatnonzero(contenders)
+        order = candidates[
+            np.lexsort(tuple(key[candidates] for key in keys) + (target[candidates],))
+        ]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = target[order][1:] != target[order][:-1]
+        winners = np.zeros(N, dtype=bool)
+        winners[order[first]] = True
+        if np.array_equal(winners, moving):
+            return winners
+        moving = winners
@@ -0,0 +1,170 @@
+# 生物占位图：一个 (物种 × Y × X) 的 uint8 数组，每格记录该物种有几只生物站在上面，
+# 另有一张障碍图。标记、取消标记、移动都支持一次处理多个位置；
+# 每个物种占了多少格、地图上有多少非障碍格都随着标记增量维护，不必每次重新求和。
+# 每个物种还有一份空格索引（FreeCellIndex），某格的计数在 0 与非 0 之间变化时随之增删
+import random
+import threading
+
+import numpy as np
+
+from freecells import FreeCellIndex
+
+# 各物种的落脚点不能与哪些物种重叠（与 Control.isPosValid 原来的规则一致）：
+# 老虎不与老虎重叠，牛不与牛、老虎重叠，草不与草重叠
+BLOCKING_LAYERS = [(0,), (1, 0), (2,)]
+# 反过来，每一层会挡住哪些物种
+BLOCKED_CODES = [
+    tuple(code for code, layers in enumerate(BLOCKING_LAYERS) if layer in layers)
+    for layer in range(len(BLOCKING_LAYERS))
+]
+
+
+class OccupancyGrid:
+    def __init__(self, msize, layers=3):
+        self.mapsize = msize
+        self.grid = np.zeros((layers, msize, msize), dtype=np.uint8)
+        self.barrier = np.zeros((msize, msize), dtype=bool)
+        self.openCells = msize * msize  # 非障碍格子数
+        self.occupied = [0] * layers  # 每个物种占了多少格
+        self.free = [FreeCellIndex(msize) for _ in range(layers)]  # 各物种可落脚的格子
+        self.lock = threading.RLock()
+
+    def setBarrier(self, barrierMap):
+        with self.lock:
+            self.barrier = np.asarray(barrierMap) == 1
+            self.openCells = int(self.barrier.size - np.count_nonzero(self.barrier))
+            for code in range(len(self.free)):
+                self.free[code].reset(self.validGrid(code))
+
+    def setBarrierCell(self, X, Y, value):
+        with self.lock:
+            if self.barrier[Y, X] != (value == 1):
+                self.barrier[Y, X] = value == 1
+                self.openCells += -1 if value == 1 else 1
+                for code in range(len(self.free)):
+                    self.updateFree(code, X, Y)
+
+    def clear(self, layer):
+        with self.lock:
+            self.grid[layer] = 0
+            self.occupied[layer] = 0
+            for code in BLOCKED_CODES[layer]:
+                self.free[code].reset(self.validGrid(code))
+
+    # 重新判断 (X, Y) 对物种 code 是否可以落脚
+    def updateFree(self, code, X, Y):
+        if self.isValid(code, X, Y):
+            self.free[code].add(Y * self.mapsize + X)
+        else:
+            self.free[code].remove(Y * self.mapsize + X)
+
+    # layer 层的 (X, Y) 从空变为有生物或反过来
+    def layerChanged(self, layer, X, Y):
+        for code in BLOCKED_CODES[layer]:
+            self.updateFree(code, X, Y)
+
+    # 该物种还能再放下多少只（不计其他物种的阻挡）
+    def freeCount(self, layer):
+        return self.openCells - self.occupied[layer]
+
+    def isOccupied(self, layer, X, Y):
+        return self.grid[layer, Y, X] != 0
+
+    def markOne(self, layer, X, Y):
+        with self.lock:
+            self.grid[layer, Y, X] += 1
+            if self.grid[layer, Y, X] == 1:
+                self.occupied[layer] += 1
+                self.layerChanged(layer, X, Y)
+
+    def unmarkOne(self, layer, X, Y):
+        with self.lock:
+            if self.grid[layer, Y, X] != 0:
+                self.grid[layer, Y, X] -= 1
+                if self.grid[layer, Y, X] == 0:
+                    self.occupied[layer] -= 1
+                    self.layerChanged(layer, X, Y)
+
+    def moveOne(self, layer, X, Y, nX, nY):
+        if (X, Y) != (nX, nY):
+            with self.lock:
+                self.unmarkOne(layer, X, Y)
+                self.markOne(layer, nX, nY)
+
+    # 一次标记多个位置，同一格出现多次就加多次
+    def mark(self, layer, Xs, Ys):
+        cells, counts = np.unique(
+            np.asarray(Ys, dtype=np.int64) * self.mapsize + np.asarray(Xs),
+            return_counts=True,
+        )
+        with self.lock:
+            flat = self.grid[layer].reshape(-1)
+            changed = cells[flat[cells] == 0]
+            self.occupied[layer] += len(changed)
+            flat[cells] += counts.astype(np.uint8)
+            self.cellsChanged(layer, changed)
+
+    # 一次取消标记多个位置
+    def unmark(self, layer, Xs, Ys):
+        cells, counts = np.unique(
+            np.asarray(Ys, dtype=np.int64) * self.mapsize + np.asarray(Xs),
+            return_counts=True,
+        )
+        with self.lock:
+            flat = self.grid[layer].reshape(-1)
+            before = flat[cells]
+            after = np.where(before > counts, before - counts, 0).astype(np.uint8)
+            flat[cells] = after
+            changed = cells[(before != 0) & (after == 0)]
+            self.occupied[layer] -= len(changed)
+            self.cellsChanged(layer, changed)
+
+    def cellsChanged(self, layer, cells):
+        for cell in cells.tolist():
+            self.layerChanged(layer, cell % self.mapsize, cell // self.mapsize)
+
+    # 一次移动多个生物
+    def move(self, layer, Xs, Ys, nXs, nYs):
+        with self.lock:
+            self.unmark(layer, Xs, Ys)
+            self.mark(layer, nXs, nYs)
+
+    # 物种 code 的一个随机空格 (X, Y)，没有空格时返回 None
+    def sampleFree(self, code, rng=random):
+        with self.lock:
+            cell = self.free[code].sample(rng)
+        return None if cell == None else (cell % self.mapsize, cell // self.mapsize)
+
+    # 物种 code 离 (X, Y) 最近、切比雪夫距离不超过 radius 的空格，没有时返回 None
+    def nearestFree(self, code, X, Y, radius):
+        with self.lock:
+            cell = self.free[code].nearest(X, Y, radius)
+        return None if cell == None else (cell % self.mapsize, cell // self.mapsize)
+
+    def isValid(self, code, X, Y):
+        if X < 0 or Y < 0 or X >= self.mapsize or Y >= self.mapsize:
+            return False
+        if self.barrier[Y, X]:
+            return False
+        for layer in BLOCKING_LAYERS[code]:
+            if self.grid[layer, Y, X] != 0:
+                return False
+        return True
+
+    # 一组候选位置对物种 code 是否可以落脚；layers 给出时只看这些层的阻挡
+    def validMask(self, code, Xs, Ys, layers=None):
+        Xs, Ys = np.asarray(Xs), np.asarray(Ys)
+        size = self.mapsize
+        mask = (Xs >= 0) & (Ys >= 0) & (Xs < size) & (Ys < size)
+        cX, cY = np.where(mask, Xs, 0), np.where(mask, Ys, 0)
+        mask &= ~self.barrier[cY, cX]
+        for layer in BLOCKING_LAYERS[code] if layers == None else layers:
+            mask &= self.grid[layer, cY, cX] == 0
+        return mask
+
+    # 整张地图上物种 code 可以落脚的格子
+    def validGrid(self, code):
+        mask = ~self.barrier
+        for layer in BLOCKING_LAYERS[code]:
+            mask &= self.grid[layer] == 0
+        return mask
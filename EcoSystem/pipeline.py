@@ -0,0 +1,245 @@
+# 模拟与界面分开运行：模拟在单独的进程里连续推进，每个周期结束后把一帧（周期数、各物种数量与位置）
+# 写进共享内存里的环形缓冲区；界面按自己的节奏只取最新的一帧来画，来不及画的帧直接丢掉，
+# 慢的周期不会卡住窗口，模拟也可以跑在绘制前面。开始、暂停、重新初始化都是发给模拟进程的消息。
+# 每个槽位有一个帧号：写之前置为 -1，写完再填上，最后更新 published；
+# 读的一方在复制数据前后各看一次帧号，不一致说明复制时被覆盖了，丢掉这一帧等下一帧即可。
+# 给了 eventLog 时模拟进程把每次初始化之后的各个周期记进这个事件日志（见 eventlog.py），界面可以据此回看
+import multiprocessing
+import queue
+import traceback
+from multiprocessing import shared_memory
+from time import perf_counter
+
+import numpy as np
+
+from control import Control, defaultBarrierMap
+from eventlog import EventRecorder
+
+
+class Frame:
+    def __init__(self, number, generation, tick, ended, counts, positions):
+        self.number = number  # 第几帧，从 0 开始
+        self.generation = (
+            generation  # 第几次初始化之后的帧，界面据此丢掉初始化之前的旧帧
+        )
+        self.tick = tick  # 模拟的周期数
+        self.ended = ended  # 牛或老虎已经灭绝，模拟停了下来
+        self.counts = counts  # [虎, 牛, 草] 的数量
+        self.positions = positions  # 每个物种的 (Xs, Ys)
+
+
+# 共享内存里的帧环形缓冲区：slots 个槽位，每个槽位能放下每个物种一格一只的全部位置（格子编号）
+class FrameRing:
+    def __init__(self, msize, slots=4, name=None):
+        self.mapsize = msize
+        self.slots = slots
+        layout = [
+            ("published", (1,), np.int64),  # 最新写完的帧号
+            ("seq", (slots,), np.int64),  # 各槽位里的帧号，-1 为正在写
+            ("generation", (slots,), np.int64),
+            ("tick", (slots,), np.int64),
+            ("ended", (slots,), np.int64),
+            ("counts", (slots, 3), np.int64),
+            ("barrier", (msize, msize), np.uint8),
+            ("cells", (slots, 3, msize * msize), np.int32),
+        ]
+        offsets, size = [], 0
+        for _, shape, dtype in layout:
+            offsets.append(size)
+            size += (int(np.prod(shape)) * np.dtype(dtype).itemsize + 7) // 8 * 8
+        self.shm = shared_memory.SharedMemory(name=name, create=name == None, size=size)
+        for (field, shape, dtype), offset in zip(layout, offsets):
+            setattr(self, field, np.ndarray(shape, dtype, self.shm.buf, offset))
+        if name == None:
+            self.published[0] = -1
+            self.seq[:] = -1
+
+    def publish(self, generation, tick, positions, ended=False):
+        number = int(self.published[0]) + 1
+        slot = number % self.slots
+        self.seq[slot] = -1
+        self.generation[slot] = generation
+        self.tick[slot] = tick
+        self.ended[slot] = ended
+        for code, (Xs, Ys) in enumerate(positions):
+            n = len(Xs)
+            self.counts[slot, code] = n
+            self.cells[slot, code, :n] = np.asarray(Ys) * self.mapsize + np.asarray(Xs)
+        self.seq[slot] = number
+        self.published[0] = number
+
+    # 帧号大于 after 的最新一帧，没有新帧或复制时被覆盖了返回 None
+    def latest(self, after=-1):
+        number = int(self.published[0])
+        if number <= after:
+            return None
+        slot = number % self.slots
+        if self.seq[slot] != number:
+            return None
+        generation = int(self.generation[slot])
+        tick = int(self.tick[slot])
+        ended = bool(self.ended[slot])
+        counts = self.counts[slot].tolist()
+        cells = [self.cells[slot, code, : counts[code]].copy() for code in range(3)]
+        if self.seq[slot] != number:
+            return None
+        positions = [np.divmod(c, self.mapsize)[::-1] for c in cells]
+        return Frame(number, generation, tick, ended, counts, positions)
+
+    def close(self):
+        del self.published, self.seq, self.generation, self.tick, self.ended
+        del self.counts, self.barrier, self.cells
+        self.shm.close()
+
+
+def publishFrame(ring, control, generation, ended=False):
+    ring.publish(
+        generation,
+        control.scheduler.tickCount,
+        [control.positions(code) for code in range(3)],
+        ended,
+    )
+
+
+# 模拟进程：按消息初始化、开始、暂停；运行时每 interval 秒至多推进一个周期
+def runSimulation(spec, ringName, commands, errors):
+    ring = recorder = None
+    try:
+        ring = FrameRing(spec["mapSize"], spec["slots"], ringName)
+        control = Control(spec["mapSize"], seed=spec["seed"], **spec["options"])
+        control.barrier_init(np.array(ring.barrier))
+        interval = spec["interval"]
+        running = ended = False
+        generation = 0
+        nextTick = perf_counter()
+        publishFrame(ring, control, generation)
+        while True:
+            try:
+                if not running:
+                    message = commands.get()
+                else:
+                    message = commands.get(timeout=max(nextTick - perf_counter(), 0))
+            except queue.Empty:
+                message = ("tick",)
+            if message == None:
+                break
+            kind = message[0]
+            if kind == "init":
+                generation, numbers = message[1], message[2]
+                control.creature_init(*numbers)
+                if spec["eventLog"] != None:
+                    if recorder != None:
+                        recorder.close()
+                    recorder = EventRecorder(control, spec["eventLog"])
+                ended = False
+                publishFrame(ring, control, generation)
+            elif kind == "start":
+                running = not ended
+                nextTick = perf_counter()
+            elif kind == "stop":
+                running = False
+            elif kind == "interval":
+                interval = message[1]
+            elif kind == "tick" and running:
+                nextTick = perf_counter() + interval
+                control.dayPass()
+                if recorder != None:
+                    recorder.tick()
+                # 牛和老虎有一者灭绝就停下
+                ended = (
+                    len(control.CreatureLst[0]) == 0 or len(control.CreatureLst[1]) == 0
+                )
+                running = not ended
+                publishFrame(ring, control, generation, ended)
+    except Exception:
+        errors.put(traceback.format_exc())
+    finally:
+        control = None
+        if recorder != None:
+            recorder.close()
+        if ring != None:
+            ring.close()
+
+
+class SimulationProcess:
+    # interval 为两个周期之间至少间隔多少秒；barrierMap 不给时用 Control 的默认障碍；
+    # eventLog 为事件日志的路径，每次初始化重新开始记录；其余参数传给 Control
+    def __init__(
+        self,
+        mapSize,
+        seed=None,
+        interval=0.0,
+        slots=4,
+        barrierMap=None,
+        eventLog=None,
+        **options
+    ):
+        self.ring = FrameRing(mapSize, slots)
+        self.barrierMap = np.asarray(
+            barrierMap if barrierMap is not None else defaultBarrierMap(mapSize),
+            dtype=np.uint8,
+        )
+        self.ring.barrier[:] = self.barrierMap
+        self.commands = multiprocessing.Queue()
+        self.errors = multiprocessing.Queue()
+        spec = {
+            "mapSize": mapSize,
+            "slots": slots,
+            "seed": seed,
+            "interval": interval,
+            "eventLog": eventLog,
+            "options": options,
+        }
+        self.process = multiprocessing.Process(
+            target=runSimulation,
+            args=(spec, self.ring.shm.name, self.commands, self.errors),
+            daemon=True,
+        )
+        self.process.start()
+        self.lastFrame = -1
+        self.generation = 0
+
+    # 重新初始化，之后 latest 只返回初始化之后的帧
+    def init(self, tiger_num, cow_num, grass_num):
+        self.generation += 1
+        self.commands.put(("init", self.generation, (tiger_num, cow_num, grass_num)))
+
+    def start(self):
+        self.commands.put(("start",))
+
+    def stop(self):
+        self.commands.put(("stop",))
+
+    def setInterval(self, interval):
+        self.commands.put(("interval", interval))
+
+    # 上次取过之后的最新一帧，没有时返回 None；模拟进程出错时把错误信息抛出来
+    def latest(self):
+        try:
+            error = self.errors.get_nowait()
+        except queue.Empty:
+            error = None
+        if error != None:
+            raise RuntimeError("模拟进程出错：\n" + error)
+        frame = self.ring.latest(self.lastFrame)
+        if frame == None or frame.generation != self.generation:
+            return None
+        self.lastFrame = frame.number
+        return frame
+
+    def close(self):
+        if self.process.is_alive():
+            self.commands.put(None)
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+        if self.ring != None:
+            self.ring.close()
+            self.ring.shm.unlink()
+            self.ring = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
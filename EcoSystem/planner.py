@@ -0,0 +1,97 @@
+# 追捕用的增量寻路器（Moving-Target Adaptive A*）
+# 地图上的障碍不会变，每一刻真正变化的只有捕食者的位置和猎物的位置。
+# 寻路器跨周期保存每个格子学到的启发值 h：每次搜索结束后，
+# 对扩展过的格子令 h(s) = g(终点) - g(s)，下次搜索会更快地收敛到终点附近；
+# 猎物移动到 t' 时，把所有 h 统一减去 h(t')，学到的启发值依然是一致、可采纳的。
+# 整体减法是惰性的：只记录累计的修正量，用到某个格子时再扣除
+from heapq import heappush, heappop
+
+from AStar import NEIGHBOR_STEPS, octile, spMap
+from vector import Vector
+
+
+class ChasePlanner:
+    # 每个寻路器最多记住多少个格子的启发值，超过时清空重新学习
+    maxStates = 2048
+
+    def __init__(self, msize, _map, target):
+        self.mapsize = msize
+        self.map = _map  # 地图，0是空位，1是障碍
+        self.target = target  # 正在追捕的猎物
+        self.goal = None  # 上一次搜索的终点（格子编号）
+        self.learned = {}  # 格子 -> (学到的 h，记录时的累计修正量)
+        self.correction = 0.0  # 终点移动带来的累计修正量
+        self.expandedCount = 0  # 最近一次搜索扩展过的节点数
+
+    def heuristic(self, cell):
+        size = self.mapsize
+        goal = self.goal
+        h = octile(goal % size - cell % size, goal // size - cell // size)
+        if cell in self.learned:
+            value, correction = self.learned[cell]
+            h = max(h, value - (self.correction - correction))
+        return h
+
+    # 终点移动了：用新终点在旧启发值下的 h 修正所有已学到的值
+    def moveGoal(self, goal):
+        if self.goal != None and goal != self.goal:
+            self.correction += self.heuristic(goal)
+        self.goal = goal
+
+    # 从 startPos 搜索到 endPos，返回逐格的路径（含起点和终点），找不到返回 None
+    def plan(self, startPos: Vector, endPos: Vector):
+        size = self.mapsize
+        grid = self.map
+        start = startPos.Y * size + startPos.X
+        self.moveGoal(endPos.Y * size + endPos.X)
+        goal = self.goal
+
+        g = {start: 0.0}
+        parent = {start: None}
+        closed = []
+        closedSet = set()
+        seq = 0
+        heap = [(self.heuristic(start), seq, start)]
+        counter = 0
+        found = False
+        while heap and counter <= spMap.maxExpand:
+            _, _, cell = heappop(heap)
+            if cell in closedSet:
+                continue
+            closedSet.add(cell)
+            counter += 1
+            if cell == goal:
+                found = True
+                break
+            closed.append(cell)
+            x, y = cell % size, cell // size
+            for dx, dy, cost in NEIGHBOR_STEPS:
+                nx, ny = x + dx, y + dy
+                if nx < 0 or ny < 0 or nx >= size or ny >= size or grid[ny][nx] == 1:
+                    continue
+                nCell = ny * size + nx
+                ng = g[cell] + cost
+                if nCell in closedSet or ng >= g.get(nCell, ng + 1):
+                    continue
+                g[nCell] = ng
+                parent[nCell] = cell
+                seq += 1
+                heappush(heap, (ng + self.heuristic(nCell), seq, nCell))
+        self.expandedCount = counter
+        if not found:
+            return None
+
+        # 用这次搜索的结果更新启发值，超过上限就从头学起
+        if len(self.learned) + len(closed) > self.maxStates:
+            self.learned.clear()
+        pathCost = g[goal]
+        for cell in closed:
+            self.learned[cell] = (pathCost - g[cell], self.correction)
+
+        result = []
+        cell = goal
+        while cell != None:
+            result.append(Vector(cell % size, cell // size))
+            cell = parent[cell]
+        result.reverse()
+        return result
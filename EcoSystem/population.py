@@ -0,0 +1,163 @@
+# 按列存储的种群：同一物种所有个体的能量、年龄、位置等属性各存成一个 NumPy 数组，
+# 老化、耗能、判定死亡与清除死亡个体都是整列运算，不再逐个调用 Creature.timePass。
+# CreatureView 是某一行的视图，属性读写直接落在数组上，原有的决策代码照常使用
+import threading
+
+import numpy as np
+
+from creature import Creature
+from vector import Vector
+
+# 列名 -> 数据类型
+COLUMNS = {
+    "energy": np.float64,
+    "maxEnergy": np.float64,
+    "age": np.int64,
+    "lifespan": np.int64,
+    "x": np.int64,
+    "y": np.int64,
+    "cost": np.float64,
+    "dead": np.bool_,
+}
+
+
+class PopulationStore:
+    def __init__(self, code, capacity=64):
+        self.code = code  # 物种编号
+        self.size = 0  # 当前行数
+        self.columns = {
+            name: np.zeros(capacity, dtype) for name, dtype in COLUMNS.items()
+        }
+        self.ids = np.zeros(capacity, dtype=np.int64)  # 行 -> 视图编号
+        self.rowOf = np.full(capacity, -1, dtype=np.int64)  # 视图编号 -> 行
+        self.nextId = 0
+        self.views = []  # 与行一一对应的视图，顺序与行相同
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        with self.lock:
+            for view in self.views:
+                view.detach()
+            self.size = 0
+            self.views = []
+
+    def grow(self, array, length):
+        if length <= len(array):
+            return array
+        result = np.zeros(max(length, len(array) * 2), dtype=array.dtype)
+        result[: len(array)] = array
+        return result
+
+    # 新增一行，返回它的视图。参数与 Creature 的构造函数相同
+    def add(self, mEnergy, Speed, life, X, Y, cost, rate, type):
+        with self.lock:
+            row = self.size
+            viewId = self.nextId
+            self.nextId += 1
+            for name in COLUMNS:
+                self.columns[name] = self.grow(self.columns[name], row + 1)
+            self.ids = self.grow(self.ids, row + 1)
+            if viewId >= len(self.rowOf):
+                rowOf = np.full(max(viewId + 1, len(self.rowOf) * 2), -1, np.int64)
+                rowOf[: len(self.rowOf)] = self.rowOf
+                self.rowOf = rowOf
+            self.ids[row] = viewId
+            self.rowOf[viewId] = row
+            self.size += 1
+
+            view = CreatureView.__new__(CreatureView)
+            view.store = self
+            view.viewId = viewId
+            Creature.__init__(view, mEnergy, Speed, life, X, Y, cost, rate, type)
+            self.views.append(view)
+            return view
+
+    def column(self, name):
+        return self.columns[name][: self.size]
+
+    # 所有个体经过一个周期：年龄加一、扣除能量、能量不超过上限、判定死亡。
+    # 返回存活个体的掩码（按行）
+    def timePass(self):
+        with self.lock:
+            age = self.column("age")
+            energy = self.column("energy")
+            dead = self.column("dead")
+            age += 1
+            energy -= self.column("cost")
+            np.minimum(energy, self.column("maxEnergy"), out=energy)
+            dead |= (age > self.column("lifespan")) | (energy <= 0)
+            return ~dead
+
+    # 一次性删掉所有死亡的行，存活的行保持原来的先后顺序。
+    # 死亡个体的视图会脱离数组，保留最后的属性值。返回被删掉的视图
+    def compact(self):
+        with self.lock:
+            n = self.size
+            keep = ~self.columns["dead"][:n]
+            if keep.all():
+                return []
+            deadViews = [self.views[row] for row in np.flatnonzero(~keep).tolist()]
+            for view in deadViews:
+                view.detach()
+            k = int(np.count_nonzero(keep))
+            for name in COLUMNS:
+                array = self.columns[name]
+                array[:k] = array[:n][keep]
+            self.ids[:k] = self.ids[:n][keep]
+            self.rowOf[self.ids[:k]] = np.arange(k)
+            self.views = np.asarray(self.views, dtype=object)[keep].tolist()
+            self.size = k
+            return deadViews
+
+
+# 脱离数组的视图改为读写这份单行的副本
+class DetachedRow:
+    def __init__(self, view):
+        store = view.store
+        row = store.rowOf[view.viewId]
+        self.columns = {
+            name: store.columns[name][row : row + 1].copy() for name in COLUMNS
+        }
+        self.rowOf = {view.viewId: 0}
+        store.rowOf[view.viewId] = -1
+
+
+def columnProperty(name, cast):
+    def getter(self):
+        store = self.store
+        return cast(store.columns[name][store.rowOf[self.viewId]])
+
+    def setter(self, value):
+        store = self.store
+        store.columns[name][store.rowOf[self.viewId]] = value
+
+    return property(getter, setter)
+
+
+class CreatureView(Creature):
+    energy = columnProperty("energy", float)
+    maxEnergy = columnProperty("maxEnergy", float)
+    age = columnProperty("age", int)
+    lifespan = columnProperty("lifespan", int)
+    energyCostPerTime = columnProperty("cost", float)
+    dead = columnProperty("dead", bool)
+
+    @property
+    def pos(self):
+        store = self.store
+        row = store.rowOf[self.viewId]
+        return Vector(int(store.columns["x"][row]), int(store.columns["y"][row]))
+
+    @pos.setter
+    def pos(self, value):
+        store = self.store
+        row = store.rowOf[self.viewId]
+        store.columns["x"][row] = value.X
+        store.columns["y"][row] = value.Y
+
+    def detach(self):
+        if not isinstance(self.store, DetachedRow):
+            self.store = DetachedRow(self)
@@ -0,0 +1,68 @@
+# 栅格渲染：把整个世界画进一张 (高, 宽, 3) 的 uint8 RGB 数组，不再为每只生物建一个画布图元。
+# 每个格子上有哪些东西用 4 个位表示（草 1、牛 2、虎 4、障碍 8），
+# 16 种组合的格子图案预先按 障碍 → 草 → 牛 → 虎 的顺序画好（与画布上的绘制顺序一致）；
+# 每一帧只需按各物种的位置把位或到一张 地图边长 × 地图边长 的标记网格上，
+# 再用标记查表拼出整张图，耗时只与像素数有关，与生物数量无关。
+# 图的第 0 行是地图最上面一行（Y 最大），与画布上的朝向相同
+import numpy as np
+
+BACKGROUND = (144, 238, 144)  # lightgreen
+BARRIER_COLOR = (139, 69, 19)  # SaddleBrown
+# 各物种的颜色，下标为物种编号：虎、牛、草
+COLORS = [(255, 0, 0), (0, 0, 255), (0, 128, 0)]
+BARRIER_BIT = 8
+
+
+# 物种 code 在 cell × cell 像素的格子里的形状：草占满整格，牛是内缩 1/8 的椭圆，虎是尖朝上的三角形
+def sprite(code, cell):
+    y, x = (np.mgrid[0:cell, 0:cell] + 0.5) / cell
+    if code == 2:
+        return np.ones((cell, cell), dtype=bool)
+    if code == 1:
+        return ((x - 0.5) ** 2 + (y - 0.5) ** 2) <= 0.375**2
+    # 底边在 y = 0.9，顶点在 (0.5, 0.1)
+    return (y <= 0.9) & (np.abs(x - 0.5) <= (y - 0.1) * 0.5 / 0.8)
+
+
+class Rasterizer:
+    def __init__(self, msize, cell, barrierMap=None):
+        self.mapsize = msize
+        self.cell = cell  # 每个格子的像素边长
+        self.tiles = np.empty((16, cell, cell, 3), dtype=np.uint8)
+        self.tiles[:] = BACKGROUND
+        self.tiles[BARRIER_BIT:] = BARRIER_COLOR
+        for code in (2, 1, 0):
+            mask = sprite(code, cell)
+            for label in range(16):
+                if label & (1 << code):
+                    self.tiles[label][mask] = COLORS[code]
+        self.setBarrier(barrierMap)
+
+    @property
+    def shape(self):
+        return self.mapsize * self.cell, self.mapsize * self.cell
+
+    def setBarrier(self, barrierMap):
+        self.base = np.zeros((self.mapsize, self.mapsize), dtype=np.uint8)
+        if barrierMap is not None:
+            self.base[np.asarray(barrierMap) == 1] = BARRIER_BIT
+
+    # positions[code] 为物种 code 的 (Xs, Ys)，返回 RGB 图
+    def render(self, positions):
+        labels = self.base.copy()
+        for code, (Xs, Ys) in enumerate(positions):
+            labels[np.asarray(Ys, dtype=np.int64), np.asarray(Xs, dtype=np.int64)] |= (
+                1 << code
+            )
+        size, cell = self.mapsize, self.cell
+        return (
+            self.tiles[labels[::-1]]
+            .transpose(0, 2, 1, 3, 4)
+            .reshape(size * cell, size * cell, 3)
+        )
+
+
+# 二进制 PPM（P6）：Tk 的 PhotoImage 可以直接读入，不需要 PIL
+def toPPM(image):
+    height, width = image.shape[:2]
+    return b"P6 %d %d 255\n" % (width, height) + np.ascontiguousarray(image).tobytes()
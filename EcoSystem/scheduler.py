@@ -0,0 +1,129 @@
+# 按阶段推进一个周期：感知 → 决策 → 结算移动 → 进食 → 老化 → 繁殖。
+# 一个阶段全部完成后才进入下一个阶段，阶段之间就是屏障，不再开出不等待的线程。
+# 决策阶段里最耗时的是寻路，寻路请求由 PathBroker 在结算时统一求解，
+# Control 的 pathProcesses 大于 0 时交给多进程并行，绕开 GIL。
+# 决策用到的随机数来自按 (种子, 周期, 物种, 下标) 播种的生成器，
+# 繁殖等批量抽样用 Control.rng，所以给定 Control 的 seed 时结果逐位可复现，与进程数无关
+from time import perf_counter
+
+from broker import PathTicket
+
+PHASES = ("sense", "decide", "resolve", "eat", "age", "reproduce")
+
+
+class TickScheduler:
+    def __init__(self, control):
+        self.control = control
+        self.tickCount = 0
+        # 决策随机数的种子，由 Control.rng 抽出，Control 的 seed 固定时它也固定
+        self.seed = int(control.rng.integers(2**63))
+        self.phaseTimes = {phase: 0.0 for phase in PHASES}  # 各阶段累计耗时（秒）
+        self.eaten = (
+            []
+        )  # 最近一个周期里成功的进食 [(吃者, 食物), ...]，事件日志据此记录
+
+    def tick(self):
+        control = self.control
+        metrics = control.metrics
+        self.tickCount += 1
+        tickStart = phaseStart = perf_counter()
+
+        def barrier(phase):
+            nonlocal phaseStart
+            now = perf_counter()
+            self.phaseTimes[phase] += now - phaseStart
+            metrics.phase(phase, phaseStart, now)
+            phaseStart = now
+
+        self.sense()
+        barrier("sense")
+        moves = self.decide()
+        barrier("decide")
+        self.resolve(moves)
+        barrier("resolve")
+        self.eat()
+        barrier("eat")
+        # 老化阶段只会减少、繁殖阶段只会增加生物，数量之差就是死亡数与出生数
+        before = self.population() if metrics.enabled else 0
+        for code in (0, 1, 2):
+            control.agePass(code)
+        barrier("age")
+        after = self.population() if metrics.enabled else 0
+        metrics.count("deaths", before - after)
+        control.AllCreatureReproduce()
+        barrier("reproduce")
+        if metrics.enabled:
+            metrics.count("births", self.population() - after)
+        metrics.endTick(self.tickCount, tickStart, phaseStart)
+
+    def population(self):
+        return sum(len(creatureLst) for creatureLst in self.control.CreatureLst)
+
+    # 决策前同步草的距离场与老虎的危险场
+    def sense(self):
+        self.control.syncGrassField()
+        self.control.syncDangerField()
+
+    # 所有老虎、牛各自决策，返回 [(生物, 目标位置或寻路票据), ...]；进食先记下来
+    def decide(self):
+        control = self.control
+        control.tickSeed = f"{self.seed}:{self.tickCount}"
+        control.eatQueue = []
+        try:
+            tigers = self.deciders(0)
+            cows = self.deciders(1)
+            moves = list(
+                zip(
+                    tigers,
+                    control.decisionsForPredators(
+                        tigers, control.CreatureLst[1], control.brokers[0]
+                    ),
+                )
+            )
+            for i, cow in enumerate(cows):
+                if cow.dead:
+                    continue
+                control.useRandomFor(1, i)
+                moves.append(
+                    (
+                        cow,
+                        control.decisionForPrey(
+                            cow,
+                            control.CreatureLst[2],
+                            control.CreatureLst[0],
+                            control.brokers[1],
+                        ),
+                    )
+                )
+        finally:
+            control.tickSeed = None
+            control.useRandomFor(0, 0)
+        return moves
+
+    # 本周期要做决策的物种 code 的生物
+    def deciders(self, code):
+        return list(self.control.CreatureLst[code])
+
+    # 统一求解寻路请求，再逐个物种批量结算移动：老虎先走，牛再避开老虎落脚后的位置
+    def resolve(self, moves):
+        control = self.control
+        for broker in control.brokers:
+            broker.resolve()
+        byCode = {0: [], 1: []}
+        for creature, nextPos in moves:
+            if isinstance(nextPos, PathTicket):
+                nextPos = nextPos.pos
+            byCode[creature.type].append((creature, nextPos))
+        for code, batch in byCode.items():
+            control.applyMoves(code, batch)
+
+    # 按决策的先后结算进食，已经被吃掉的食物不能再吃
+    def eat(self):
+        control = self.control
+        queue, control.eatQueue = control.eatQueue, None
+        self.eaten = []
+        for eater, food in queue:
+            if not food.dead:
+                eater.eat(food)
+                self.eaten.append((eater, food))
+        control.metrics.count("eats", len(self.eaten))
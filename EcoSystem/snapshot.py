@@ -0,0 +1,419 @@
+# 快照：把整个模拟的状态存成一个二进制文件，之后可以从它恢复并逐位一致地继续运行。
+# 文件格式：8 字节魔数 b"ECOSNAP1"，8 字节小端整数的头部长度，UTF-8 的 JSON 头部，
+# 之后是各个数组的原始字节，每个数组按 64 字节对齐，可以直接用 np.memmap 映射而不必整个读入。
+# 头部记录周期数、两个随机数生成器的状态、本次模拟的设置，以及每个数组的编码方式：
+#   "raw"    数据就在本文件里
+#   "ref"    与 base 文件中的同名数组完全相同
+#   "sparse" 在 base 文件同名数组的基础上，只记录变化了的下标与新值
+# 存下的数组：障碍图、占位图、各物种的空格索引、虎与牛每个属性一列、
+# 网格化的草、草的距离场，以及老虎追捕寻路器学到的启发值。
+# Checkpointer 每隔 N 个周期存一次，每 keyframeEvery 次存一个完整的关键帧，其余的相对上一次做差分；
+# 文件先写到临时文件再改名，写到一半崩溃也不会留下残缺的快照
+import json
+import os
+import random
+import struct
+from time import perf_counter
+
+import numpy as np
+
+from creature import Creature
+from planner import ChasePlanner
+
+MAGIC = b"ECOSNAP1"
+ALIGN = 64
+# 格子编号与坐标存成 int32（地图边长远小于 46341）
+# 虎、牛按列存放的属性；按整数还是浮点数存回由 "ints" 列的各个位决定，
+# 这样恢复后 repr、除法等行为都与原来一样
+ATTRIBUTES = (
+    "energy",
+    "maxEnergy",
+    "speed",
+    "age",
+    "lifespan",
+    "energyCostPerTime",
+    "rate",
+)
+# 变化的元素不超过这个比例时差分存储
+SPARSE_RATIO = 0.25
+
+
+def aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+# 原子地写一个快照：arrays 为 {名字: 数组}，encodings 为 {名字: ("ref"|"sparse", base 文件名)}，
+# 差分的数组在 arrays 里给出的是 (下标, 新值)
+def writeSnapshot(path, meta, arrays, encodings=None):
+    encodings = encodings or {}
+    entries = {}
+    blocks = []
+    offset = 0
+
+    def addBlock(array):
+        nonlocal offset
+        array = np.ascontiguousarray(array)
+        block = {"offset": offset, "dtype": array.dtype.str, "shape": array.shape}
+        blocks.append((offset, array))
+        offset = aligned(offset + array.nbytes)
+        return block
+
+    for name, array in arrays.items():
+        encoding, base = encodings.get(name, ("raw", None))
+        if encoding == "ref":
+            entries[name] = {"encoding": "ref", "base": base, **array}
+        elif encoding == "sparse":
+            index, values, like = array
+            entries[name] = {
+                "encoding": "sparse",
+                "base": base,
+                "dtype": like.dtype.str,
+                "shape": like.shape,
+                "index": addBlock(index),
+                "values": addBlock(values),
+            }
+        else:
+            entries[name] = {"encoding": "raw", **addBlock(array)}
+
+    header = json.dumps({**meta, "arrays": entries}).encode("utf-8")
+    dataStart = aligned(len(MAGIC) + 8 + len(header))
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for blockOffset, array in blocks:
+            f.seek(dataStart + blockOffset)
+            f.write(array.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+    syncDirectory(os.path.dirname(os.path.abspath(path)))
+
+
+# 改名之后同步目录，保证新文件名本身也落盘（Windows 上没有 O_DIRECTORY，跳过）
+def syncDirectory(directory):
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def readHeader(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} 不是快照文件")
+        (length,) = struct.unpack("<Q", f.read(8))
+        meta = json.loads(f.read(length).decode("utf-8"))
+    meta["dataStart"] = aligned(len(MAGIC) + 8 + length)
+    return meta
+
+
+def mapBlock(path, dataStart, block, mmap=True):
+    dtype = np.dtype(block["dtype"])
+    shape = tuple(block["shape"])
+    if int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype)
+    if mmap:
+        return np.memmap(
+            path, dtype, mode="r", offset=dataStart + block["offset"], shape=shape
+        )
+    with open(path, "rb") as f:
+        f.seek(dataStart + block["offset"])
+        return np.fromfile(f, dtype, int(np.prod(shape))).reshape(shape)
+
+
+# 读出快照，返回 (头部, {名字: 数组})。本文件里的数组默认是只读的内存映射；
+# ref 与 sparse 的数组顺着 base 文件还原
+def readSnapshot(path, mmap=True):
+    directory = os.path.dirname(os.path.abspath(path))
+    meta = readHeader(path)
+    headers = {os.path.basename(path): meta}
+
+    def load(fileName, name):
+        if fileName not in headers:
+            headers[fileName] = readHeader(os.path.join(directory, fileName))
+        header = headers[fileName]
+        entry = header["arrays"][name]
+        filePath = os.path.join(directory, fileName)
+        if entry["encoding"] == "ref":
+            return load(entry["base"], name)
+        if entry["encoding"] == "sparse":
+            array = np.array(load(entry["base"], name))
+            index = mapBlock(filePath, header["dataStart"], entry["index"], mmap)
+            values = mapBlock(filePath, header["dataStart"], entry["values"], mmap)
+            array.reshape(-1)[index] = values
+            return array
+        return mapBlock(filePath, header["dataStart"], entry, mmap)
+
+    arrays = {name: load(os.path.basename(path), name) for name in meta["arrays"]}
+    return meta, arrays
+
+
+# 目录里最新的快照文件，没有时返回 None
+def latestSnapshot(directory):
+    names = sorted(
+        name
+        for name in os.listdir(directory)
+        if name.startswith("snapshot-") and name.endswith(".eco")
+    )
+    return os.path.join(directory, names[-1]) if len(names) != 0 else None
+
+
+# 取出 control 当前的状态：(头部, {名字: 数组})。应在两个周期之间调用
+def capture(control):
+    arrays = {
+        "barrier": np.asarray(control.BarrierMap, dtype=np.uint8),
+        "occupancy": control.occupancy.grid.copy(),
+    }
+    for code, free in enumerate(control.occupancy.free):
+        arrays[f"free{code}"] = np.asarray(free.cells, dtype=np.int32)
+
+    fieldGrass = control.grassModel == "field"
+    for code in (0, 1) if fieldGrass else (0, 1, 2):
+        creatureLst = control.CreatureLst[code]
+        ints = np.zeros(len(creatureLst), dtype=np.uint8)
+        for bit, name in enumerate(ATTRIBUTES):
+            values = [getattr(creature, name) for creature in creatureLst]
+            ints |= np.array(
+                [isinstance(v, int) for v in values], dtype=np.uint8
+            ) << np.uint8(bit)
+            arrays[f"{code}/{name}"] = np.array(values, dtype=np.float64)
+        arrays[f"{code}/ints"] = ints
+        arrays[f"{code}/x"] = np.array([c.pos.X for c in creatureLst], np.int32)
+        arrays[f"{code}/y"] = np.array([c.pos.Y for c in creatureLst], np.int32)
+    if fieldGrass:
+        grass = control.CreatureLst[2]
+        arrays["grass/presence"] = grass.presence.copy()
+        arrays["grass/energy"] = grass.energy.copy()
+        arrays["grass/age"] = grass.age.copy()
+    if control.grassField != None:
+        arrays["grassField/sources"] = control.grassField.sources.copy()
+        arrays["grassField/dist"] = control.grassField.dist.copy()
+    arrays.update(capturePlanners(control))
+
+    state = random.getstate()
+    arrays["random"] = np.array(state[1], dtype=np.uint64)
+    meta = {
+        "tick": control.scheduler.tickCount,
+        "seed": control.scheduler.seed,
+        "mapSize": control.MAP_SIZE,
+        "columnar": control.stores != None,
+        "grassModel": control.grassModel,
+        "props": control.prop,
+        "initNum": control.initNum,
+        "maxNum": control.maxCreatureNum,
+        "movePolicy": control.movePolicy,
+        "exclusiveHunting": control.exclusiveHunting,
+        "pathStrategy": control.pathStrategy,
+        "useSpatialIndex": control.useSpatialIndex,
+        "rng": control.rng.bit_generator.state,
+        "random": [state[0], state[2]],
+    }
+    return meta, arrays
+
+
+# 老虎的追捕寻路器：追的是牛列表中的第几只、上一次的终点、累计修正量与学到的启发值
+def capturePlanners(control):
+    cowIndex = {id(cow): i for i, cow in enumerate(control.CreatureLst[1])}
+    tigers, targets, goals, corrections, expanded, counts = [], [], [], [], [], []
+    cells, values, learnedCorrections = [], [], []
+    for i, tiger in enumerate(control.CreatureLst[0]):
+        planner = tiger.planner
+        # 猎物已经死了的寻路器下次决策时一定会被换掉，不必保存
+        if planner == None or id(planner.target) not in cowIndex:
+            continue
+        tigers.append(i)
+        targets.append(cowIndex[id(planner.target)])
+        goals.append(planner.goal if planner.goal != None else -1)
+        corrections.append(planner.correction)
+        expanded.append(planner.expandedCount)
+        counts.append(len(planner.learned))
+        for cell, (value, correction) in planner.learned.items():
+            cells.append(cell)
+            values.append(value)
+            learnedCorrections.append(correction)
+    return {
+        "planner/tiger": np.array(tigers, np.int64),
+        "planner/target": np.array(targets, np.int64),
+        "planner/goal": np.array(goals, np.int64),
+        "planner/correction": np.array(corrections, np.float64),
+        "planner/expanded": np.array(expanded, np.int64),
+        "planner/count": np.array(counts, np.int64),
+        "planner/cell": np.array(cells, np.int32),
+        "planner/value": np.array(values, np.float64),
+        "planner/learnedCorrection": np.array(learnedCorrections, np.float64),
+    }
+
+
+# 把快照恢复到一个刚构造好、还没有初始化障碍与生物的 control 上
+def restore(control, meta, arrays):
+    control.barrier_init(np.array(arrays["barrier"]))
+    for key in ("movePolicy", "exclusiveHunting", "pathStrategy", "useSpatialIndex"):
+        setattr(control, key, meta[key])
+
+    fieldGrass = control.grassModel == "field"
+    for code in (0, 1) if fieldGrass else (0, 1, 2):
+        restoreCreatures(control, code, arrays)
+    if fieldGrass:
+        grass = control.CreatureLst[2]
+        grass.presence[:] = arrays["grass/presence"]
+        grass.energy[:] = arrays["grass/energy"]
+        grass.age[:] = arrays["grass/age"]
+        grass.count = int(np.count_nonzero(grass.presence))
+    if control.grassField != None and "grassField/sources" in arrays:
+        control.grassField.sources = np.array(arrays["grassField/sources"])
+        control.grassField.dist = np.array(arrays["grassField/dist"])
+    restorePlanners(control, arrays)
+
+    # 占位图与空格索引最后整体覆盖，空格的先后顺序决定随机取空格的结果
+    occupancy = control.occupancy
+    occupancy.grid[:] = arrays["occupancy"]
+    occupancy.occupied = [int(np.count_nonzero(layer)) for layer in occupancy.grid]
+    for code, free in enumerate(occupancy.free):
+        cells = np.asarray(arrays[f"free{code}"], dtype=np.int64)
+        position = np.full(control.MAP_SIZE * control.MAP_SIZE, -1, dtype=np.int64)
+        position[cells] = np.arange(len(cells))
+        free.cells = cells.tolist()
+        free.position = position.tolist()
+
+    control.rng.bit_generator.state = meta["rng"]
+    version, gauss = meta["random"]
+    random.setstate((version, tuple(int(v) for v in arrays["random"]), gauss))
+    control.scheduler.seed = meta["seed"]
+    control.scheduler.tickCount = meta["tick"]
+    return control
+
+
+def restoreCreatures(control, code, arrays):
+    ints = np.asarray(arrays[f"{code}/ints"])
+    columns = {name: arrays[f"{code}/{name}"].tolist() for name in ATTRIBUTES}
+    Xs = arrays[f"{code}/x"].tolist()
+    Ys = arrays[f"{code}/y"].tolist()
+    p = control.prop[code]
+    make = Creature if control.stores == None else control.stores[code].add
+    for i in range(len(ints)):
+        creature = make(
+            p["mEnergy"],
+            p["Speed"],
+            p["life"],
+            Xs[i],
+            Ys[i],
+            p["cost"],
+            p["rate"],
+            code,
+        )
+        for bit, name in enumerate(ATTRIBUTES):
+            value = columns[name][i]
+            setattr(creature, name, int(value) if ints[i] >> bit & 1 else value)
+        control.spatial[code].insert(creature)
+        control.register(creature)
+
+
+def restorePlanners(control, arrays):
+    tigers = control.CreatureLst[0]
+    cows = control.CreatureLst[1]
+    cells = arrays["planner/cell"].tolist()
+    values = arrays["planner/value"].tolist()
+    corrections = arrays["planner/learnedCorrection"].tolist()
+    start = 0
+    for tiger, target, goal, correction, expanded, count in zip(
+        arrays["planner/tiger"].tolist(),
+        arrays["planner/target"].tolist(),
+        arrays["planner/goal"].tolist(),
+        arrays["planner/correction"].tolist(),
+        arrays["planner/expanded"].tolist(),
+        arrays["planner/count"].tolist(),
+    ):
+        planner = ChasePlanner(control.MAP_SIZE, control.BarrierMap, cows[target])
+        planner.goal = goal if goal != -1 else None
+        planner.correction = correction
+        planner.expandedCount = expanded
+        planner.learned = {
+            cells[j]: (values[j], corrections[j]) for j in range(start, start + count)
+        }
+        start += count
+        tigers[tiger].planner = planner
+
+
+# 存一个完整的快照（不做差分）
+def save(control, path):
+    meta, arrays = capture(control)
+    writeSnapshot(path, meta, arrays)
+
+
+# 每隔 every 个周期把 control 存到 directory 下的 snapshot-<周期>.eco。
+# 每 keyframeEvery 次存一个关键帧，其余的与上一次比较：没变的数组只记引用，
+# 变化不多的只记变化的元素；keep 给出时只保留最近 keep 组（关键帧连同它后面的差分）
+class Checkpointer:
+    def __init__(self, control, directory, every=100, keyframeEvery=10, keep=None):
+        self.control = control
+        self.directory = directory
+        self.every = every
+        self.keyframeEvery = keyframeEvery
+        self.keep = keep
+        self.saves = 0
+        self.previous = {}  # 上一次存下的数组
+        self.origins = {}  # 数组名 -> 最近一次实际写入它（raw 或 sparse）的文件名
+        self.chains = []  # [[关键帧, 差分, ...], ...]
+        os.makedirs(directory, exist_ok=True)
+
+    # 每个周期结束后调用，到了间隔就存一次
+    def tick(self):
+        if self.control.scheduler.tickCount % self.every == 0:
+            return self.save()
+        return None
+
+    def save(self):
+        t0 = perf_counter()
+        control = self.control
+        meta, arrays = capture(control)
+        fileName = f"snapshot-{meta['tick']:09d}.eco"
+        keyframe = self.saves % self.keyframeEvery == 0
+        meta["keyframe"] = keyframe
+        encodings = {}
+        stored = {}
+        for name, array in arrays.items():
+            before = self.previous.get(name)
+            if (
+                keyframe
+                or before is None
+                or before.shape != array.shape
+                or before.dtype != array.dtype
+            ):
+                stored[name] = array
+                continue
+            changed = np.flatnonzero(before.reshape(-1) != array.reshape(-1))
+            if len(changed) == 0:
+                base = self.origins[name]
+                stored[name] = {"dtype": array.dtype.str, "shape": array.shape}
+                encodings[name] = ("ref", base)
+            elif len(changed) <= array.size * SPARSE_RATIO:
+                stored[name] = (changed, array.reshape(-1)[changed], array)
+                encodings[name] = ("sparse", self.origins[name])
+            else:
+                stored[name] = array
+        writeSnapshot(os.path.join(self.directory, fileName), meta, stored, encodings)
+
+        for name in arrays:
+            if encodings.get(name, ("raw",))[0] != "ref":
+                self.origins[name] = fileName
+        self.previous = arrays
+        self.saves += 1
+        if keyframe:
+            self.chains.append([])
+        self.chains[-1].append(fileName)
+        self.prune()
+        control.metrics.phase("checkpoint", t0, perf_counter())
+        return os.path.join(self.directory, fileName)
+
+    # 删掉最近 keep 组之前的快照，它们不会被更新的快照引用
+    def prune(self):
+        if self.keep == None:
+            return
+        while len(self.chains) > self.keep:
+            for fileName in self.chains.pop(0):
+                os.remove(os.path.join(self.directory, fileName))
@@ -0,0 +1,68 @@
+# 均匀网格空间索引：把地图切成 bucketSize × bucketSize 的桶，每只生物登记在它所在的桶里。
+# 查询某点周围 radius 范围内的生物时只看相邻的几个桶，不必遍历整个物种列表。
+# 返回的候选按生物编号（即出生先后、也就是 CreatureLst 中的顺序）排列，
+# 调用者仍需自己用 inRange 等条件做精确筛选
+import threading
+
+
+class SpatialHash:
+    def __init__(self, bucketSize):
+        self.bucketSize = bucketSize
+        self.buckets = {}  # (bx, by) -> {生物编号: 生物}
+        self.where = {}  # 生物编号 -> 所在的桶
+        self.lock = threading.Lock()
+
+    def bucketOf(self, X, Y):
+        return X // self.bucketSize, Y // self.bucketSize
+
+    def clear(self):
+        with self.lock:
+            self.buckets = {}
+            self.where = {}
+
+    def insert(self, creature):
+        key = self.bucketOf(creature.pos.X, creature.pos.Y)
+        with self.lock:
+            self.buckets.setdefault(key, {})[creature.uid] = creature
+            self.where[creature.uid] = key
+
+    def remove(self, creature):
+        with self.lock:
+            key = self.where.pop(creature.uid, None)
+            if key != None:
+                bucket = self.buckets[key]
+                del bucket[creature.uid]
+                if len(bucket) == 0:
+                    del self.buckets[key]
+
+    # 生物移动到 (X, Y) 之后调用，换桶时才需要改动
+    def move(self, creature, X, Y):
+        key = self.bucketOf(X, Y)
+        with self.lock:
+            oldKey = self.where.get(creature.uid)
+            if oldKey == key:
+                return
+            if oldKey != None:
+                bucket = self.buckets[oldKey]
+                del bucket[creature.uid]
+                if len(bucket) == 0:
+                    del self.buckets[oldKey]
+            self.buckets.setdefault(key, {})[creature.uid] = creature
+            self.where[creature.uid] = key
+
+    # (X, Y) 周围 radius 范围（切比雪夫距离）可能有生物的桶里的全部候选
+    def query(self, X, Y, radius):
+        bx0, by0 = self.bucketOf(X - radius, Y - radius)
+        bx1, by1 = self.bucketOf(X + radius, Y + radius)
+        result = []
+        with self.lock:
+            for by in range(by0, by1 + 1):
+                for bx in range(bx0, bx1 + 1):
+                    bucket = self.buckets.get((bx, by))
+                    if bucket != None:
+                        result += bucket.values()
+        result.sort(key=lambda creature: creature.uid)
+        return result
+
+    def __len__(self):
+        return len(self.where)
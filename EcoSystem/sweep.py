@@ -0,0 +1,371 @@
+# 参数扫描：在物种属性表（mEnergy、Speed、life、cost、rate）、初始数量与数量上限上取一组组参数，
+# 用进程池并行跑不开窗口的模拟，每跑完一次就把这次的摘要追加进结果文件，不必一次次开窗口手动调。
+# 取样方式：grid 为各参数取值的笛卡尔积，random 为在范围内独立均匀取样，
+# lhs 为拉丁超立方取样（每个参数的范围等分成 samples 段，每段恰好取到一次）。
+# 每组参数跑 repeats 次，各次的种子由 --seed 派生（SeedSequence 的子序列，spawn_key 取自这次运行的 key），
+# 互相独立、可复现，也不随参数组的先后顺序变化；
+# 结果里记下种子，任何一次都可以用 headless.py --seed 单独重跑。
+# 每次运行由参数、第几次重复与模拟设置算出一个 key，结果文件里已有的 key 直接跳过，
+# 中断后用同样的命令再跑一遍就从没算完的地方接着算。
+# 摘要：牛或老虎灭绝的周期（与界面一样，有一者灭绝就停下）、各物种的最终数量、平均数量、
+# 振幅（丢掉前 --burn-in 比例的周期后，数量最大值与最小值之差的一半）与周期（去均值后频谱的主峰）
+# 结果默认写成 CSV；--output 以 .parquet 结尾时写成一个目录，每 --batch 行写一个 part-*.parquet 文件，
+# 需要 pyarrow，用到时才导入
+# 用法：python sweep.py --param cow.rate=0.2:0.4 --param tiger.Speed=2,3,4 [--param init.cow=100:200]
+#       [--method grid|random|lhs] [--samples 20] [--levels 3] [--repeats 1] [--ticks 500]
+#       [--map-size 50] [--seed 0] [--props props.json] [--columnar] [--grass-model field]
+#       [--workers 4] [--burn-in 0.2] [--batch 16] [--output sweep.csv]
+# 参数名为 物种.属性（物种为 tiger、cow、grass），或 init.物种、max.物种；
+# 取值写成逗号分隔的列表，或 下限:上限 的范围。grid 时范围取 --levels 个等距点，random 与 lhs 时列表里随机挑。
+# 下限与上限都是整数时取整数
+import argparse
+import csv
+import glob
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+
+import numpy as np
+
+from control import maxCreatureNum
+from creature import Creature
+from headless import loadProps, makeControl, mergeProps
+
+SPECIES = ("tiger", "cow", "grass")
+ATTRIBUTES = ("mEnergy", "Speed", "life", "cost", "rate")
+
+
+# 一个要扫描的参数：values 为取值列表，或 low、high 为范围
+class Parameter:
+    def __init__(self, name, values=None, low=None, high=None):
+        group, _, field = name.partition(".")
+        if group in SPECIES:
+            if field not in ATTRIBUTES:
+                raise ValueError(f"{name}：属性只能是 {', '.join(ATTRIBUTES)}")
+        elif group not in ("init", "max") or field not in SPECIES:
+            raise ValueError(f"{name}：参数名应为 物种.属性、init.物种 或 max.物种")
+        self.name = name
+        self.values = values
+        self.low = low
+        self.high = high
+        self.integer = values == None and isinstance(low, int) and isinstance(high, int)
+
+    # 把 "a,b,c" 或 "low:high" 解析成参数
+    @classmethod
+    def parse(cls, text):
+        name, _, spec = text.partition("=")
+        if spec == "":
+            raise ValueError(f"{text}：应写成 名称=取值")
+        if ":" in spec:
+            low, high = (parseNumber(s) for s in spec.split(":"))
+            return cls(name, low=low, high=high)
+        return cls(name, values=[parseNumber(s) for s in spec.split(",")])
+
+    def levels(self, n):
+        if self.values != None:
+            return list(self.values)
+        if self.integer:
+            return sorted(
+                set(np.linspace(self.low, self.high, n).round().astype(int).tolist())
+            )
+        return np.linspace(self.low, self.high, n).tolist()
+
+    # 把 [0, 1) 里的 u 映射成一个取值
+    def at(self, u):
+        if self.values != None:
+            return self.values[min(int(u * len(self.values)), len(self.values) - 1)]
+        if self.integer:
+            return min(self.low + int(u * (self.high - self.low + 1)), self.high)
+        return self.low + u * (self.high - self.low)
+
+
+def parseNumber(text):
+    text = text.strip()
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+# 按 method 取样，返回参数组的列表，每组是 {参数名: 取值}；同样的 seed 得到同样的参数组
+def sample(parameters, method="grid", samples=10, levels=3, seed=0):
+    names = [p.name for p in parameters]
+    if method == "grid":
+        grid = itertools.product(*[p.levels(levels) for p in parameters])
+        return [dict(zip(names, values)) for values in grid]
+    rng = np.random.default_rng(seed)
+    if method == "random":
+        units = rng.random((samples, len(parameters)))
+    elif method == "lhs":
+        # 每一列是 0..samples-1 的一个随机排列，再在各自的段内随机取一点
+        strata = np.argsort(rng.random((samples, len(parameters))), axis=0)
+        units = (strata + rng.random((samples, len(parameters)))) / samples
+    else:
+        raise ValueError(f"未知的取样方式 {method}")
+    return [
+        {p.name: p.at(u) for p, u in zip(parameters, row)} for row in units.tolist()
+    ]
+
+
+# 一次运行的全部设置，可以在进程之间传递
+def runSpec(params, replicate, baseSeed, settings):
+    props = [dict(p) for p in settings["props"]]
+    initNum = list(settings["initNum"])
+    maxNum = list(settings["maxNum"])
+    for name, value in params.items():
+        group, _, field = name.partition(".")
+        if group == "init":
+            initNum[SPECIES.index(field)] = value
+        elif group == "max":
+            maxNum[SPECIES.index(field)] = value
+        else:
+            props[SPECIES.index(group)][field] = value
+    spec = {
+        "params": params,
+        "replicate": replicate,
+        "baseSeed": baseSeed,
+        "ticks": settings["ticks"],
+        "mapSize": settings["mapSize"],
+        "props": props,
+        "initNum": initNum,
+        "maxNum": maxNum,
+        "columnar": settings["columnar"],
+        "grassModel": settings["grassModel"],
+        "burnIn": settings["burnIn"],
+    }
+    spec["key"] = runKey(spec)
+    child = np.random.SeedSequence(baseSeed, spawn_key=(int(spec["key"], 16),))
+    spec["seed"] = int(child.generate_state(1)[0])
+    return spec
+
+
+# 由参数、第几次重复、--seed 与模拟设置算出的 key，设置完全相同的运行 key 相同
+def runKey(spec):
+    text = json.dumps(spec, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+# 一个物种数量序列的振幅与周期；周期为去均值后频谱主峰对应的周期数，序列太短、没有起伏或不到两个完整起伏时为 None
+def oscillation(series, burnIn):
+    series = np.asarray(series, dtype=np.float64)
+    series = series[int(len(series) * burnIn) :]
+    if len(series) < 4:
+        return 0.0, None
+    amplitude = (series.max() - series.min()) / 2
+    spectrum = np.abs(np.fft.rfft(series - series.mean()))
+    if amplitude == 0:
+        return 0.0, None
+    peak = int(np.argmax(spectrum[1:])) + 1
+    # 主峰在最低频率上说明序列里不到两个完整的起伏，只是趋势
+    if peak < 2:
+        return float(amplitude), None
+    return float(amplitude), len(series) / peak
+
+
+# 在子进程里跑一次模拟，返回摘要的一行
+def simulate(spec):
+    t0 = perf_counter()
+    control = makeControl(
+        spec["mapSize"],
+        seed=spec["seed"],
+        initNum=spec["initNum"],
+        maxNum=spec["maxNum"],
+        props=spec["props"],
+        columnar=spec["columnar"],
+        grassModel=spec["grassModel"],
+    )
+    populations = [[len(lst) for lst in control.CreatureLst]]
+    extinction = None
+    try:
+        for tick in range(1, spec["ticks"] + 1):
+            control.dayPass()
+            populations.append([len(lst) for lst in control.CreatureLst])
+            # 牛和老虎有一者灭绝就停下
+            if populations[-1][0] == 0 or populations[-1][1] == 0:
+                extinction = tick
+                break
+    finally:
+        for broker in control.brokers:
+            broker.close()
+    populations = np.array(populations)
+    row = {"key": spec["key"], "replicate": spec["replicate"], "seed": spec["seed"]}
+    row.update(spec["params"])
+    row["ticksRun"] = len(populations) - 1
+    row["extinctionTick"] = extinction
+    row["extinct"] = (
+        ",".join(SPECIES[c] for c in range(2) if populations[-1][c] == 0) or None
+    )
+    for code, name in enumerate(SPECIES):
+        amplitude, period = oscillation(populations[:, code], spec["burnIn"])
+        row[f"{name}Final"] = int(populations[-1][code])
+        row[f"{name}Mean"] = float(populations[:, code].mean())
+        row[f"{name}Amplitude"] = amplitude
+        row[f"{name}Period"] = period
+    row["seconds"] = perf_counter() - t0
+    return row
+
+
+def columns(names):
+    fields = [
+        "key",
+        "replicate",
+        "seed",
+        *names,
+        "ticksRun",
+        "extinctionTick",
+        "extinct",
+    ]
+    for name in SPECIES:
+        fields += [f"{name}{s}" for s in ("Final", "Mean", "Amplitude", "Period")]
+    return fields + ["seconds"]
+
+
+# CSV 结果文件：每写一行就落盘；打开时读出已经算过的 key
+class CSVResults:
+    def __init__(self, path, fields):
+        self.fields = fields
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, "r+", newline="", encoding="utf-8") as f:
+                text = f.read()
+                # 上次中断时可能只写了半行，截掉
+                if not text.endswith("\n"):
+                    f.truncate(text.rfind("\n") + 1)
+            with open(path, newline="", encoding="utf-8") as f:
+                reader = csv.DictReader(f)
+                if reader.fieldnames != None and reader.fieldnames != fields:
+                    raise ValueError(f"{path} 的列与这次扫描的参数不同")
+                self.done = {row["key"] for row in reader}
+        self.file = open(path, "a", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fields)
+        if self.file.tell() == 0:
+            self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+# Parquet 结果目录：每 batch 行写成一个 part 文件（先写临时文件再改名，中断时不会留下半个文件）
+class ParquetResults:
+    def __init__(self, directory, fields, batch=16):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("写 Parquet 需要 pyarrow")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.directory = directory
+        self.fields = fields
+        self.batch = batch
+        self.rows = []
+        os.makedirs(directory, exist_ok=True)
+        parts = sorted(glob.glob(os.path.join(directory, "part-*.parquet")))
+        self.part = len(parts)
+        self.done = set()
+        for part in parts:
+            self.done.update(
+                self.pq.read_table(part, columns=["key"])["key"].to_pylist()
+            )
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if len(self.rows) == 0:
+            return
+        table = self.pa.table({f: [row[f] for row in self.rows] for f in self.fields})
+        path = os.path.join(self.directory, f"part-{self.part:05d}.parquet")
+        self.pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self.part += 1
+        self.rows = []
+
+    def close(self):
+        self.flush()
+
+
+def openResults(path, fields, batch=16):
+    if path.lower().endswith(".parquet"):
+        return ParquetResults(path, fields, batch)
+    return CSVResults(path, fields)
+
+
+# 跑完 configs 里每组参数的 repeats 次运行，跳过 results 里已有的；返回这次新跑的次数
+def sweep(configs, settings, results, repeats=1, seed=0, workers=None, log=print):
+    specs = []
+    for params in configs:
+        for replicate in range(repeats):
+            spec = runSpec(params, replicate, seed, settings)
+            if spec["key"] not in results.done:
+                specs.append(spec)
+    log(
+        f"共 {len(configs) * repeats} 次运行，已完成 {len(configs) * repeats - len(specs)} 次"
+    )
+    finished = 0
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(simulate, spec) for spec in specs]
+        for future in as_completed(futures):
+            row = future.result()
+            results.write(row)
+            results.done.add(row["key"])
+            finished += 1
+            log(f"[{finished}/{len(specs)}] {row['key']} 运行 {row['ticksRun']} 个周期")
+    return finished
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--param", action="append", required=True)
+    parser.add_argument("--method", choices=("grid", "random", "lhs"), default="grid")
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--levels", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--map-size", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--init", type=int, nargs=3, default=Creature.INIT_NUM)
+    parser.add_argument("--max", type=int, nargs=3, default=maxCreatureNum)
+    parser.add_argument("--props", default=None)
+    parser.add_argument("--columnar", action="store_true")
+    parser.add_argument(
+        "--grass-model", choices=("objects", "field"), default="objects"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--burn-in", type=float, default=0.2)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--output", default="sweep.csv")
+    args = parser.parse_args()
+
+    parameters = [Parameter.parse(text) for text in args.param]
+    configs = sample(parameters, args.method, args.samples, args.levels, args.seed)
+    settings = {
+        "ticks": args.ticks,
+        "mapSize": args.map_size,
+        "props": loadProps(args.props) if args.props != None else mergeProps(),
+        "initNum": args.init,
+        "maxNum": args.max,
+        "columnar": args.columnar,
+        "grassModel": args.grass_model,
+        "burnIn": args.burn_in,
+    }
+    results = openResults(
+        args.output, columns([p.name for p in parameters]), args.batch
+    )
+    try:
+        sweep(configs, settings, results, args.repeats, args.seed, args.workers)
+    finally:
+        results.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,593 @@
+# 分块多进程模拟：把地图切成 tilesX × tilesY 块，每块由一个进程负责。
+# 每个进程持有一个 TileControl，它的地图是本块外加一圈宽 halo 的边带，halo 不小于最大速度加最大视野。
+# 边带里放着相邻块生物的副本（幽灵），它们只会被看见、挡路和被吃，不做决策、不老化、不繁殖。
+# 块与块之间通过共享内存里的发件箱交换记录，每个周期：
+#   1. 把本块离边缘 halo 以内的生物写进发件箱 → 屏障 → 从相邻块的发件箱读出，放成幽灵 → 屏障
+#   2. 各块独立走完一个周期（决策、移动结算、进食、老化、繁殖），然后清掉幽灵
+#   3. 把走出本块的生物、落在别的块的新生物、吃掉的幽灵写进发件箱 → 屏障
+#      → 收下走进本块的生物与新生物，删掉在别的块被吃掉的生物，写下本块各物种的数量 → 屏障
+# 全图的障碍放在共享内存里，各块取自己的切片；各块的数量汇总在共享内存的 census 中，
+# 繁殖概率与数量上限按全图数量计算、再按本块所占的比例分摊，统计上与单进程运行一致。
+# 记录里都是全图坐标，TileControl 内部是本地坐标：本地 = 全图 - origin
+import multiprocessing
+import traceback
+from multiprocessing import shared_memory
+from time import perf_counter
+
+import numpy as np
+
+from control import (
+    BIRTH_RADIUS,
+    RETRY_TIMES,
+    Control,
+    defaultBarrierMap,
+    maxCreatureNum,
+    predatorVisibleRange,
+    preyVisibleRange,
+    prop,
+)
+from creature import Creature
+from scheduler import TickScheduler
+
+# 记录的种类：边带里的生物、迁出的生物、落在别的块的新生物、被吃掉的幽灵
+BORDER, MIGRANT, BIRTH, KILL = range(4)
+
+# tile、uid 为生物所属的块和它在那一块里的编号
+RECORD = np.dtype(
+    [
+        ("kind", np.uint8),
+        ("code", np.uint8),
+        ("tile", np.int32),
+        ("uid", np.int64),
+        ("X", np.int32),
+        ("Y", np.int32),
+        ("energy", np.float64),
+        ("maxEnergy", np.float64),
+        ("speed", np.int64),
+        ("age", np.int64),
+        ("lifespan", np.float64),
+        ("cost", np.float64),
+        ("rate", np.float64),
+    ]
+)
+
+
+# 幽灵与生物之间最少要留的边带宽度：走一步再加上看得最远的视野
+def defaultHalo(props=prop):
+    return max(p["Speed"] for p in props) + max(predatorVisibleRange, preyVisibleRange)
+
+
+# 把长度 size 平均切成 parts 段，返回各段的分界
+def splitEdges(size, parts):
+    return [size * i // parts for i in range(parts + 1)]
+
+
+# 第 tile 块的范围 (x0, y0, x1, y1)，块按行优先编号
+def tileBounds(mapSize, tilesX, tilesY, tile):
+    xs, ys = splitEdges(mapSize, tilesX), splitEdges(mapSize, tilesY)
+    tx, ty = tile % tilesX, tile // tilesX
+    return xs[tx], ys[ty], xs[tx + 1], ys[ty + 1]
+
+
+# 共享内存里的一个发件箱：开头是记录条数，后面是最多 capacity 条记录
+class Mailbox:
+    def __init__(self, capacity, name=None):
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=name == None, size=8 + capacity * RECORD.itemsize
+        )
+        self.count = np.ndarray(1, np.int64, self.shm.buf)
+        self.records = np.ndarray(capacity, RECORD, self.shm.buf, offset=8)
+
+    def write(self, records):
+        if len(records) > len(self.records):
+            raise RuntimeError(
+                f"发件箱容量不足：要写 {len(records)} 条，只能放 {len(self.records)} 条"
+            )
+        self.records[: len(records)] = records
+        self.count[0] = len(records)
+
+    def read(self):
+        return self.records[: self.count[0]].copy()
+
+    def close(self):
+        del self.count, self.records
+        self.shm.close()
+
+
+class TileScheduler(TickScheduler):
+    # 幽灵不做决策
+    def deciders(self, code):
+        ghostIds = self.control.ghostIds
+        return [c for c in self.control.CreatureLst[code] if id(c) not in ghostIds]
+
+    # 进食结算完就清掉幽灵，之后的老化与繁殖只涉及本块的生物
+    def eat(self):
+        super().eat()
+        self.control.dropGhosts()
+
+
+class TileControl(Control):
+    # bounds 为本块在全图中的范围 (x0, y0, x1, y1)；census 为各块各物种数量的 (块数, 3) 数组，
+    # props、initNum、maxNum 与 Control 相同，其中 initNum、maxNum 是全图的数量
+    def __init__(
+        self,
+        worldBarrier,
+        bounds,
+        halo,
+        tile,
+        census,
+        seed=None,
+        props=None,
+        initNum=None,
+        maxNum=None,
+    ):
+        x0, y0, x1, y1 = bounds
+        side = max(x1 - x0, y1 - y0) + 2 * halo
+        super().__init__(side, seed=seed, props=props, initNum=initNum, maxNum=maxNum)
+        self.worldSize = len(worldBarrier)
+        self.bounds = bounds
+        self.tile = tile
+        self.census = census
+        # maxCreatureNum 每个周期会换成本块分到的上限，全图的上限另存一份
+        self.worldMax = list(self.maxCreatureNum)
+        self.originX, self.originY = x0 - halo, y0 - halo
+        gY, gX = np.mgrid[
+            self.originY : self.originY + side, self.originX : self.originX + side
+        ]
+        self.core = self.inCore(gX, gY)
+        # 离本块边缘 halo 以内、要作为幽灵发给相邻块的格子
+        self.band = self.core & ~(
+            (gX >= x0 + halo) & (gX < x1 - halo) & (gY >= y0 + halo) & (gY < y1 - halo)
+        )
+        # 本块加边带以外、以及全图以外的格子都当作障碍
+        reach = (
+            (gX >= max(x0 - halo, 0))
+            & (gX < min(x1 + halo, self.worldSize))
+            & (gY >= max(y0 - halo, 0))
+            & (gY < min(y1 + halo, self.worldSize))
+        )
+        localBarrier = np.ones((side, side), dtype=np.uint8)
+        localBarrier[reach] = worldBarrier[gY[reach], gX[reach]]
+        self.barrier_init(localBarrier)
+        self.ghosts = [[], [], []]
+        self.ghostIds = set()
+        self.outgoing = []  # 本周期要发给别的块的记录
+        self.scheduler = TileScheduler(self)
+
+    # 全图坐标是否落在本块
+    def inCore(self, gX, gY):
+        x0, y0, x1, y1 = self.bounds
+        return (gX >= x0) & (gX < x1) & (gY >= y0) & (gY < y1)
+
+    # 在本块的随机空格上放下各物种 numbers 只初始生物
+    def seedCore(self, numbers):
+        side = self.MAP_SIZE
+        for code, number in enumerate(numbers):
+            cells = np.flatnonzero(self.occupancy.validGrid(code) & self.core)
+            cells = self.rng.choice(cells, size=min(number, len(cells)), replace=False)
+            for cell in cells.tolist():
+                creature = self.spawn(code, cell % side, cell // side)
+                self.register(creature.randomize(rng=self.rng))
+
+    def record(self, kind, creature):
+        return (
+            kind,
+            creature.type,
+            self.tile,
+            creature.uid,
+            creature.pos.X + self.originX,
+            creature.pos.Y + self.originY,
+            creature.energy,
+            creature.maxEnergy,
+            creature.speed,
+            creature.age,
+            creature.lifespan,
+            creature.energyCostPerTime,
+            creature.rate,
+        )
+
+    # 按记录在本地 (X, Y) 放一只生物，属性照抄记录
+    def place(self, rec, X, Y):
+        creature = self.spawn(int(rec["code"]), X, Y)
+        creature.energy = float(rec["energy"])
+        creature.maxEnergy = float(rec["maxEnergy"])
+        creature.speed = int(rec["speed"])
+        creature.age = int(rec["age"])
+        creature.lifespan = float(rec["lifespan"])
+        creature.energyCostPerTime = float(rec["cost"])
+        creature.rate = float(rec["rate"])
+        self.register(creature)
+        return creature
+
+    # 本块离边缘 halo 以内的生物
+    def borderRecords(self):
+        return np.array(
+            [
+                self.record(BORDER, creature)
+                for creatureLst in self.CreatureLst
+                for creature in creatureLst
+                if self.band[creature.pos.Y, creature.pos.X]
+            ],
+            dtype=RECORD,
+        )
+
+    # 相邻块发来的边带生物中落在本块边带里的，放成幽灵
+    def addGhosts(self, records):
+        gX, gY = records["X"], records["Y"]
+        X, Y = gX - self.originX, gY - self.originY
+        side = self.MAP_SIZE
+        inside = (X >= 0) & (Y >= 0) & (X < side) & (Y < side)
+        for i in np.flatnonzero(
+            (records["kind"] == BORDER) & inside & ~self.inCore(gX, gY)
+        ).tolist():
+            ghost = self.place(records[i], int(X[i]), int(Y[i]))
+            ghost.owner = (int(records[i]["tile"]), int(records[i]["uid"]))
+            self.ghosts[ghost.type].append(ghost)
+            self.ghostIds.add(id(ghost))
+
+    # 清掉所有幽灵，被吃掉的记下来通知它所属的块
+    def dropGhosts(self):
+        for code, ghosts in enumerate(self.ghosts):
+            for ghost in ghosts:
+                if ghost.dead:
+                    tile, uid = ghost.owner
+                    self.outgoing.append(
+                        (KILL, code, tile, uid, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+                    )
+            self.removeCreatures(code, ghosts)
+        self.ghosts = [[], [], []]
+        self.ghostIds = set()
+
+    # 把一些生物移出物种列表，并清除位置标记
+    def removeCreatures(self, code, creatures):
+        if len(creatures) == 0:
+            return
+        ids = {id(creature) for creature in creatures}
+        self.CreatureLst[code] = [c for c in self.CreatureLst[code] if id(c) not in ids]
+        self.occupancy.unmark(
+            code, [c.pos.X for c in creatures], [c.pos.Y for c in creatures]
+        )
+        for creature in creatures:
+            creature.planner = None
+            self.spatial[code].remove(creature)
+
+    # 走出本块的生物交给所在的块
+    def emigrate(self):
+        for code, creatureLst in enumerate(self.CreatureLst):
+            leaving = [c for c in creatureLst if not self.core[c.pos.Y, c.pos.X]]
+            self.outgoing.extend(self.record(MIGRANT, c) for c in leaving)
+            self.removeCreatures(code, leaving)
+
+    def takeOutgoing(self):
+        records, self.outgoing = np.array(self.outgoing, dtype=RECORD), []
+        return records
+
+    # 本块里离本地 (X, Y) 最近的、物种 code 可以落脚的格子，本块已经放满时返回 None
+    def nearestCoreFree(self, code, X, Y):
+        pos = self.occupancy.nearestFree(code, X, Y, BIRTH_RADIUS)
+        if pos != None and self.core[pos[1], pos[0]]:
+            return pos
+        # 附近没有空格，或最近的空格在边带里，就在整块里找
+        cells = np.flatnonzero(self.occupancy.validGrid(code) & self.core)
+        if len(cells) == 0:
+            return None
+        Ys, Xs = np.divmod(cells, self.MAP_SIZE)
+        nearest = int(np.argmin((Xs - X) ** 2 + (Ys - Y) ** 2))
+        return int(Xs[nearest]), int(Ys[nearest])
+
+    # 处理周期末各块发件箱里的全部记录：收下走进本块的生物和新生物，删掉在别处被吃掉的生物
+    def receive(self, records):
+        gX, gY = records["X"], records["Y"]
+        inCore = self.inCore(gX, gY)
+        kills = records[records["kind"] == KILL]
+        # 幽灵被吃的同一周期里它本身可能刚走出所属的块，这样的迁入记录不能再收下
+        killed = set(zip(kills["tile"].tolist(), kills["uid"].tolist()))
+        for i in np.flatnonzero(inCore & (records["kind"] == MIGRANT)).tolist():
+            rec = records[i]
+            if (int(rec["tile"]), int(rec["uid"])) in killed:
+                continue
+            code = int(rec["code"])
+            X, Y = int(gX[i]) - self.originX, int(gY[i]) - self.originY
+            # 两块各自结算移动，可能有别的生物刚好也走到了这里，就放在本块里最近的空格；
+            # 本块已经放满时它就留不下了，与放不下的新生物一样
+            if not self.occupancy.isValid(code, X, Y):
+                pos = self.nearestCoreFree(code, X, Y)
+                if pos == None:
+                    continue
+                X, Y = pos
+            self.place(rec, X, Y)
+        for i in np.flatnonzero(inCore & (records["kind"] == BIRTH)).tolist():
+            code = int(records[i]["code"])
+            X, Y = int(gX[i]) - self.originX, int(gY[i]) - self.originY
+            if self.occupancy.isValid(code, X, Y):
+                self.register(self.spawn(code, X, Y))
+        kills = kills[kills["tile"] == self.tile]
+        for code in range(3):
+            uids = set(kills["uid"][kills["code"] == code].tolist())
+            if len(uids) != 0:
+                self.removeCreatures(
+                    code, [c for c in self.CreatureLst[code] if c.uid in uids]
+                )
+
+    def updateCensus(self):
+        self.census[self.tile] = [len(creatureLst) for creatureLst in self.CreatureLst]
+
+    # 边缘判定按全图坐标
+    def canReproduceAt(self, Xs, Ys):
+        gX, gY = Xs + self.originX, Ys + self.originY
+        edgeSize = self.worldSize // 8
+        return (
+            (gX >= edgeSize)
+            & (gX < self.worldSize - edgeSize)
+            & (gY >= edgeSize)
+            & (gY < self.worldSize - edgeSize)
+        )
+
+    # census 里本块与全图的数量之比，用来由本块现在的数量估计全图现在的数量
+    def censusScale(self, code):
+        local = int(self.census[self.tile, code])
+        return int(self.census[:, code].sum()) / local if local != 0 else None
+
+    # 出生概率按估计的全图数量计算：本块每生一只，相当于全图按本块所占比例生了 scale 只
+    def drawParents(self, code, number, eligibleCount, room, step=1):
+        scale = self.censusScale(code)
+        if scale == None:
+            total = int(self.census[:, code].sum())
+            return super().drawParents(code, number + total, eligibleCount, room, step)
+        return super().drawParents(
+            code, number * scale, eligibleCount, room, step * scale
+        )
+
+    # 全图还能再生多少只按本块所占比例分给本块
+    def AllCreatureReproduce(self):
+        for code, creatureLst in enumerate(self.CreatureLst):
+            scale = self.censusScale(code)
+            total = int(self.census[:, code].sum())
+            if scale == None:
+                room = self.worldMax[code] - total - len(creatureLst)
+            else:
+                room = (self.worldMax[code] - len(creatureLst) * scale) / scale
+            self.maxCreatureNum[code] = len(creatureLst) + max(int(room), 0)
+        super().AllCreatureReproduce()
+
+    # 与 Control.placeNewborns 相同，只是按全图的边长抽偏移；
+    # 落在别的块的新生物记下来交给那一块放置，那一块放不下就不生了
+    def placeNewborns(self, code, Xs, Ys):
+        side, world = self.MAP_SIZE, self.worldSize
+        gX0, gY0 = Xs + self.originX, Ys + self.originY
+        pending = np.arange(len(Xs))
+        placed = np.full(len(Xs), -1, dtype=np.int64)
+        for _ in range(RETRY_TIMES):
+            if len(pending) == 0:
+                break
+            offsets = self.rng.normal(0, 0.5, (2, len(pending))) * world * 0.5
+            gX = (gX0[pending] + offsets[0]).astype(np.int64)
+            gY = (gY0[pending] + offsets[1]).astype(np.int64)
+            inCore = self.inCore(gX, gY)
+            remote = (gX >= 0) & (gY >= 0) & (gX < world) & (gY < world) & ~inCore
+            self.outgoing.extend(
+                (BIRTH, code, -1, -1, X, Y, 0, 0, 0, 0, 0, 0, 0)
+                for X, Y in zip(gX[remote].tolist(), gY[remote].tolist())
+            )
+            cX, cY = gX - self.originX, gY - self.originY
+            ok = inCore & self.occupancy.validMask(code, cX, cY)
+            cells = cY * side + cX
+            ok &= ~np.isin(cells, placed)
+            candidates = np.flatnonzero(ok)
+            _, first = np.unique(cells[candidates], return_index=True)
+            winners = candidates[first]
+            placed[pending[winners]] = cells[winners]
+            pending = np.delete(
+                pending, np.concatenate([winners, np.flatnonzero(remote)])
+            )
+        cells = placed[placed != -1]
+        return list(zip((cells % side).tolist(), (cells // side).tolist()))
+
+
+# 一个进程里运行的一块
+class TileWorker:
+    def __init__(self, spec, tile, barrier):
+        self.tile = tile
+        self.barrier = barrier
+        tiles = spec["tilesX"] * spec["tilesY"]
+        self.barrierShm = shared_memory.SharedMemory(name=spec["barrier"])
+        self.censusShm = shared_memory.SharedMemory(name=spec["census"])
+        worldBarrier = np.ndarray(
+            (spec["mapSize"], spec["mapSize"]), np.uint8, self.barrierShm.buf
+        )
+        self.census = np.ndarray((tiles, 3), np.int64, self.censusShm.buf)
+        self.mailboxes = [Mailbox(spec["capacity"], name) for name in spec["mailboxes"]]
+        tx, ty = tile % spec["tilesX"], tile // spec["tilesX"]
+        self.neighbours = [
+            other
+            for other in range(tiles)
+            if other != tile
+            and abs(other % spec["tilesX"] - tx) <= 1
+            and abs(other // spec["tilesX"] - ty) <= 1
+        ]
+        self.control = TileControl(
+            worldBarrier,
+            tileBounds(spec["mapSize"], spec["tilesX"], spec["tilesY"], tile),
+            spec["halo"],
+            tile,
+            self.census,
+            seed=spec["seeds"][tile],
+            props=spec["props"],
+            initNum=spec["initNum"],
+            maxNum=spec["maxNum"],
+        )
+        del worldBarrier
+        self.control.seedCore(spec["split"][tile])
+        self.control.updateCensus()
+        self.barrier.wait()
+
+    def step(self):
+        control, own = self.control, self.mailboxes[self.tile]
+        own.write(control.borderRecords())
+        self.barrier.wait()
+        for other in self.neighbours:
+            control.addGhosts(self.mailboxes[other].read())
+        self.barrier.wait()
+        control.dayPass()
+        control.emigrate()
+        own.write(control.takeOutgoing())
+        self.barrier.wait()
+        # 新生物可能落在任何一块，所以每一块的发件箱都要看；本块的也要一起看，
+        # 本块吃掉的幽灵可能正是走进本块的那一只
+        control.receive(np.concatenate([mailbox.read() for mailbox in self.mailboxes]))
+        control.updateCensus()
+        self.barrier.wait()
+
+    def close(self):
+        # 先放掉指向共享内存的数组，才能关闭共享内存
+        self.control = self.census = None
+        for mailbox in self.mailboxes:
+            mailbox.close()
+        self.barrierShm.close()
+        self.censusShm.close()
+
+
+def runTile(spec, tile, barrier, commands, results):
+    worker = None
+    try:
+        worker = TileWorker(spec, tile, barrier)
+        results.put(("ready", tile, None))
+        while True:
+            ticks = commands.get()
+            if ticks == None:
+                break
+            t0 = perf_counter()
+            counts = []
+            for _ in range(ticks):
+                worker.step()
+                counts.append(worker.census[tile].tolist())
+            results.put(("done", tile, (counts, perf_counter() - t0)))
+    except Exception:
+        barrier.abort()
+        results.put(("error", tile, traceback.format_exc()))
+    finally:
+        if worker != None:
+            worker.close()
+
+
+class TiledSimulation:
+    # tiles 为 (tilesX, tilesY) 或每边的块数；barrierMap 不给时用 Control 的默认障碍；
+    # props 为物种属性表；initNum、maxNum 为全图各物种的初始数量与数量上限；
+    # capacity 为每个发件箱最多放几条记录
+    def __init__(
+        self,
+        mapSize,
+        tiles=2,
+        seed=None,
+        barrierMap=None,
+        props=None,
+        initNum=None,
+        maxNum=None,
+        halo=None,
+        capacity=None,
+    ):
+        tilesX, tilesY = (tiles, tiles) if isinstance(tiles, int) else tiles
+        props = [dict(p) for p in (props if props != None else prop)]
+        halo = halo if halo != None else defaultHalo(props)
+        if mapSize // max(tilesX, tilesY) < halo:
+            raise ValueError(f"每块的边长不能小于边带宽度 {halo}")
+        self.mapSize = mapSize
+        self.tiles = tilesX * tilesY
+        initNum = list(initNum if initNum != None else Creature.INIT_NUM)
+        maxNum = list(maxNum if maxNum != None else maxCreatureNum)
+        barrierMap = np.asarray(
+            barrierMap if barrierMap is not None else defaultBarrierMap(mapSize),
+            dtype=np.uint8,
+        )
+
+        self.shms = []
+        self.barrierShm = self.createShm(mapSize * mapSize)
+        np.ndarray((mapSize, mapSize), np.uint8, self.barrierShm.buf)[:] = barrierMap
+        self.censusShm = self.createShm(self.tiles * 3 * 8)
+        capacity = capacity if capacity != None else 2 * sum(maxNum) + 4096
+        self.mailboxes = [Mailbox(capacity) for _ in range(self.tiles)]
+
+        # 初始生物按各块的非障碍格数分摊
+        rng = np.random.default_rng(seed)
+        openCells = []
+        for tile in range(self.tiles):
+            x0, y0, x1, y1 = tileBounds(mapSize, tilesX, tilesY, tile)
+            openCells.append(np.count_nonzero(barrierMap[y0:y1, x0:x1] == 0))
+        share = np.array(openCells) / sum(openCells)
+        split = np.array([rng.multinomial(number, share) for number in initNum]).T
+        spec = {
+            "mapSize": mapSize,
+            "tilesX": tilesX,
+            "tilesY": tilesY,
+            "halo": halo,
+            "capacity": capacity,
+            "props": props,
+            "initNum": initNum,
+            "maxNum": maxNum,
+            "split": split.tolist(),
+            "seeds": np.random.SeedSequence(seed).spawn(self.tiles),
+            "barrier": self.barrierShm.name,
+            "census": self.censusShm.name,
+            "mailboxes": [mailbox.shm.name for mailbox in self.mailboxes],
+        }
+
+        self.results = multiprocessing.Queue()
+        self.commands = [multiprocessing.Queue() for _ in range(self.tiles)]
+        barrier = multiprocessing.Barrier(self.tiles)
+        self.processes = [
+            multiprocessing.Process(
+                target=runTile,
+                args=(spec, tile, barrier, self.commands[tile], self.results),
+                daemon=True,
+            )
+            for tile in range(self.tiles)
+        ]
+        for process in self.processes:
+            process.start()
+        self.collect()
+        self.elapsed = 0.0  # 各块运行周期所用时间的最大值之和（秒）
+
+    def createShm(self, size):
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        self.shms.append(shm)
+        return shm
+
+    # 等所有块回报一次，有一块出错就把错误信息抛出来
+    def collect(self):
+        replies = [self.results.get() for _ in range(self.tiles)]
+        errors = [payload for status, _, payload in replies if status == "error"]
+        if len(errors) != 0:
+            self.close()
+            raise RuntimeError("分块模拟出错：\n" + "\n".join(errors))
+        return {tile: payload for _, tile, payload in replies}
+
+    # 所有块一起推进 ticks 个周期，返回每个周期末全图各物种的数量 [[虎, 牛, 草], ...]
+    def run(self, ticks):
+        for commands in self.commands:
+            commands.put(ticks)
+        replies = self.collect()
+        self.elapsed += max(elapsed for _, elapsed in replies.values())
+        return np.array([counts for counts, _ in replies.values()]).sum(axis=0).tolist()
+
+    def close(self):
+        for process, commands in zip(self.processes, self.commands):
+            if process.is_alive():
+                commands.put(None)
+        for process in self.processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        for mailbox in self.mailboxes:
+            mailbox.close()
+            mailbox.shm.unlink()
+        self.mailboxes = []
+        for shm in self.shms:
+            shm.close()
+            shm.unlink()
+        self.shms = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,13 +1,18 @@
 # %%
 from tkinter import *
-from time import time
+from time import time, perf_counter
+import os
+import tempfile
 import numpy as np
 import threading
 
 # 牛不会逃跑，没有漫步机制
 # 修正：1多线程（？删掉试试） 2除以0
-from control import Control
 from creature import Creature
+from eventlog import Replay
+from metrics import NULL_METRICS
+from pipeline import SimulationProcess
+from raster import Rasterizer, toPPM
 
 # ======================================================================== 无用的多线程
 # import threading
@@ -29,12 +34,27 @@ class MainWindow(Tk):
         self.MAP_SIZE = Creature.MAP_SIZE
         self.BLOCK_SIZE = 600 / self.MAP_SIZE
         self.REFRESH_TIME = 250  # 刷新时间（迭代间隔时间），单位：ms
+        self.FRAME_TIME = 30  # 界面取新帧的间隔，单位：ms
+        # "raster"：整个世界画进一张 PhotoImage（见 raster.py），重绘耗时与生物数量无关；
+        # "items"：每只生物一个画布图元
+        self.RENDERER = "raster"
         self.running = False
         self.endOfRound = False
         self.iterateTaskId = ""
 
-        self.mycontrol = Control(self.MAP_SIZE)
-        self.mycontrol.barrier_init([0])
+        # 模拟进程把每个周期记进这个事件日志，暂停时拖动时间轴可以回看之前的周期
+        self.EVENT_LOG = os.path.join(tempfile.gettempdir(), "ecosystem.events")
+        self.replay = None
+        self.replayGeneration = None
+
+        # 模拟在单独的进程里运行（见 pipeline.py），界面只按 FRAME_TIME 取最新的一帧来画
+        self.simulation = SimulationProcess(
+            self.MAP_SIZE, interval=self.REFRESH_TIME / 1000, eventLog=self.EVENT_LOG
+        )
+        self.BarrierMap = self.simulation.barrierMap
+        # 重绘耗时，换成 metrics.Metrics() 即开始记录；模拟在别的进程里，这里每画一帧自成一行，
+        # 行号为这一帧的周期数
+        self.metrics = NULL_METRICS
         # self.mycontrol.creature_init(
         #    tiger_num=INIT_TIGER_NUM, cow_num=INIT_COW_NUM, grass_num=INIT_GRASS_NUM
         # )
@@ -63,7 +83,14 @@ class MainWindow(Tk):
 
         # 当前各物种数量的标签
         self.current_label = Label()
-        self.current_label.place(relx=0.55, rely=0.05, relwidth=0.4, relheight=0.5)
+        self.current_label.place(relx=0.55, rely=0.05, relwidth=0.4, relheight=0.4)
+
+        # 时间轴：运行时跟着最新的周期走，暂停或结束后拖动它回看记录下来的周期
+        self.timeline = Scale(
+            self, from_=0, to=0, orient=HORIZONTAL, label="Tick", command=self.scrub
+        )
+        self.timeline.place(relx=0.72, rely=0.47, relwidth=0.23, relheight=0.1)
+        self.timelineGeneration = None
 
         # 重新初始化按钮，点击后根据输入的值进行重新初始化
         Button(self, text="Initialize", bg="lightblue", command=self.reInit).place(
@@ -95,9 +122,20 @@ class MainWindow(Tk):
         #         width=0.3,
         #     )
 
+        # 栅格渲染时障碍也画在图里，每个格子取整数个像素
+        if self.RENDERER == "raster":
+            self.rasterizer = Rasterizer(
+                self.MAP_SIZE, max(int(self.BLOCK_SIZE), 1), self.BarrierMap
+            )
+            height, width = self.rasterizer.shape
+            self.photo = PhotoImage(width=width, height=height)
+            self.canvas.create_image(
+                self.BLOCK_SIZE, self.BLOCK_SIZE, image=self.photo, anchor=NW
+            )
+
         for i in range(0, self.MAP_SIZE):
             for j in range(0, self.MAP_SIZE):
-                if self.mycontrol.BarrierMap[i][j] == 1:
+                if self.RENDERER == "items" and self.BarrierMap[i][j] == 1:
                     self.canvas.create_rectangle(
                         self.BLOCK_SIZE + self.BLOCK_SIZE * j,
                         (self.MAP_SIZE - i) * self.BLOCK_SIZE,
@@ -106,42 +144,49 @@ class MainWindow(Tk):
                         fill="SaddleBrown",
                     )
 
-        # 计时与刷新有关
-        self.time = time()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.iterateToNextState()
 
         # 窗口显示
         self.mainloop()
 
-    def paintGrass(self, grass):
+    # 关窗口时先让模拟进程退出
+    def close(self):
+        self.simulation.close()
+        if self.replay != None:
+            self.replay.close()
+        self.destroy()
+
+    def paintGrass(self, X, Y):
         self.canvas.create_rectangle(
-            self.BLOCK_SIZE + self.BLOCK_SIZE * grass.pos.X,
-            (self.MAP_SIZE - grass.pos.Y) * self.BLOCK_SIZE,
-            self.BLOCK_SIZE + self.BLOCK_SIZE * grass.pos.X + self.BLOCK_SIZE,
-            (self.MAP_SIZE - grass.pos.Y) * self.BLOCK_SIZE + self.BLOCK_SIZE,
+            self.BLOCK_SIZE + self.BLOCK_SIZE * X,
+            (self.MAP_SIZE - Y) * self.BLOCK_SIZE,
+            self.BLOCK_SIZE + self.BLOCK_SIZE * X + self.BLOCK_SIZE,
+            (self.MAP_SIZE - Y) * self.BLOCK_SIZE + self.BLOCK_SIZE,
             fill="green",
             outline="",
             tags="creature",
         )
 
-    def paintCow(self, cow):
+    def paintCow(self, X, Y):
         self.canvas.create_oval(
-            self.BLOCK_SIZE + self.BLOCK_SIZE * cow.pos.X + self.BLOCK_SIZE / 8,
-            (self.MAP_SIZE - cow.pos.Y) * self.BLOCK_SIZE + self.BLOCK_SIZE / 8,
+            self.BLOCK_SIZE + self.BLOCK_SIZE * X + self.BLOCK_SIZE / 8,
+            (self.MAP_SIZE - Y) * self.BLOCK_SIZE + self.BLOCK_SIZE / 8,
             self.BLOCK_SIZE
-            + self.BLOCK_SIZE * cow.pos.X
+            + self.BLOCK_SIZE * X
             + self.BLOCK_SIZE
             - self.BLOCK_SIZE / 8,
-            (self.MAP_SIZE - cow.pos.Y) * self.BLOCK_SIZE
+            (self.MAP_SIZE - Y) * self.BLOCK_SIZE
             + self.BLOCK_SIZE
             - self.BLOCK_SIZE / 8,
             fill="blue",
             tags="creature",
         )
 
-    def paintTiger(self, tiger):
+    def paintTiger(self, X, Y):
         a = self.BLOCK_SIZE
-        x = tiger.pos.X
-        y = self.MAP_SIZE - tiger.pos.Y
+        x = X
+        y = self.MAP_SIZE - Y
 
         self.canvas.create_polygon(
             a * (1 + x - 0.2),
@@ -154,102 +199,107 @@ class MainWindow(Tk):
             tags="creature",
         )
 
-    # 刷新地图
-    def iterateToNextState(self):
-        # 如果没有跑完整轮的话
-        if not self.endOfRound:
-            # 如果状态是 Running 的话
-            if self.running:
-                t01 = time()
-
-                T = threading.Thread(target=self.mycontrol.dayPass)
-                T.start()
-                T.join()
-
-                # 删除上一张 canvas 图中的生物
-                self.canvas.delete("creature")
-
-                t20 = time()
-
-                # 重新设置本图的生物标记
-                # 用了多线程反而会严重降低性能，原因未知
-                for grass in self.mycontrol.CreatureLst[2]:
-                    # threading.Thread(target=self.paintGrass,args=(grass,)).start()
-                    self.paintGrass(grass)
-
-                for cow in self.mycontrol.CreatureLst[1]:
-                    # threading.Thread(target=self.paintCow,args=(cow,)).start()
-                    self.paintCow(cow)
-
-                for tiger in self.mycontrol.CreatureLst[0]:
-                    # threading.Thread(target=self.paintTiger,args=(tiger,)).start()
-                    self.paintTiger(tiger)
-
-                print("重绘耗时：", time() - t20)
-
-                print("周期耗时：", time() - t01)
-
-                # 实时呈报各物种数量
-                self.current_label[
-                    "text"
-                ] = f"""
-                                    Number of grass: {str(len(self.mycontrol.CreatureLst[2]))}
-                                    Number of cow: {str(len(self.mycontrol.CreatureLst[1]))}
-                                    Number of tiger: {str(len(self.mycontrol.CreatureLst[0]))}
-                                    """
+    # 按各物种的位置拼出整张图，一次送给 PhotoImage
+    def paintRaster(self, positions):
+        self.photo.put(toPPM(self.rasterizer.render(positions)))
 
-                delta_time = time() - self.time
-                self.time = time()
-                # print(
-                #     len(self.mycontrol.grassLst),
-                #     len(self.mycontrol.cowLst),
-                #     len(self.mycontrol.tigerLst),
-                #     delta_time,
-                # )
-
-                # 如果 cow 和 tiger 中两者均不为零时
-                if len(self.mycontrol.CreatureLst[1]) and len(
-                    self.mycontrol.CreatureLst[0]
-                ):
-                    if delta_time < self.REFRESH_TIME:
-                        self.iterateTaskId = self.after(
-                            int(self.REFRESH_TIME - delta_time), self.iterateToNextState
-                        )
-                    elif delta_time >= self.REFRESH_TIME:
-                        self.iterateTaskId = self.after(1, self.iterateToNextState)
-
-                # cow 和 tiger 中两者有一者为零，停止程序
-                else:
-                    self.current_label[
-                        "text"
-                    ] = f"""
-                                        Number of grass: {str(len(self.mycontrol.CreatureLst[2]))}
-                                        Number of cow: {str(len(self.mycontrol.CreatureLst[1]))}
-                                        Number of tiger: {str(len(self.mycontrol.CreatureLst[0]))}
+    # 刷新地图：取模拟进程最新的一帧来画，没有新帧就等下一次
+    def iterateToNextState(self):
+        frame = self.simulation.latest()
+        if frame != None:
+            self.showFrame(frame)
+        self.iterateTaskId = self.after(self.FRAME_TIME, self.iterateToNextState)
+
+    def showFrame(self, frame):
+        # 初始化之后的第一帧是时间轴的起点
+        if frame.generation != self.timelineGeneration:
+            self.timelineGeneration = frame.generation
+            self.timeline.config(from_=frame.tick)
+        self.timeline.config(to=frame.tick)
+        self.timeline.set(frame.tick)
+
+        self.drawWorld(frame.tick, frame.positions, frame.counts)
+
+        # cow 和 tiger 中两者有一者为零，模拟进程已经停下
+        if frame.ended and not self.endOfRound:
+            tigers, cows, grass = frame.counts
+            self.current_label[
+                "text"
+            ] = f"""
+                                        Number of grass: {grass}
+                                        Number of cow: {cows}
+                                        Number of tiger: {tigers}
                                             
                                             End of the simulation."""
-                    self.toggleState()
-                    self.endOfRound = True
-
-            # 没有跑完整轮但状态是 Stop
-            if not self.running:
-                self.iterateTaskId = self.after(200, self.iterateToNextState)
+            self.toggleState(state=False)
+            self.endOfRound = True
+
+    # 暂停时拖动时间轴：从事件日志回放到那个周期再画出来，不必重新运行模拟。
+    # 再点 Start 时模拟仍从它最新的周期接着跑
+    def scrub(self, value):
+        if self.running or self.simulation.generation == 0:
+            return
+        try:
+            if self.replay == None or self.replayGeneration != self.simulation.generation:
+                if self.replay != None:
+                    self.replay.close()
+                self.replay = Replay(self.EVENT_LOG)
+                self.replayGeneration = self.simulation.generation
+            tick = int(float(value))
+            if tick > self.replay.lastTick:
+                self.replay.refresh()
+            tick = min(max(tick, self.replay.firstTick), self.replay.lastTick)
+            self.drawWorld(
+                tick, self.replay.positions(tick), self.replay.counts(tick)
+            )
+        except (OSError, ValueError, IndexError):
+            # 模拟进程还没开始写这一次的日志
+            self.replay = None
+
+    def drawWorld(self, tick, positions, counts):
+        t20 = perf_counter()
+
+        if self.RENDERER == "raster":
+            self.paintRaster(positions)
+        else:
+            # 删除上一张 canvas 图中的生物
+            self.canvas.delete("creature")
+
+            # 重新设置本图的生物标记
+            (tigerXs, tigerYs), (cowXs, cowYs), (grassXs, grassYs) = positions
+            for X, Y in zip(grassXs.tolist(), grassYs.tolist()):
+                self.paintGrass(X, Y)
+
+            for X, Y in zip(cowXs.tolist(), cowYs.tolist()):
+                self.paintCow(X, Y)
+
+            for X, Y in zip(tigerXs.tolist(), tigerYs.tolist()):
+                self.paintTiger(X, Y)
+
+        t21 = perf_counter()
+        self.metrics.phase("redraw", t20, t21)
+        self.metrics.endTick(tick, t20, t21)
+
+        # 实时呈报各物种数量
+        tigers, cows, grass = counts
+        self.current_label[
+            "text"
+        ] = f"""
+                                    Number of grass: {grass}
+                                    Number of cow: {cows}
+                                    Number of tiger: {tigers}
+                                    """
 
     # 按钮更新 creature 数量
     def reInit(self):
-        self.mycontrol.creature_init(
+        self.simulation.init(
             tiger_num=int(self.tigerEntry.get()),
             cow_num=int(self.cowEntry.get()),
             grass_num=int(self.grassEntry.get()),
         )
 
-        # 如果已经有一个 iterateToNextState 在计划执行了，则清除这个计划任务
-        if self.iterateTaskId != "":
-            self.after_cancel(self.iterateTaskId)
-
         self.endOfRound = False
         self.toggleState(state=True)
-        self.iterateToNextState()
 
     # 停止时需要显示 Start，运行时需要显示 Stop
     runningStr = ["Start", "Stop"]
@@ -265,6 +315,11 @@ class MainWindow(Tk):
             text=MainWindow.runningStr[self.running],
             bg=MainWindow.runningColor[self.running],
         )
+        # 开始、暂停都是发给模拟进程的消息
+        if self.running:
+            self.simulation.start()
+        else:
+            self.simulation.stop()
 
     def startStopBtnFunc(self):
         if self.endOfRound: